@@ -0,0 +1,229 @@
+"""
+Token and cost accounting per ingest and query.
+
+Every LLM, embedding and query-expansion call recorded by llm_routing.usage_tracker is also
+attributed to the innermost open `usage_scope` (the document being ingested, or the query being
+answered, with its section and the signed-in email). When a scope closes, its totals per stage and
+model are added to the llm_usage table, one row per day and attribution.
+
+Report from the repository root:
+    python -m accounting [--by document] [--kind ingest] [--days 30] [--limit 20]
+"""
+import argparse
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from datetime import date, timedelta
+
+from database import get_pool
+
+QUERY_TEXT_LIMIT = 300
+
+_CREATE_USAGE = """
+CREATE TABLE IF NOT EXISTS llm_usage (
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    email TEXT NOT NULL DEFAULT '',
+    section TEXT NOT NULL DEFAULT '',
+    document TEXT NOT NULL DEFAULT '',
+    query TEXT NOT NULL DEFAULT '',
+    stage TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    cache_hits INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms REAL NOT NULL DEFAULT 0,
+    cost_usd REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, kind, email, section, document, query, stage, model)
+)
+"""
+
+_ADD_USAGE = """
+INSERT INTO llm_usage (day, kind, email, section, document, query, stage, model,
+                       calls, cache_hits, errors, prompt_tokens, completion_tokens, latency_ms, cost_usd)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, kind, email, section, document, query, stage, model) DO UPDATE SET
+    calls = calls + excluded.calls,
+    cache_hits = cache_hits + excluded.cache_hits,
+    errors = errors + excluded.errors,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = completion_tokens + excluded.completion_tokens,
+    latency_ms = latency_ms + excluded.latency_ms,
+    cost_usd = cost_usd + excluded.cost_usd
+"""
+
+REPORT_GROUPS = ("document", "section", "query", "email", "kind", "stage", "model", "day")
+
+_table_ready = False
+_table_lock = threading.Lock()
+
+
+def initialize_usage_table():
+    global _table_ready
+    with _table_lock:
+        if not _table_ready:
+            with get_pool().transaction() as conn:
+                conn.execute(_CREATE_USAGE)
+            _table_ready = True
+
+
+@dataclass
+class UsageTotals:
+    calls: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: float = 0.0
+    cost_usd: float = 0.0
+
+
+class UsageScope:
+    """Totals per (stage, model) for one ingested document or one answered query."""
+
+    def __init__(self, kind, email="", section="", document="", query=""):
+        self.kind = kind
+        self.email = email or ""
+        self.section = section or ""
+        self.document = document or ""
+        self.query = (query or "")[:QUERY_TEXT_LIMIT]
+        self.totals = {}
+        self._lock = threading.Lock()  # LightRAG records concurrent calls from its asyncio tasks
+
+    def add(self, stage, model, latency_seconds=0.0, prompt_tokens=0, completion_tokens=0, cost_usd=0.0, error=False, cache_hits=0):
+        with self._lock:
+            totals = self.totals.setdefault((stage, model), UsageTotals())
+            totals.calls += 0 if cache_hits else 1
+            totals.cache_hits += cache_hits
+            totals.errors += int(error)
+            totals.prompt_tokens += prompt_tokens
+            totals.completion_tokens += completion_tokens
+            totals.latency_ms += latency_seconds * 1000
+            totals.cost_usd += cost_usd
+
+    def cost(self):
+        with self._lock:
+            return sum(totals.cost_usd for totals in self.totals.values())
+
+    def rows(self, day=None):
+        day = (day or date.today()).isoformat()
+        with self._lock:
+            return [
+                (day, self.kind, self.email, self.section, self.document, self.query, stage, model,
+                 t.calls, t.cache_hits, t.errors, t.prompt_tokens, t.completion_tokens, t.latency_ms, t.cost_usd)
+                for (stage, model), t in self.totals.items()
+            ]
+
+
+_current_scope = contextvars.ContextVar("usage_scope", default=None)
+
+
+def current_scope():
+    return _current_scope.get()
+
+
+@contextmanager
+def usage_scope(kind=None, email=None, section=None, document=None, query=None):
+    """
+    Attribute the LLM and embedding usage inside the block to a document or query. Fields left out
+    are inherited from the enclosing scope; calls are counted in the innermost scope only.
+    """
+    parent = _current_scope.get()
+    scope = UsageScope(
+        kind or (parent.kind if parent else "other"),
+        email if email is not None else (parent.email if parent else ""),
+        section if section is not None else (parent.section if parent else ""),
+        document if document is not None else (parent.document if parent else ""),
+        query if query is not None else (parent.query if parent else ""),
+    )
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        save_scope(scope)
+
+
+def record(stage, model, latency_seconds=0.0, prompt_tokens=0, completion_tokens=0, cost_usd=0.0, error=False, cache_hits=0):
+    """Count a call (or `cache_hits` answers served from LightRAG's cache) against the current scope."""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.add(stage, model, latency_seconds, prompt_tokens, completion_tokens, cost_usd, error, cache_hits)
+
+
+def save_scope(scope):
+    rows = scope.rows()
+    if not rows:
+        return
+    try:
+        initialize_usage_table()
+        with get_pool().transaction() as conn:
+            conn.executemany(_ADD_USAGE, rows)
+    except Exception as e:
+        logging.error(f"❌ Could not save LLM usage for {scope.kind} '{scope.document or scope.query}': {e}")
+        return
+    logging.info(
+        f"💰 {scope.kind} '{scope.document or scope.query[:60]}': "
+        f"{sum(row[11] for row in rows)}+{sum(row[12] for row in rows)} tokens, ~${scope.cost():.4f}"
+    )
+
+
+# --- Report ---
+
+def usage_report(by="document", kind=None, days=None, limit=20):
+    """
+    Totals grouped by one of REPORT_GROUPS, most expensive first. `kind` limits the report to
+    "ingest" or "query"; `days` to the last N days.
+    """
+    if by not in REPORT_GROUPS:
+        raise ValueError(f"Cannot group usage by '{by}'; choose one of {', '.join(REPORT_GROUPS)}")
+    clauses, params = [], []
+    if kind:
+        clauses.append("kind = ?")
+        params.append(kind)
+    if days:
+        clauses.append("day >= ?")
+        params.append((date.today() - timedelta(days=days - 1)).isoformat())
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sums = ", ".join(f"SUM({field.name})" for field in fields(UsageTotals))
+    initialize_usage_table()
+    with get_pool().connection() as conn:
+        rows = conn.execute(
+            f"SELECT {by}, {sums} FROM llm_usage {where} GROUP BY {by} ORDER BY SUM(cost_usd) DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+    return [
+        {by: row[0] or "(none)", **{
+            field.name: round(value, 4) if isinstance(value, float) else value
+            for field, value in zip(fields(UsageTotals), row[1:])
+        }}
+        for row in rows
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--by", choices=REPORT_GROUPS, default="document")
+    parser.add_argument("--kind", choices=["ingest", "query"])
+    parser.add_argument("--days", type=int)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = usage_report(args.by, args.kind, args.days, args.limit)
+    if not rows:
+        print("No usage recorded yet.")
+        return
+    print(f"{args.by[:48]:48} {'calls':>7} {'cached':>7} {'prompt tok':>11} {'compl tok':>10} {'latency s':>10} {'cost $':>9}")
+    for row in rows:
+        print(
+            f"{str(row[args.by])[:48]:48} {row['calls']:7d} {row['cache_hits']:7d} {row['prompt_tokens']:11d} "
+            f"{row['completion_tokens']:10d} {row['latency_ms'] / 1000:10.1f} {row['cost_usd']:9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,33 @@
-import base64
+import time
+
+import startup_profile
+import accounting
+import tracing
+
+_imports_started = time.perf_counter()
+
 import json
 import logging
 from pathlib import Path
-from datetime import datetime, timezone
-import re
-import sqlite3
-import gcsfs
-from google.oauth2 import service_account
-import time
+from datetime import datetime
 import traceback
-import numpy as np
 import streamlit as st
-from lightrag import LightRAG, QueryParam
-from lightrag.llm.openai import openai_embed, gpt_4o_mini_complete, gpt_4o_complete
-from langchain_openai import OpenAI
-from lightrag.utils import EmbeddingFunc
 from constant import SECTION_KEYWORDS, select_section
-from db_helper import check_if_file_exists_in_section, check_working_directory, delete_file, get_uploaded_sections, initialize_database
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
+from db_helper import LISTING_PAGE_SIZE, check_if_file_exists_in_section, check_working_directory, delete_file, delete_layer_files, get_file_content, get_uploaded_sections, initialize_database, list_file_page, list_projects
 from inference import process_files_and_links
-from google_docs_helper import GoogleDocsHelper, GoogleDriveAPI
 from auth import auth_flow, logout, validate_session
 from utils import clean_text
+from cassette import get_cassette, llm_key
+from chunker import count_tokens
+from llm_routing import KEYWORD_EXTRACTION, QUERY_EXPANSION, usage_tracker
+from llm_scheduler import DEFAULT_COMPLETION_RESERVE, INTERACTIVE, llm_priority
+from rag_factory import RAGFactory, cached_query_stage, get_llm_scheduler
+from proposal_parser import STRUCTURED_OUTPUT_INSTRUCTIONS, parse_proposal_content, parse_structured_proposal, render_proposal_text
+from snapshots import checkout_snapshot, get_snapshot_reader, publish_snapshot, snapshots_enabled
+from workspaces import SHARED, layer_for, list_local_projects, project_slug, query_layers, visible_layers, workspace_dir, workspace_prefix
+
+# lightrag, langchain_openai, google-cloud-storage and the Google API clients are imported inside the functions that use them
+startup_profile.record("app imports", time.perf_counter() - _imports_started)
 
 auth_cache_dir = Path(__file__).parent / "auth_cache"
 
@@ -78,43 +83,34 @@ def clean_and_parse_json(raw_json):
         return None
 
 
-def embedding_func(texts: list[str]) -> np.ndarray:
-    embeddings = openai_embed(
-        texts,
-        model="text-embedding-3-large",
-        api_key=st.secrets["OPENAI_API_KEY"],
-        base_url=None
-    )
-    if embeddings is None:
-        logging.error("Received empty embeddings from API.")
-        return np.array([])
-    return embeddings
-
-
-class RAGFactory:
-    _shared_embedding = EmbeddingFunc(
-        embedding_dim=3072,
-        max_token_size=8192,
-        func=embedding_func
-    )
-
-    @classmethod
-    def create_rag(cls, working_dir: str) -> LightRAG:
-        """Create a LightRAG instance with shared configuration, upload to GCS if specified"""
-        return LightRAG(
-            working_dir=working_dir,
-            addon_params={
-                "insert_batch_size": 10  # Process 10 documents per batch
-            },
-            llm_model_func=gpt_4o_complete,
-            embedding_func=cls._shared_embedding
-        )
-
+def delete_document_everywhere(file_name, table_name, project=SHARED):
+    """Delete a file's database row and everything LightRAG derived from it in its layer's workspace"""
+    from storage import push_workspace
+    from workspace_ops import delete_document
+
+    layer = layer_for(table_name, project)
+    content = get_file_content(file_name, table_name, layer)
+    if content:
+        if snapshots_enabled():
+            checkout_snapshot(workspace_dir(layer), layer)
+        rag = RAGFactory.create_rag(str(workspace_dir(layer)))
+        stats = delete_document(rag, content)
+        if stats:
+            print(f"🗑️ Removed {stats['chunks']} chunks, {stats['entities_deleted']} entities and "
+                  f"{stats['relations_deleted']} relationships for '{file_name}' in {stats['seconds']}s")
+            try:
+                if snapshots_enabled():
+                    publish_snapshot(workspace_dir(layer), layer)
+                else:
+                    push_workspace(workspace_dir(layer), prefix=workspace_prefix(layer))
+            except Exception as e:
+                logging.warning(f"⚠️ Workspace not pushed to GCS: {e}")
+    delete_file(file_name, table_name, layer)
 
 
 def generate_explicit_query(query):
     """Expands the user query and merges expanded queries into a single, explicit query."""
-    llm = OpenAI(temperature=0, openai_api_key=st.session_state.openai_api_key)
+    model = RAGFactory.stage_models()[QUERY_EXPANSION]
 
     prompt = f"""
     Given the following vague query:
@@ -157,8 +153,28 @@ def generate_explicit_query(query):
     '{query}'
     """
 
-    response = llm.invoke(prompt)
-    return response.strip()
+    cassette = get_cassette()
+    key = llm_key(prompt, client="langchain", temperature=0)
+    if cassette.replaying:
+        usage_tracker.record_cache_hits(QUERY_EXPANSION, model)
+        return cassette.replay_response(key, QUERY_EXPANSION).strip()
+
+    from langchain_openai import ChatOpenAI
+
+    # Retries are left to the scheduler, which backs the model off on a 429
+    llm = ChatOpenAI(model=model, temperature=0, openai_api_key=st.session_state.openai_api_key, max_retries=0)
+    prompt_tokens = count_tokens(prompt)
+    start = time.perf_counter()
+    response = get_llm_scheduler().run(model, lambda: llm.invoke(prompt), prompt_tokens + DEFAULT_COMPLETION_RESERVE)
+    usage = response.usage_metadata or {}
+    get_llm_scheduler().refund(model, DEFAULT_COMPLETION_RESERVE - usage.get("output_tokens", 0))
+    usage_tracker.record(
+        QUERY_EXPANSION, model, time.perf_counter() - start,
+        usage.get("input_tokens", prompt_tokens), usage.get("output_tokens", 0)
+    )
+    if cassette.recording:
+        cassette.put_response(key, QUERY_EXPANSION, model, response.content)
+    return response.content.strip()
 
 
 proposal_prompt = """
@@ -266,225 +282,141 @@ Now, generate a **full proposal** using the structured format above, ensuring pr
 """
 
 
-@st.cache_resource
-def get_db_connection():
-    return sqlite3.connect("files.db", check_same_thread=False)
-
 def generate_answer():
     """Generates an answer when the user enters a query and presses Enter."""
+    from lightrag import QueryParam
+    from storage import pull_workspace
+
     query = st.session_state.query_input
-    conn = get_db_connection()  # Get user query from session state
     if not query:
         return  # Do nothing if query is empty
 
-    with st.spinner("Expanding query..."):
-        expanded_queries = generate_explicit_query(query)
-        full_prompt = f"{proposal_prompt}\n\nUser Query: {expanded_queries}"
-
-    with st.spinner("Generating answer..."):
-        try:
-            # working_dir = Path("./analysis_workspace")
-            # working_dir.mkdir(parents=True, exist_ok=True)
-            # rag = RAGFactory.create_rag(str(working_dir))  
-            # ✅ Authenticate and initialize GCS
-            gcs_fs = get_gcs_fs()
-            print("Service Account Authenticated")
-
-            # ✅ Define bucket and sync files
-            bucket_name = "lightrag-bucket"
-            prefix = "analysis_workspace"
-            local_dir = sync_gcs_to_local(gcs_fs, bucket_name, prefix)
-            print(f"Files synced to {local_dir}")
-
-            rag = RAGFactory.create_rag(str(local_dir))
-
-            # Send combined query to RAG
-            response = rag.query(full_prompt, QueryParam(mode="hybrid"))
-
-            # Store in chat history
-            st.session_state.chat_history.append(("You", query))
-            st.session_state.chat_history.append(("Bot", response))
+    # Interactive requests go ahead of any background ingest in the shared LLM scheduler; every LLM
+    # and embedding call below is billed to this query
+    usage = accounting.usage_scope(
+        "query",
+        email=(st.session_state.get("credentials") or {}).get("email", ""),
+        section=st.session_state.get("current_section", ""),
+        query=query,
+    )
+    with llm_priority(INTERACTIVE), usage, tracing.span("query", structured=st.session_state.get("structured_output", False)):
+        with st.spinner("Expanding query..."):
+            with tracing.span("query.expand"):
+                expanded_queries = generate_explicit_query(query)
+            full_prompt = f"{proposal_prompt}\n\nUser Query: {expanded_queries}"
+            structured = st.session_state.get("structured_output", False)
+            if structured:
+                full_prompt = f"{full_prompt}\n{STRUCTURED_OUTPUT_INSTRUCTIONS}"
+
+        with st.spinner("Generating answer..."):
+            try:
+                # The selected project's workspace and the shared company-knowledge workspace
+                layers = visible_layers(st.session_state.get("current_project", SHARED))
+
+                if snapshots_enabled():
+                    # Each layer's pinned snapshot, already loaded; newer versions are swapped in the background
+                    with tracing.span("query.load_rag", layers=len(layers), snapshots=True):
+                        rags = {layer: get_snapshot_reader(layer).rag() for layer in layers}
+                        rags = {layer: rag for layer, rag in rags.items() if rag is not None}
+                    if not rags:
+                        st.warning("⚠️ Nothing has been published for these workspaces yet.")
+                        st.session_state.query_input = ""
+                        return
+                else:
+                    # ✅ Fetch only the workspace files that changed in GCS since the last sync
+                    for layer in layers:
+                        with tracing.span("query.sync_workspace", layer=layer or "shared") as sync_span:
+                            sync_span.set(**pull_workspace(workspace_dir(layer), prefix=workspace_prefix(layer)))
+
+                    with tracing.span("query.load_rag", layers=len(layers)):
+                        rags = {layer: RAGFactory.create_rag(str(workspace_dir(layer))) for layer in layers}
+
+                # LightRAG answers repeated keyword extractions and prompts from its cache without calling
+                # the model; look them up before the query fills the cache. Merged layers never reuse a
+                # cached answer, only cached keywords
+                cached_stages = [cached_query_stage(rag, full_prompt, "hybrid") for rag in rags.values()]
+                if len(rags) > 1:
+                    cached_stages = [stage for stage in cached_stages if stage == KEYWORD_EXTRACTION]
+
+                # Send combined query to RAG; retrieval, embedding and generation are child spans
+                with tracing.span("query.rag", mode="hybrid", layers=len(layers)):
+                    response = query_layers(rags, full_prompt, QueryParam(mode="hybrid"))
+                for stage in filter(None, cached_stages):
+                    usage_tracker.record_cache_hits(stage, RAGFactory.stage_models()[stage])
+
+                # Sections come straight from the JSON in structured mode, else from one parse of the text
+                sections = None
+                if structured:
+                    try:
+                        sections = parse_structured_proposal(response)
+                        response = render_proposal_text(sections)
+                    except ValueError as e:
+                        st.warning(f"⚠️ Structured output could not be read ({e}); parsing the text instead.")
+
+                # Store in chat history
+                st.session_state.chat_history.append(("You", query))
+                st.session_state.chat_history.append(("Bot", response))
             
-            # Store response as proposal text
-            cleaned_response = clean_text(response)
-            st.session_state.proposal_text = cleaned_response
+                # Store response as proposal text
+                with tracing.span("query.clean_text"):
+                    cleaned_response = clean_text(response)
+                st.session_state.proposal_text = cleaned_response
+                with tracing.span("query.parse_sections"):
+                    st.session_state.proposal_sections = sections or parse_proposal_content(cleaned_response)
             
-        except Exception as e:
-            st.error(f"Error retrieving response: {e}")
+            except Exception as e:
+                st.error(f"Error retrieving response: {e}")
 
     # Reset query input to allow further queries
     st.session_state.query_input = ""
 
 
-def extract_section(proposal_text, section_name):
-    """Robust section extraction with subsections handling"""
-    lines = proposal_text.split('\n')
-    content = []
-    capture = False
-    subsection_pattern = re.compile(r'^\s*(LOT \d+:|•|\d+\.)\s*', re.IGNORECASE)
-    
-    # Define section names that mark the end of the current section
-    end_sections = ['Project Scope', 'Exclusions', 'Deliverables', 'Commercial', 'Schedule', 'Compliance Section', 'Experience & Qualifications', 'Additional Documents Required', 'Conclusion', 'Yours Sincerely']
-    # Build regex pattern to match any of these sections at line start
-    end_pattern = re.compile(
-        r'^\s*({})\b.*'.format(  # \b ensures whole word match
-            '|'.join(re.escape(section) for section in end_sections)
-        ),
-        re.IGNORECASE
-    )
-
-    for line in lines:
-        # Normalize line for matching
-        clean_line = line.strip().lower().replace('_', ' ').replace('/', ' ')
-        
-        # Start capturing at target section (exact match check)
-        if section_name.lower() == clean_line and not capture:
-            capture = True
-            continue  # Skip the section header line itself
-            
-        if capture:
-            # Stop at next main section (using original line for pattern matching)
-            if end_pattern.match(line.strip()):
-                break
-                
-            # Preserve subsections and lists with proper formatting
-            if subsection_pattern.match(line):
-                content.append('\n' + line.strip())
-            elif line.strip():
-                content.append(line.strip())
-
-    return '\n'.join(content).strip()
-
-    
-
-# Parse generated content into template structure
-def parse_proposal_content(proposal_text):
-    """Extracts proposal sections with proper placeholder keys"""
-    parsed_data = {
-        "INTRODUCTION_CONTENT": extract_section(proposal_text, "Introduction"),
-        "PROJECT_SCOPE_CONTENT": extract_section(proposal_text, "Project Scope"),
-        "EXCLUSIONS_CONTENT": extract_section(proposal_text, "Exclusions"),
-        "DELIVERABLES_CONTENT": extract_section(proposal_text, "Deliverables"),
-        "COMMERCIAL_CONTENT": extract_section(proposal_text, "Commercial"),
-        "SCHEDULE_CONTENT": extract_section(proposal_text, "Schedule"),
-        "COMPLIANCE_CONTENT": extract_section(proposal_text, "Compliance Section"),
-        "EXPERIENCE_CONTENT": extract_section(proposal_text, "Experience & Qualifications"),
-        "ADDITIONAL_DOCUMENTS_CONTENT": extract_section(proposal_text, "Additional Documents Required"),
-        "CONCLUSION_CONTENT": extract_section(proposal_text, "Conclusion"),
-        "SIGN_OFF_CONTENT": extract_section(proposal_text, "Yours Sincerely,")    
-    }
-
-    # 🔍 DEBUG: Log extracted content before sending it for replacement
-    print("\n--- 🔍 DEBUG: Parsed Proposal Content ---")
-    for key, value in parsed_data.items():
-        print(f"{key}: {value[200:]}...")  # Print first 200 characters for preview
-    print("--- 🔍 End of Parsed Content ---\n")
-
-    return parsed_data
-
-
-def sync_gcs_to_local(gcs_fs, gcs_bucket, gcs_prefix):
-    """Ensure all files from GCS are downloaded to 'analysis_workspace'"""
-    local_cache = Path("./analysis_workspace")
-    gcs_path = f"{gcs_bucket}/{gcs_prefix}".rstrip("/")
-
-    # Ensure the local directory exists
-    local_cache.mkdir(parents=True, exist_ok=True)
-
-    try:
-        gcs_files = gcs_fs.ls(gcs_path)
-        print(f"\n🔍 Found {len(gcs_files)} files in GCS: {gcs_files}")  # Debugging
-
-        if not gcs_files:
-            raise FileNotFoundError(f"GCS path '{gcs_path}' is empty")
-
-    except Exception as e:
-        raise FileNotFoundError(f"Error accessing GCS path '{gcs_path}': {e}")
-
-    print(f"\n🔍 Found {len(gcs_files)} files in GCS:")
-    for f in gcs_files:
-        print(f"   - {f}")
-
-    print("\n🔄 Checking local sync...\n")
+def load_export_credentials(credentials_path):
+    """Load the signed-in user's OAuth credentials, with the nested token JSON decoded."""
+    credentials = json.loads(credentials_path.read_text())  # Load main JSON
 
-    downloaded_files = []
+    # Decode the nested JSON inside "token"
+    if isinstance(credentials.get("token"), str):
+        credentials["token"] = json.loads(credentials["token"])
 
-    for blob_path in gcs_files:
-        # Skip directories
-        if blob_path.endswith("/"):
-            print(f"⏩ Skipping directory: {blob_path}")
-            continue  # Skip to the next file
-
-        local_path = local_cache / Path(blob_path).name
-        try:
-            # Always download if the local folder is empty
-            if not any(local_cache.iterdir()):
-                download = True
-            else:
-                # Check timestamps
-                blob_info = gcs_fs.info(blob_path)
-                gcs_last_modified = datetime.fromisoformat(blob_info["updated"]).astimezone(timezone.utc)
+    # Ensure the required keys exist
+    required_keys = {"client_id", "client_secret", "refresh_token"}
+    if not isinstance(credentials["token"], dict) or not required_keys.issubset(credentials["token"].keys()):
+        st.error("❗ Invalid credentials file. Please log in again.")
+        st.stop()
+    return credentials
 
-                if local_path.exists():
-                    local_last_modified = datetime.fromtimestamp(local_path.stat().st_mtime, tz=timezone.utc)
-                    download = local_last_modified < gcs_last_modified
-                else:
-                    download = True
 
-            if download:
-                # Delete the existing file before writing new content
-                if local_path.exists():
-                    local_path.unlink()
+def render_export_jobs():
+    """Export job panel; while any job is running it refreshes itself every two seconds."""
+    from export_jobs import DONE, FAILED, get_export_runner
 
-                with gcs_fs.open(blob_path, "rb") as remote_file:
-                    content = remote_file.read()
-                    local_path.write_bytes(content)
-                    downloaded_files.append(local_path)
-                    print(f"✅ Downloaded: {local_path} ({len(content)} bytes)")
-                    time.sleep(1)  # Reduce throttling
+    jobs = get_export_runner().jobs(st.session_state.export_jobs)
 
+    @st.fragment(run_every=2 if any(job.active for job in jobs) else None)
+    def panel():
+        current = get_export_runner().jobs(st.session_state.export_jobs)
+        st.write("### Exports")
+        for job in reversed(current):
+            retries = f", {job.retries} retries" if job.retries else ""
+            if job.status == DONE:
+                st.success(f"✅ {job.label} ({job.seconds}s{retries}) [Open]({job.link})")
+            elif job.status == FAILED:
+                st.error(f"🚨 {job.label} failed: {job.error}")
             else:
-                print(f"⏩ Skipping (up-to-date): {blob_path}")
+                st.info(f"⏳ {job.label}: {job.status} ({job.seconds}s{retries})")
+        if any(job.active for job in jobs) and not any(job.active for job in current):
+            st.rerun()  # Stop polling once everything has finished
 
-        except Exception as e:
-            print(f"❌ Error downloading {blob_path}: {e}")
-
-    # Print local folder content
-    local_files = list(local_cache.glob("*"))
-    print(f"\n📂 Local 'analysis_workspace' now contains {len(local_files)} files:")
-    for f in local_files:
-        print(f"   - {f.name}")
+    panel()
 
-    if len(downloaded_files) == len(gcs_files) - 1:  # Subtract 1 because we skip the directory
-        print("\n✅ All files downloaded successfully.\n")
-    else:
-        print("\n⚠️ Some files are missing! Check logs.\n")
-
-    return local_cache
-
-
-# Authenticate with GCS
-def get_gcs_fs():
-    """Ensure GCS authentication is working"""
-    try:
-        service_account_b64 = st.secrets.gcs.service_account_b64
-        service_account_info = json.loads(base64.b64decode(service_account_b64).decode())
-
-        # Create credentials
-        credentials = service_account.Credentials.from_service_account_info(
-            service_account_info,
-            scopes=[
-                "https://www.googleapis.com/auth/devstorage.full_control",
-                "https://www.googleapis.com/auth/cloud-platform"
-            ]
-        )
-
-        gcs_fs = gcsfs.GCSFileSystem(token=credentials)
-        return gcs_fs
-    except Exception as e:
-        st.error(f"GCS Authentication Failed: {str(e)}")
-        st.stop()
 
+def start_project():
+    """Select the project typed into the sidebar, creating it on its first upload."""
+    slug = project_slug(st.session_state.new_project)
+    if slug:
+        st.session_state.current_project = slug
+    st.session_state.new_project = ""
 
 
 def main():
@@ -503,6 +435,18 @@ def main():
     initialize_session_state()
     validate_session()
 
+    # Sidebar: RFQ / project workspace. Company profiles and project history are shared by every project
+    current_project = st.session_state.get("current_project", SHARED)
+    projects = [SHARED] + sorted((set(list_projects()) | set(list_local_projects()) | {current_project}) - {SHARED})
+    project = st.sidebar.selectbox(
+        "RFQ / project:",
+        options=projects,
+        index=projects.index(current_project),
+        format_func=lambda slug: slug or "None (shared knowledge only)",
+    )
+    st.session_state.current_project = project
+    st.sidebar.text_input("Start a new RFQ / project", key="new_project", on_change=start_project)
+
     # List of sections
     sections = list(SECTION_KEYWORDS.values())
 
@@ -521,6 +465,9 @@ def main():
 
     # Get section and table name
     section, table_name = select_section(selected_section)
+    layer = layer_for(table_name, project)
+    if project and layer == SHARED:
+        st.sidebar.caption("📚 This section is shared company knowledge, used by every project.")
 
     # File uploader widget
     files = st.sidebar.file_uploader("Upload documents", accept_multiple_files=True, type=["pdf", "txt"])
@@ -532,6 +479,9 @@ def main():
     # Web links input
     web_links = st.sidebar.text_area("Enter web links (one per line)", key="web_links")
 
+    # Revised uploads of an existing file name replace it, re-processing only the changed chunks
+    reingest = st.sidebar.checkbox("Re-ingest revised versions of existing files", key="reingest_mode")
+
     # Ensure files_processed is in session state
     if "files_processed" not in st.session_state:
         st.session_state["files_processed"] = False
@@ -545,10 +495,10 @@ def main():
             file_name = file.name
 
             # Check if file exists in database or working directory
-            file_in_db = check_if_file_exists_in_section(file_name, section)
+            file_in_db = check_if_file_exists_in_section(file_name, section, project)
             dir_exists = check_working_directory(file_name, section)
 
-            if file_in_db and dir_exists:
+            if file_in_db and dir_exists and not reingest:
                 placeholder = st.empty()
                 placeholder.warning(f"The file '{file_name}' has already been processed and exists in the '{section}' section.")
                 time.sleep(5)
@@ -560,17 +510,17 @@ def main():
                 placeholder.empty()
 
                 # Process the files and links
-                process_files_and_links(files, web_links, section)  
+                process_files_and_links(files, web_links, section, reingest=reingest, project=project)
 
                 placeholder.write("✅ Files and links processed!")
                 time.sleep(5)  
                 placeholder.empty()
 
 
-    # Reset processing state and delete working directory
+    # Reset processing state and delete the selected project's working directory (the shared one without a project)
     if st.sidebar.button("Reset Processing", key="reset"):
-        # Clear session state except for initialized state
-        keys_to_keep = {"initialized"}
+        # Clear session state except for initialized state and the selected project
+        keys_to_keep = {"initialized", "current_project"}
         for key in list(st.session_state.keys()):
             if key not in keys_to_keep:
                 del st.session_state[key]
@@ -578,8 +528,11 @@ def main():
         # Reset processing flag
         st.session_state["files_processed"] = False
 
+        # Forget the layer's documents too, or the duplicate checks would skip every file uploaded again
+        deleted = delete_layer_files(project)
+
         # Define the working directory
-        working_dir = Path("./analysis_workspace")
+        working_dir = workspace_dir(project)
 
         # Delete the working directory if it exists
         if working_dir.exists() and working_dir.is_dir():
@@ -587,33 +540,23 @@ def main():
             shutil.rmtree(working_dir)
             st.sidebar.success("Processing reset! The working directory has been deleted.")
             st.rerun()
+        elif deleted:
+            st.sidebar.success(f"Processing reset! {deleted} stored files were removed.")
+            st.rerun()
         else:
             st.sidebar.warning("No working directory found to delete.")
     
 
     
-    if st.sidebar.button("📝 Save Proposal to Google Drive"):
+    st.sidebar.checkbox("Structured proposal output (JSON sections)", key="structured_output")
+    save_doc = st.sidebar.button("📝 Save Proposal to Google Drive")
+    save_pdf = st.sidebar.button("📄 Save Proposal as PDF to Google Drive")
+    if save_doc or save_pdf:
         if "drive_service" in st.session_state:
             del st.session_state.drive_service
 
         try:
-            credentials = json.loads(credentials_path.read_text())  # Load main JSON
-
-            # Decode the nested JSON inside "token"
-            if isinstance(credentials.get("token"), str):
-                credentials["token"] = json.loads(credentials["token"])
-
-            # Ensure the required keys exist
-            required_keys = {"client_id", "client_secret", "refresh_token"}
-            if not isinstance(credentials["token"], dict) or not required_keys.issubset(credentials["token"].keys()):
-                st.error("❗ Invalid credentials file. Please log in again.")
-                st.stop()
-
-            # ✅ Initialize services
-            creds = Credentials.from_authorized_user_info(credentials['token'])
-            docs_service = build("docs", "v1", credentials=creds)
-            drive_service = build("drive", "v3", credentials=creds)
-            drive_api = GoogleDriveAPI(drive_service)
+            credentials = load_export_credentials(credentials_path)
 
             # ✅ Validate proposal content
             if not st.session_state.get("proposal_text"):
@@ -621,53 +564,34 @@ def main():
                 time.sleep(2)
                 st.rerun()
 
-            # ✅ Retrieve the Google Docs template
-            template_name = "ProposalTemplate"
-            template_id = drive_api.get_template_id(template_name)
-            if not template_id:
-                raise ValueError(f"Error: Proposal template '{template_name}' not found in drive. Please verify the template exists.")
-
-            # ✅ Organize Google Drive folders
-            with st.spinner("Organizing Google Drive..."):
-                proposals_folder_id = drive_api.create_folder("Proposals")
-                date_folder_id = drive_api.create_folder(
-                    datetime.now().strftime("%Y-%m-%d"),
-                    parent_folder_id=proposals_folder_id
+            # ✅ Export in the background; the job panel below shows progress and the link
+            from export_jobs import submit_docs_export, submit_pdf_export
+
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            folder_name = datetime.now().strftime("%Y-%m-%d")
+            if save_doc:
+                job_id = submit_docs_export(
+                    credentials.get("email"),
+                    credentials["token"],
+                    st.session_state.get("proposal_sections") or parse_proposal_content(st.session_state.proposal_text),
+                    document_name=f"Proposal_{timestamp}",
+                    folder_name=folder_name,
                 )
-
-            # ✅ Create a new document from the template
-            with st.spinner("Generating professional document..."):
-                docs_helper = GoogleDocsHelper(docs_service, drive_service)
-                replacements = parse_proposal_content(st.session_state.proposal_text)
-                print("🔍 DEBUG: Replacements Dictionary")
-                for key, value in replacements.items():
-                    print(f"{key}: {value[:100]}...")
-
-                new_google_doc_id = docs_helper.create_from_template(
-                    template_id=template_id,
-                    replacements=replacements,
-                    document_name=f"Proposal_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            else:
+                job_id = submit_pdf_export(
+                    credentials, st.session_state.proposal_text, f"Proposal_{timestamp}.pdf", folder_name
                 )
-
-            # ✅ Move the new document to the correct folder
-            drive_service.files().update(
-                fileId=new_google_doc_id,
-                addParents=date_folder_id,
-                removeParents='root'
-            ).execute()
-
-            
-            st.sidebar(f"✅ Upload Successful! [View Document](https://docs.google.com/document/d/{new_google_doc_id}/view)")
-            # time.sleep(10)
-
-            # st.rerun()
+            st.session_state.setdefault("export_jobs", []).append(job_id)
+            st.sidebar.info("⏳ Export started. You can keep asking questions while it runs.")
 
         except Exception as e:
             st.error(f"🚨 Document creation failed: {str(e)}")
             st.error(traceback.format_exc())
 
-        
-            
+    if st.session_state.get("export_jobs"):
+        with st.sidebar:
+            render_export_jobs()
+
     # Logout
     if st.sidebar.button("Logout", key="main_logout"):
         st.session_state.force_refresh = True
@@ -682,43 +606,81 @@ def main():
         with st.chat_message("user" if role == "You" else "assistant"):
             st.write(message)
 
-    # Sidebar: Uploaded files display
+    # Sidebar: Uploaded files display (cached; only the current page gets Delete buttons)
     st.sidebar.write("### Uploaded Files")
     try:
-        conn = sqlite3.connect("files.db", check_same_thread=False)
-        cursor = conn.cursor()
-        cursor.execute(f'SELECT file_name FROM "{table_name}";')
-        uploaded_files_list = [file[0] for file in cursor.fetchall()]
+        name_filter = st.sidebar.text_input("Filter files", key=f"file_filter_{layer}_{table_name}").strip()
+        page_key = f"file_page_{layer}_{table_name}"
+        page = st.session_state.get(page_key, 0)
+        uploaded_files_list, total_files = list_file_page(table_name, name_filter, page, project=layer)
+        page_count = max(1, -(-total_files // LISTING_PAGE_SIZE))
+        if page >= page_count:
+            page = st.session_state[page_key] = page_count - 1
+            uploaded_files_list, total_files = list_file_page(table_name, name_filter, page, project=layer)
 
         if uploaded_files_list:
             for file_name in uploaded_files_list:
-                delete_key = f"delete_{table_name}_{file_name}"
+                delete_key = f"delete_{layer}_{table_name}_{file_name}"
                 col1, col2 = st.sidebar.columns([3, 1])
                 with col1:
                     st.sidebar.write(file_name)
                 with col2:
                     if st.sidebar.button("Delete", key=delete_key):
                         try:
-                            delete_file(file_name, table_name)
+                            delete_document_everywhere(file_name, table_name, project)
                             st.sidebar.success(f"File '{file_name}' deleted successfully!")
                         except Exception as e:
                             st.error(f"Failed to delete file '{file_name}': {e}")
+
+            if page_count > 1:
+                prev_col, info_col, next_col = st.sidebar.columns([1, 2, 1])
+                if prev_col.button("◀", key=f"prev_{page_key}", disabled=page == 0):
+                    st.session_state[page_key] = page - 1
+                    st.rerun()
+                info_col.caption(f"Page {page + 1} of {page_count} ({total_files} files)")
+                if next_col.button("▶", key=f"next_{page_key}", disabled=page >= page_count - 1):
+                    st.session_state[page_key] = page + 1
+                    st.rerun()
+        elif name_filter:
+            st.sidebar.info(f"No files match '{name_filter}'.")
         else:
             st.sidebar.info("No files uploaded for this section.")
     except Exception as e:
         st.sidebar.error(f"Failed to retrieve files: {e}")
 
-    # Sidebar: Breadcrumb display
-    uploaded_sections = get_uploaded_sections(SECTION_KEYWORDS)
-    if "uploaded_sections" not in st.session_state:
-        st.session_state.uploaded_sections = set()
-
-    if files:
-        st.session_state.uploaded_sections.add(section)
-
-    if st.session_state.uploaded_sections:
-        breadcrumb_text = " > ".join(sorted(st.session_state.uploaded_sections))
+    # Sidebar: Breadcrumb display (sections holding files for this project, from the listing cache)
+    uploaded_sections = get_uploaded_sections(SECTION_KEYWORDS, project)
+    if uploaded_sections:
+        breadcrumb_text = " > ".join(uploaded_sections)
         st.sidebar.info(f"📂 Sections with uploads: {breadcrumb_text}")
+
+    # Sidebar: LLM usage per pipeline stage
+    usage_rows = usage_tracker.rows()
+    if usage_rows:
+        with st.sidebar.expander(f"📊 LLM usage (~${usage_tracker.total_cost():.2f})"):
+            st.dataframe(usage_rows, hide_index=True)
+            try:
+                st.caption("Most expensive documents (last 30 days)")
+                st.dataframe(accounting.usage_report(by="document", kind="ingest", days=30, limit=10), hide_index=True)
+                st.caption("Most expensive queries (last 30 days)")
+                st.dataframe(accounting.usage_report(by="query", kind="query", days=30, limit=10), hide_index=True)
+            except Exception as e:
+                st.caption(f"Usage history unavailable: {e}")
+            scheduler_metrics = get_llm_scheduler().metrics()
+            st.caption("Rate limiter")
+            st.json(scheduler_metrics, expanded=False)
+
+    # Sidebar: p50 / p95 per traced stage over recent requests
+    stage_rows = tracing.stage_rows()
+    if stage_rows:
+        with st.sidebar.expander("📈 Stage latency"):
+            st.dataframe(stage_rows, hide_index=True)
+            st.caption(f"Spans in {tracing.TRACE_DIR / tracing.TRACE_LOG_NAME}, metrics in {tracing.TRACE_DIR / tracing.METRICS_NAME}")
+
+    # Sidebar: import and rerun timings
+    with st.sidebar.expander("⏱️ Startup profile"):
+        st.json(startup_profile.report(), expanded=False)
         
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with startup_profile.timed("script run"):
+        main()
\ No newline at end of file
@@ -2,9 +2,7 @@ import json
 from pathlib import Path
 import base64
 import streamlit as st
-from googleapiclient.discovery import build
 from streamlit_js import st_js, st_js_blocking
-from google_auth_oauthlib.flow import Flow
 
 
 # Function to retrieve data from local storage
@@ -216,6 +214,10 @@ def auth_flow():
     # Handle OAuth Authentication
     redirect_uri = "https://hospitalpolicies-mwh7xj6f6vuyvnhqwqkob5.streamlit.app"
     
+    # The OAuth and API client libraries are only needed when the user actually signs in
+    from google_auth_oauthlib.flow import Flow
+    from googleapiclient.discovery import build
+
     flow = Flow.from_client_config(client_config, scopes=scopes, redirect_uri=redirect_uri)
     auth_code = st.query_params.get("code")
 
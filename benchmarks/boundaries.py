@@ -0,0 +1,100 @@
+"""
+Boundary extraction benchmark for format_document.extract_relevant_content.
+
+Builds long synthetic model outputs around the borehole proposal's start and end lines: chatter
+before and after, sections of prose, bullets and a pricing table in between. The reference is the
+original implementation, which ran fuzzywuzzy's extractOne with partial_ratio over every line for
+each phrase and then located the winners with list.index. It is compared with the anchored
+detector on three variants: anchors present verbatim, anchors with markdown and "&" (normalized
+match), and anchors with typos (fuzzy fallback on heading-length lines only).
+
+Run from the repository root:
+    python -m benchmarks.boundaries [--lines 500 5000] [--repeat 3]
+"""
+import argparse
+import statistics
+import time
+
+from fuzzywuzzy import fuzz as legacy_fuzz
+from fuzzywuzzy import process as legacy_process
+
+import format_document
+from format_document import TEMPLATE_ANCHORS, extract_relevant_content
+
+START_LINE, END_LINE = TEMPLATE_ANCHORS["borehole"]
+
+
+# --- Original extractor, kept as the reference implementation ---
+
+def legacy_extract_relevant_content(text):
+    start_phrase = "Proposal for Borehole Drilling and Rehabilitation Services"
+    end_phrase = "Please let us know if there are any further details required or adjustments needed to this proposal."
+    text_lines = text.split("\n")
+    start_match = legacy_process.extractOne(start_phrase, text_lines, scorer=legacy_fuzz.partial_ratio)
+    end_match = legacy_process.extractOne(end_phrase, text_lines, scorer=legacy_fuzz.partial_ratio)
+    if start_match and start_match[1] > 80:
+        start_index = text_lines.index(start_match[0])
+    else:
+        raise ValueError(f"Start phrase not found. Closest match: {start_match}")
+    if end_match and end_match[1] > 80:
+        end_index = text_lines.index(end_match[0])
+    else:
+        raise ValueError(f"End phrase not found. Closest match: {end_match}")
+    return "\n".join(text_lines[start_index:end_index + 1])
+
+
+# --- Synthetic outputs ---
+
+def build_output(lines, start_line, end_line):
+    body = []
+    for i in range(lines):
+        kind = i % 10
+        if kind == 0:
+            body.append(f"Section {i // 10}: drilling programme for site {i}")
+        elif kind < 4:
+            body.append(f"- Item {i}: supply, drill and case borehole to 120 m depth, including yield testing and reporting.")
+        elif kind < 6:
+            body.append(f"| {i} | Borehole rehabilitation, site {i} | 1 | 2,500.00 | 2,500.00 |")
+        else:
+            body.append(f"The contractor will complete works at site {i} in line with the RFQ terms and safety standards.")
+    chatter = ["Sure! Here is the proposal you asked for.", ""]
+    return "\n".join(chatter + [start_line, ""] + body + ["", end_line, "", "Let me know if you need anything else."])
+
+
+VARIANTS = {
+    "verbatim": (START_LINE, END_LINE),
+    "markdown, &": ("## **Proposal for Borehole Drilling & Rehabilitation Services**", f"*{END_LINE}*"),
+    "typos": (
+        "Proposal for Borehole Drillng and Rehabilitaton Services",
+        "Please let us know if there are any furthr details required or adjustment needed to this proposal",
+    ),
+}
+
+
+def median_ms(extract, text, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = extract(text)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[500, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Fuzzy scorer: {format_document.fuzz.__name__}\n")
+    print(f"{'lines':>6} {'variant':12} | {'legacy':>11} {'anchored':>11} | speedup | same output")
+    for lines in args.lines:
+        for variant, (start_line, end_line) in VARIANTS.items():
+            text = build_output(lines, start_line, end_line)
+            legacy, expected = median_ms(legacy_extract_relevant_content, text, args.repeat)
+            anchored, result = median_ms(extract_relevant_content, text, args.repeat)
+            print(f"{lines:6d} {variant:12} | {legacy:9.1f}ms {anchored:9.2f}ms | {legacy / anchored:6.0f}x | {result == expected}")
+
+
+if __name__ == "__main__":
+    main()
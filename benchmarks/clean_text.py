@@ -0,0 +1,157 @@
+"""
+Equivalence check and micro-benchmark for utils.clean_text.
+
+Compares the precompiled single-pass normalizer against the original seven-pass
+pipeline on the analysis_workspace corpus (plus variants salted with bold/italic
+alphanumerics, emojis, mojibake and URLs) and fails if any output differs.
+
+Run from the repository root:
+    python -m benchmarks.clean_text [--repeat 20]
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+from unstructured.cleaners.core import clean, clean_non_ascii_chars, replace_unicode_quotes
+
+from utils import clean_text, clean_texts
+
+CORPUS_PATH = Path("./analysis_workspace/kv_store_full_docs.json")
+
+
+# --- Original pipeline, kept verbatim as the reference implementation ---
+
+def legacy_unbold_text(text):
+    bold_numbers = {
+        "𝟬": "0", "𝟭": "1", "𝟮": "2", "𝟯": "3", "𝟰": "4",
+        "𝟱": "5", "𝟲": "6", "𝟳": "7", "𝟴": "8", "𝟵": "9",
+    }
+
+    def convert_bold_char(match):
+        char = match.group(0)
+        if char in bold_numbers:
+            return bold_numbers[char]
+        elif "\U0001d5d4" <= char <= "\U0001d5ed":
+            return chr(ord(char) - 0x1D5D4 + ord("A"))
+        elif "\U0001d5ee" <= char <= "\U0001d607":
+            return chr(ord(char) - 0x1D5EE + ord("a"))
+        else:
+            return char
+
+    bold_pattern = re.compile(
+        r"[\U0001D5D4-\U0001D5ED\U0001D5EE-\U0001D607\U0001D7CE-\U0001D7FF]"
+    )
+    return bold_pattern.sub(convert_bold_char, text)
+
+
+def legacy_unitalic_text(text):
+    def convert_italic_char(match):
+        char = match.group(0)
+        if "\U0001d608" <= char <= "\U0001d621":
+            return chr(ord(char) - 0x1D608 + ord("A"))
+        elif "\U0001d622" <= char <= "\U0001d63b":
+            return chr(ord(char) - 0x1D622 + ord("a"))
+        else:
+            return char
+
+    italic_pattern = re.compile(r"[\U0001D608-\U0001D621\U0001D622-\U0001D63B]")
+    return italic_pattern.sub(convert_italic_char, text)
+
+
+def legacy_remove_emojis_and_symbols(text):
+    emoji_and_symbol_pattern = re.compile(
+        "["
+        "\U0001f600-\U0001f64f"
+        "\U0001f300-\U0001f5ff"
+        "\U0001f680-\U0001f6ff"
+        "\U0001f1e0-\U0001f1ff"
+        "\U00002193"
+        "\U000021b3"
+        "\U00002192"
+        "]+",
+        flags=re.UNICODE,
+    )
+    return emoji_and_symbol_pattern.sub(r" ", text)
+
+
+def legacy_replace_urls_with_placeholder(text, placeholder="[URL]"):
+    return re.sub(r"https?://\S+|www\.\S+", placeholder, text)
+
+
+def legacy_clean_text(text_content):
+    cleaned_text = legacy_unbold_text(text_content)
+    cleaned_text = legacy_unitalic_text(cleaned_text)
+    cleaned_text = legacy_remove_emojis_and_symbols(cleaned_text)
+    cleaned_text = clean(cleaned_text)
+    cleaned_text = replace_unicode_quotes(cleaned_text)
+    cleaned_text = clean_non_ascii_chars(cleaned_text)
+    cleaned_text = legacy_replace_urls_with_placeholder(cleaned_text)
+    return cleaned_text
+
+
+# --- Corpus ---
+
+_SALT = [
+    "𝗕𝗼𝗹𝗱 𝗛𝗲𝗮𝗱𝗶𝗻𝗴 𝟮𝟬𝟮𝟰", "𝘐𝘵𝘢𝘭𝘪𝘤 𝘯𝘰𝘵𝘦", "𝟘𝟙 double-struck", "🚀🔥 launch", "→ next ↓ ↳",
+    "it&apos;s", "donâ\x80\x99t", "whatâ\x80?s", "\x93quoted\x94", "see https://example.org/a?b=1 or www.cdga.ie",
+    "€1,200 • café – naïve", " padded ", "&ap€os;", "🇮🇪",
+]
+
+
+def load_corpus():
+    docs = [doc["content"] for doc in json.loads(CORPUS_PATH.read_text(encoding="utf-8")).values()]
+    salted = []
+    for doc in docs:
+        lines = doc.split("\n")
+        for i, salt in enumerate(_SALT):
+            lines.insert((i * 37) % max(len(lines), 1), salt)
+        salted.append("  " + "\n".join(lines) + " 🚀 ")
+    return docs, salted + _SALT + [""]
+
+
+def verify(texts):
+    mismatches = [text for text in texts if clean_text(text) != legacy_clean_text(text)]
+    if mismatches:
+        sample = mismatches[0][:200]
+        raise AssertionError(f"{len(mismatches)} of {len(texts)} texts differ from the legacy pipeline, e.g. {sample!r}")
+    if clean_texts(texts) != [legacy_clean_text(text) for text in texts]:
+        raise AssertionError("clean_texts differs from the legacy pipeline")
+    return len(texts)
+
+
+def best_of(func, texts, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(texts)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    docs, salted = load_corpus()
+    checked = verify(docs + salted)
+    print(f"✅ {checked} texts byte-identical to the legacy pipeline")
+
+    total_chars = sum(len(doc) for doc in docs + salted)
+    for label, texts in (("workspace corpus", docs), ("salted corpus", salted)):
+        legacy = best_of(lambda batch: [legacy_clean_text(t) for t in batch], texts, args.repeat)
+        single = best_of(lambda batch: [clean_text(t) for t in batch], texts, args.repeat)
+        batch = best_of(clean_texts, texts, args.repeat)
+        chars = sum(len(t) for t in texts)
+        print(
+            f"{label:18} {len(texts):3} texts {chars / 1e6:6.2f} MB | "
+            f"legacy {legacy * 1e3:8.2f} ms | clean_text {single * 1e3:8.2f} ms | "
+            f"clean_texts {batch * 1e3:8.2f} ms | speedup x{legacy / single:5.1f}"
+        )
+    print(f"total characters checked: {total_chars}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Export latency benchmark for "Save Proposal to Google Drive" against stubbed Docs and Drive services.
+
+The stubs keep an in-memory Drive (template, folders, copies) and charge every executed request a
+fixed round-trip latency, and every build() a construction cost. The reference is the original
+button handler: two build() calls, template lookup, two folder list/create calls, copy into My Drive,
+a debug documents().get, batchUpdate and a files().update to move the copy. It is compared with
+ProposalExporter on a cold cache and on a warm cache, and with a cached template that was deleted.
+
+Run from the repository root:
+    python -m benchmarks.drive_export [--latency-ms 120] [--build-ms 80] [--exports 5]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from googleapiclient.discovery import Resource
+from googleapiclient.errors import HttpError
+
+from google_docs_helper import DriveIdCache, GoogleDocsHelper, GoogleDriveAPI, ProposalExporter
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+DOC_MIME = "application/vnd.google-apps.document"
+
+
+# --- Stubbed services ---
+
+class _Response(dict):
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = "stub"
+
+
+class FakeDrive:
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.files = {"template": {"name": "ProposalTemplate", "mimeType": DOC_MIME, "parents": ["root"]}}
+        self._ids = itertools.count()
+
+    def call(self, result):
+        self.requests += 1
+        time.sleep(self.latency)
+        return result()
+
+    def not_found(self, file_id):
+        return HttpError(_Response(404), f'{{"error": "File not found: {file_id}"}}'.encode())
+
+
+class _Request:
+    def __init__(self, drive, result):
+        self.drive, self.result = drive, result
+
+    def execute(self):
+        return self.drive.call(self.result)
+
+
+class _Files:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def list(self, q, fields=None, spaces=None):
+        name = re.search(r"name='([^']*)'", q).group(1)
+        mime = re.search(r"mimeType='([^']*)'", q).group(1)
+        parent = re.search(r"'([^']*)' in parents", q)
+
+        def result():
+            return {"files": [
+                {"id": file_id, "name": meta["name"], "mimeType": meta["mimeType"]}
+                for file_id, meta in self.drive.files.items()
+                if meta["name"] == name and meta["mimeType"] == mime and (not parent or parent.group(1) in meta["parents"])
+            ]}
+        return _Request(self.drive, result)
+
+    def create(self, body, fields=None):
+        def result():
+            file_id = f"file-{next(self.drive._ids)}"
+            self.drive.files[file_id] = {"name": body["name"], "mimeType": body["mimeType"], "parents": body.get("parents") or ["root"]}
+            return {"id": file_id}
+        return _Request(self.drive, result)
+
+    def copy(self, fileId, body, fields=None):
+        def result():
+            if fileId not in self.drive.files or any(p not in self.drive.files for p in body.get("parents", [])):
+                raise self.drive.not_found(fileId)
+            file_id = f"doc-{next(self.drive._ids)}"
+            self.drive.files[file_id] = {"name": body["name"], "mimeType": DOC_MIME, "parents": body.get("parents", ["root"])}
+            return {"id": file_id}
+        return _Request(self.drive, result)
+
+    def update(self, fileId, addParents=None, removeParents=None, fields=None):
+        def result():
+            self.drive.files[fileId]["parents"] = [addParents]
+            return {"id": fileId}
+        return _Request(self.drive, result)
+
+
+class _Documents:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def get(self, documentId):
+        return _Request(self.drive, lambda: {"body": {"content": [
+            {"paragraph": {"elements": [{"textRun": {"content": "{INTRODUCTION_CONTENT}\n"}}]}}
+        ]}})
+
+    def batchUpdate(self, documentId, body):
+        return _Request(self.drive, lambda: {"replies": [{} for _ in body["requests"]]})
+
+
+class StubDriveService(Resource):
+    def __init__(self, drive):  # Resource.__init__ needs a discovery document; the stub does not
+        self._drive = drive
+
+    def files(self):
+        return _Files(self._drive)
+
+
+class StubDocsService(Resource):
+    def __init__(self, drive):
+        self._drive = drive
+
+    def documents(self):
+        return _Documents(self._drive)
+
+
+def stub_build(kind, drive, build_seconds):
+    time.sleep(build_seconds)  # Discovery document parsing and client construction
+    return StubDocsService(drive) if kind == "docs" else StubDriveService(drive)
+
+
+# --- Original button handler, kept as the reference implementation ---
+
+def legacy_export(drive, build_seconds, replacements):
+    docs_service = stub_build("docs", drive, build_seconds)
+    drive_service = stub_build("drive", drive, build_seconds)
+    drive_api = GoogleDriveAPI(drive_service)
+    template_id = drive_api.get_template_id("ProposalTemplate")
+    proposals_folder_id = drive_api.create_folder("Proposals")
+    date_folder_id = drive_api.create_folder("2025-01-01", parent_folder_id=proposals_folder_id)
+    docs_helper = GoogleDocsHelper(docs_service, drive_service)
+    new_google_doc_id = docs_helper.create_from_template(template_id, replacements, "Proposal", debug=True)
+    drive_service.files().update(fileId=new_google_doc_id, addParents=date_folder_id, removeParents="root").execute()
+    return new_google_doc_id
+
+
+# --- Benchmark ---
+
+def measure(label, drive, runs, export):
+    latencies, requests = [], []
+    for _ in range(runs):
+        before = drive.requests
+        start = time.perf_counter()
+        export()
+        latencies.append(time.perf_counter() - start)
+        requests.append(drive.requests - before)
+    print(f"{label:34} median {statistics.median(latencies) * 1000:7.0f} ms | {statistics.median(requests):4.0f} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=120, help="Round trip per executed request")
+    parser.add_argument("--build-ms", type=float, default=80, help="Cost of one build() call")
+    parser.add_argument("--exports", type=int, default=5)
+    args = parser.parse_args()
+
+    latency, build_seconds = args.latency_ms / 1000, args.build_ms / 1000
+    replacements = {f"SECTION_{i}_CONTENT": "text " * 200 for i in range(11)}
+    drive = FakeDrive(latency)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        def quiet_legacy_export():
+            with contextlib.redirect_stdout(io.StringIO()):  # The legacy debug fetch prints the whole document
+                return legacy_export(drive, build_seconds, replacements)
+
+        measure("legacy handler", drive, args.exports, quiet_legacy_export)
+
+        cache_path = Path(scratch) / "drive_ids.json"
+        services = {}
+
+        def export(cache):
+            # Services are built once per user and reused, as get_google_services does
+            if not services:
+                services["docs"] = stub_build("docs", drive, build_seconds)
+                services["drive"] = stub_build("drive", drive, build_seconds)
+            return ProposalExporter(services["docs"], services["drive"], "user@example.com", cache=cache).export(
+                replacements, "Proposal", "2025-01-02"
+            )
+
+        measure("exporter, cold (first export)", drive, 1, lambda: export(DriveIdCache(cache_path)))
+        measure("exporter, warm cache", drive, args.exports, lambda: export(DriveIdCache(cache_path)))
+
+        # The template is deleted and re-created: the cached id 404s once, then is resolved again
+        drive.files["template-2"] = drive.files.pop("template")
+        measure("exporter, stale template id", drive, 1, lambda: export(DriveIdCache(cache_path)))
+        measure("exporter, warm again", drive, args.exports, lambda: export(DriveIdCache(cache_path)))
+
+
+if __name__ == "__main__":
+    main()
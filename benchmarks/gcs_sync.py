@@ -0,0 +1,205 @@
+"""
+Workspace upload benchmark against a local fake of the GCS bucket.
+
+The fake bucket stores objects in a scratch directory and charges every request a round-trip
+latency plus transfer time at a fixed bandwidth, and every new client an authentication delay.
+The reference is the original storage helper pattern: a new client per upload and every workspace
+file sent sequentially, uncompressed. It is compared with storage.push_workspace (one client,
+parallel per-file uploads, gzip for JSON and GraphML), a second push after a one-file change,
+and storage.pull_workspace into an empty directory.
+
+Run from the repository root:
+    python -m benchmarks.gcs_sync [--workspace ./analysis_workspace] [--latency-ms 40] [--mbps 40]
+"""
+import argparse
+import gzip
+import json
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import storage
+
+# --- Local fake bucket ---
+
+
+class FakeNetwork:
+    def __init__(self, latency_ms, mbps, client_ms):
+        self.latency = latency_ms / 1000
+        self.bytes_per_second = mbps * 1_000_000 / 8
+        self.client_seconds = client_ms / 1000
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def request(self, size=0):
+        with self._lock:
+            self.requests += 1
+            self.bytes += size
+        time.sleep(self.latency + size / self.bytes_per_second)
+
+
+class FakeBlob:
+    def __init__(self, bucket, name, chunk_size=None):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = chunk_size
+        self.metadata = None
+        self.content_type = None
+        self.content_encoding = None
+
+    @property
+    def _path(self):
+        return self.bucket.root / self.name
+
+    def _store(self, data):
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._path.write_bytes(data)
+        self._path.with_name(self._path.name + ".meta").write_text(json.dumps(
+            {"metadata": self.metadata, "content_type": self.content_type, "content_encoding": self.content_encoding}
+        ))
+
+    def upload_from_file(self, file_obj, size=None, content_type=None):
+        data = file_obj.read() if size is None else file_obj.read(size)
+        self.content_type = content_type
+        if self.chunk_size:
+            # Resumable session: one request to open it, one per chunk
+            self.bucket.network.request()
+            for offset in range(0, len(data), self.chunk_size):
+                self.bucket.network.request(len(data[offset:offset + self.chunk_size]))
+        else:
+            self.bucket.network.request(len(data))
+        self._store(data)
+
+    def upload_from_string(self, data, content_type=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.content_type = content_type
+        self.bucket.network.request(len(data))
+        self._store(data)
+
+    def compose(self, sources):
+        self.bucket.network.request()
+        self._store(b"".join(source._path.read_bytes() for source in sources))
+
+    def delete(self):
+        self.bucket.network.request()
+        self._path.unlink()
+        self._path.with_name(self._path.name + ".meta").unlink()
+
+    def download_to_filename(self, filename):
+        data = self._path.read_bytes()
+        self.bucket.network.request(len(data))
+        if self.content_encoding == "gzip":
+            data = gzip.decompress(data)  # Decompressive transcoding, as the real client does
+        Path(filename).write_bytes(data)
+
+
+class FakeBucket:
+    def __init__(self, root, network, name="fake-bucket"):
+        self.root = Path(root)
+        self.network = network
+        self.name = name
+
+    def blob(self, name, chunk_size=None):
+        return FakeBlob(self, name, chunk_size)
+
+    def list_blobs(self, prefix=""):
+        self.network.request()
+        blobs = []
+        for path in sorted(self.root.rglob("*")):
+            if not path.is_file() or path.name.endswith(".meta"):
+                continue
+            name = path.relative_to(self.root).as_posix()
+            if not name.startswith(prefix):
+                continue
+            blob = FakeBlob(self, name)
+            meta = json.loads(path.with_name(path.name + ".meta").read_text())
+            blob.metadata, blob.content_type, blob.content_encoding = meta["metadata"], meta["content_type"], meta["content_encoding"]
+            blobs.append(blob)
+        return blobs
+
+
+class FakeClient:
+    def __init__(self, root, network):
+        network.request()
+        time.sleep(network.client_seconds)  # Credential parsing and token exchange
+        self._bucket = FakeBucket(root, network)
+
+    def bucket(self, name):
+        return self._bucket
+
+
+# --- Original pattern, kept as the reference implementation ---
+
+def legacy_push(workspace, root, network):
+    content_types = {"json": "application/json", "graphml": "application/xml"}
+    for path in sorted(Path(workspace).iterdir()):
+        if not path.is_file():
+            continue
+        storage_client = FakeClient(root, network)  # get_storage_client() built a new client every call
+        bucket = storage_client.bucket(storage.BUCKET_NAME)
+        blob = bucket.blob(f"{storage.WORKSPACE_PREFIX}/{path.name}")
+        content_type = content_types.get(path.suffix.lstrip("."), "application/octet-stream")
+        with open(path, "rb") as uploaded_file:
+            blob.upload_from_file(uploaded_file, content_type=content_type)
+
+
+# --- Benchmark ---
+
+def timed(label, network, action):
+    requests, sent = network.requests, network.bytes
+    start = time.perf_counter()
+    result = action()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:28} {elapsed:7.2f} s | {network.requests - requests:4d} requests | "
+        f"{(network.bytes - sent) / 1e6:7.2f} MB transferred"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workspace", default="./analysis_workspace")
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--mbps", type=float, default=40, help="Simulated upstream bandwidth in megabits per second")
+    parser.add_argument("--client-ms", type=float, default=150, help="Simulated cost of creating an authenticated client")
+    args = parser.parse_args()
+
+    network = FakeNetwork(args.latency_ms, args.mbps, args.client_ms)
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch = Path(scratch)
+        workspace = scratch / "workspace"
+        shutil.copytree(args.workspace, workspace, ignore=shutil.ignore_patterns(storage.MANIFEST_NAME))
+        total = sum(path.stat().st_size for path in workspace.iterdir() if path.is_file())
+        print(f"Workspace: {len(list(workspace.iterdir()))} files, {total / 1e6:.2f} MB\n")
+
+        timed("legacy: sequential, plain", network, lambda: legacy_push(workspace, scratch / "legacy", network))
+
+        bucket = FakeClient(scratch / "pooled", network).bucket(storage.BUCKET_NAME)
+        timed("push: all files", network, lambda: storage.push_workspace(workspace, bucket=bucket))
+
+        # One store changes, as after a small ingest
+        touched = workspace / "kv_store_doc_status.json"
+        if touched.exists():
+            touched.write_text(touched.read_text() + "\n")
+        timed("push: one file changed", network, lambda: storage.push_workspace(workspace, bucket=bucket))
+        timed("push: nothing changed", network, lambda: storage.push_workspace(workspace, bucket=bucket))
+
+        pulled = scratch / "pulled"
+        timed("pull: empty directory", network, lambda: storage.pull_workspace(pulled, bucket=bucket))
+        timed("pull: up to date", network, lambda: storage.pull_workspace(pulled, bucket=bucket))
+
+        mismatched = [
+            path.name for path in workspace.iterdir()
+            if path.is_file() and path.name != storage.MANIFEST_NAME
+            and path.read_bytes() != (pulled / path.name).read_bytes()
+        ]
+        print(f"\nRound trip: {'identical' if not mismatched else f'MISMATCH in {mismatched}'}")
+
+
+if __name__ == "__main__":
+    main()
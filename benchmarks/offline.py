@@ -0,0 +1,332 @@
+"""
+Offline end-to-end benchmark with deterministic fake LLM and embedding backends.
+
+RAGFactory is switched to fake functions (RAGFactory.use_backends) so nothing is sent to OpenAI:
+the LLM answers each LightRAG stage in the format LightRAG parses (entities and relationships
+picked from the capitalised phrases of each chunk, keyword JSON, a proposal with every section),
+and the embeddings hash each word to a few seeded signed dimensions, so texts sharing words are
+close and every run produces the same vectors. Both wait a configurable artificial latency.
+
+On a scratch copy of the analysis_workspace fixture it measures, in order:
+  workspace load   LightRAG instance creation, which loads the KV stores, vector DBs and graph
+  ingest           the temp_files PDFs extracted, chunked and inserted (pages and chunks per second)
+  query            latency per query mode over a fixed set of questions, each asked once per mode
+  proposal         parse_proposal_content and create_pdf on a generated answer
+and the peak RSS of the process after each phase. Results are printed, and written as JSON with
+--output; --baseline compares with an earlier JSON file.
+
+Run from the repository root:
+    python -m benchmarks.offline [--llm-latency 0.05] [--embed-latency 0.01] [--output results.json]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import platform
+import re
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from chunker import chunk_document
+from document_processor import DocumentProcessor
+from google_drive_helper import create_pdf
+from llm_routing import DESCRIPTION_SUMMARY, ENTITY_EXTRACTION, KEYWORD_EXTRACTION, detect_stage
+from proposal_parser import PROPOSAL_SECTIONS, parse_proposal_content
+from rag_factory import RAGFactory
+from utils import clean_text
+
+WORKSPACE = Path("./analysis_workspace")
+PDF_DIR = Path("./temp_files")
+EMBEDDING_DIM = 3072  # Matches the fixture's vector DBs
+QUERY_MODES = ("naive", "local", "global", "hybrid", "mix")
+QUERIES = (
+    "What is the scope of the borehole drilling and rehabilitation works?",
+    "Which documents and certificates must the bidder submit with the proposal?",
+    "What are the technical evaluation criteria and their weights?",
+    "What is the delivery schedule and the deadline for submission?",
+    "What experience and qualifications are required from the contractor?",
+)
+START_LINE = "Proposal for Borehole Drilling and Rehabilitation Services"
+END_LINE = "Please let us know if there are any further details required or adjustments needed to this proposal."
+
+_WORD = re.compile(r"[a-z0-9]+")
+_PHRASE = re.compile(r"\b[A-Z][A-Za-z0-9&-]{2,}(?: [A-Z][A-Za-z0-9&-]+){0,3}")
+_PAGE_MARKER = re.compile(r"^\[Page \d+\]$", re.MULTILINE)
+_ENTITY_TYPES = ("organization", "location", "event", "category")
+
+
+# --- Fake backends ---
+
+class FakeBackends:
+    """Deterministic stand-ins for the OpenAI LLM and embeddings, counting calls per stage."""
+
+    def __init__(self, llm_latency=0.05, embed_latency=0.01, seed=0, entities_per_chunk=8, hashes_per_word=8):
+        self.llm_latency = llm_latency
+        self.embed_latency = embed_latency
+        self.seed = seed
+        self.entities_per_chunk = entities_per_chunk
+        self.hashes_per_word = hashes_per_word
+        self.calls = Counter()
+        self._word_dims = {}
+
+    # Embeddings: each word adds +-1 on a few dimensions chosen by a seeded hash of the word
+    def _dims(self, word):
+        dims = self._word_dims.get(word)
+        if dims is None:
+            digest = hashlib.blake2b(f"{self.seed}:{word}".encode(), digest_size=4 * self.hashes_per_word).digest()
+            values = np.frombuffer(digest, dtype=np.uint32)
+            dims = (values % EMBEDDING_DIM, np.where(values & 1 << 31, 1.0, -1.0))
+            self._word_dims[word] = dims
+        return dims
+
+    def embed_one(self, text):
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for word, count in Counter(_WORD.findall(text.lower())).items():
+            dims, signs = self._dims(word)
+            np.add.at(vector, dims, signs * count)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def embedding_func(self, texts):
+        self.calls["embedding"] += 1
+        await asyncio.sleep(self.embed_latency)
+        return np.array([self.embed_one(text) for text in texts])
+
+    # LLM: one canned answer shape per pipeline stage
+    async def llm_model_func(self, prompt, system_prompt=None, history_messages=[], keyword_extraction=False, **kwargs):
+        from lightrag.prompt import PROMPTS
+
+        stage = detect_stage(prompt, system_prompt, history_messages, keyword_extraction)
+        self.calls[stage] += 1
+        await asyncio.sleep(self.llm_latency)
+        if stage == KEYWORD_EXTRACTION:
+            return self._keywords(prompt)
+        if stage == DESCRIPTION_SUMMARY:
+            return prompt.rsplit("Description List:", 1)[-1].split("#######", 1)[0].strip()[:600]
+        if stage == ENTITY_EXTRACTION:
+            if history_messages:
+                # Gleaning: nothing was missed, stop looping
+                return "no" if prompt == PROMPTS["entiti_if_loop_extraction"] else PROMPTS["DEFAULT_COMPLETION_DELIMITER"]
+            return self._entities(prompt, PROMPTS)
+        return self._proposal(system_prompt or prompt)
+
+    def _keywords(self, prompt):
+        query = prompt.rsplit("Current Query:", 1)[-1].split("######", 1)[0]
+        words = [word for word in _WORD.findall(query.lower()) if len(word) > 3]
+        return json.dumps({"high_level_keywords": words[:3], "low_level_keywords": words[3:8]})
+
+    def _entities(self, prompt, prompts):
+        text = prompt.rsplit("Text:", 1)[-1].rsplit("######################", 1)[0]
+        names = list(dict.fromkeys(match.upper() for match in _PHRASE.findall(text)))[:self.entities_per_chunk]
+        tuple_delimiter = prompts["DEFAULT_TUPLE_DELIMITER"]
+        records = [
+            f'("entity"{tuple_delimiter}"{name}"{tuple_delimiter}"{_ENTITY_TYPES[i % len(_ENTITY_TYPES)]}"'
+            f'{tuple_delimiter}"{name.title()} as mentioned in the tender documents.")'
+            for i, name in enumerate(names)
+        ]
+        records += [
+            f'("relationship"{tuple_delimiter}"{source}"{tuple_delimiter}"{target}"{tuple_delimiter}'
+            f'"{source.title()} appears alongside {target.title()}."{tuple_delimiter}"co-occurrence"{tuple_delimiter}5)'
+            for source, target in zip(names, names[1:])
+        ]
+        return prompts["DEFAULT_RECORD_DELIMITER"].join(records) + prompts["DEFAULT_COMPLETION_DELIMITER"]
+
+    def _proposal(self, context):
+        words = _WORD.findall(context.lower())[:2000] or ["borehole"]
+        lines = [START_LINE, ""]
+        for i, title in enumerate(PROPOSAL_SECTIONS.values()):
+            sentence = " ".join(words[(i * 40) % len(words):][:40])
+            lines += [f"## {title}", "", f"{sentence.capitalize()}.", f"- {words[i % len(words)].capitalize()} item", ""]
+        return "\n".join(lines + [END_LINE])
+
+
+# --- Measurements ---
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1e6 if sys.platform == "darwin" else 1e3), 1)  # bytes on macOS, KiB on Linux
+
+
+def summarize_ms(samples):
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 2),
+        "p95_ms": round(samples[max(0, -(-len(samples) * 95 // 100) - 1)] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+def bench_load(workspace, repeat):
+    import lightrag  # noqa: F401 - imported once here so the load timings do not include it
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rag = RAGFactory.create_rag(str(workspace))
+        samples.append(time.perf_counter() - start)
+    return rag, summarize_ms(samples)
+
+
+def bench_ingest(rag, pdfs, section):
+    from workspace_ops import insert_document
+
+    processor = DocumentProcessor()
+    pages = chunks = 0
+    timings = Counter()
+    for pdf in pdfs:
+        start = time.perf_counter()
+        text = processor.extract_text_and_tables_from_pdf(str(pdf))
+        pages += len(_PAGE_MARKER.findall(text))
+        content = clean_text(text)
+        timings["extract_s"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        document_chunks, _ = chunk_document(content, section)
+        chunks += len(document_chunks)
+        timings["chunk_s"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        insert_document(rag, content, document_chunks)
+        timings["insert_s"] += time.perf_counter() - start
+    total = sum(timings.values())
+    return {
+        "documents": len(pdfs),
+        "pages": pages,
+        "chunks": chunks,
+        **{name: round(seconds, 3) for name, seconds in timings.items()},
+        "total_s": round(total, 3),
+        "pages_per_s": round(pages / total, 2) if total else None,
+        "chunks_per_s": round(chunks / total, 2) if total else None,
+    }
+
+
+def bench_queries(rag, modes, queries):
+    from lightrag import QueryParam
+
+    results, answers = {}, {}
+    for mode in modes:
+        samples = []
+        try:
+            for query in queries:
+                start = time.perf_counter()
+                answers[mode] = rag.query(query, QueryParam(mode=mode))
+                samples.append(time.perf_counter() - start)
+        except Exception as e:
+            # Some LightRAG releases break individual modes; report it and measure the others
+            results[mode] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        results[mode] = summarize_ms(samples)
+    return results, answers
+
+
+def bench_proposal(answer, repeat, scratch):
+    parse_samples, pdf_samples = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_proposal_content(answer)
+        parse_samples.append(time.perf_counter() - start)
+    pdf_path = Path(scratch) / "proposal.pdf"
+    for _ in range(repeat):
+        start = time.perf_counter()
+        create_pdf(str(pdf_path), answer)
+        pdf_samples.append(time.perf_counter() - start)
+    return {
+        "answer_chars": len(answer),
+        "parse_proposal_content": summarize_ms(parse_samples),
+        "create_pdf": summarize_ms(pdf_samples),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, path=()):
+    """(metric path, baseline, current) for every number in both result trees."""
+    for key, value in results.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            yield from compare(value, old, path + (key,))
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and not isinstance(value, bool):
+            yield ".".join(path + (key,)), old, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds each fake LLM call waits")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="Seconds each fake embedding batch waits")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the fake embedding vectors")
+    parser.add_argument("--section", default="rfp_documents", help="Section table whose chunking profile is used")
+    parser.add_argument("--modes", nargs="+", choices=QUERY_MODES, default=list(QUERY_MODES))
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of the load, parse and PDF timings")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="Earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    backends = FakeBackends(args.llm_latency, args.embed_latency, args.seed)
+    RAGFactory.use_backends(backends.llm_model_func, backends.embedding_func)
+    pdfs = sorted(PDF_DIR.glob("*.pdf"))
+
+    results = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "llm_latency_s": args.llm_latency,
+            "embed_latency_s": args.embed_latency,
+            "seed": args.seed,
+            "section": args.section,
+        },
+        "peak_rss_mb": {"start": peak_rss_mb()},
+    }
+    with tempfile.TemporaryDirectory() as scratch:
+        workspace = Path(scratch) / "workspace"
+        shutil.copytree(WORKSPACE, workspace)
+
+        rag, results["workspace_load"] = bench_load(workspace, args.repeat)
+        results["peak_rss_mb"]["workspace_load"] = peak_rss_mb()
+
+        backends.calls.clear()
+        results["ingest"] = bench_ingest(rag, pdfs, args.section)
+        results["ingest"]["fake_calls"] = dict(backends.calls)
+        results["peak_rss_mb"]["ingest"] = peak_rss_mb()
+
+        backends.calls.clear()
+        results["query"], answers = bench_queries(rag, args.modes, QUERIES)
+        results["query_fake_calls"] = dict(backends.calls)
+        results["peak_rss_mb"]["query"] = peak_rss_mb()
+
+        answer = answers.get("hybrid") or next(iter(answers.values()))
+        results["proposal"] = bench_proposal(answer, args.repeat, scratch)
+        results["peak_rss_mb"]["proposal"] = peak_rss_mb()
+    RAGFactory.use_backends()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}", file=sys.stderr)
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        print(f"\n{'metric':48} {'baseline':>12} {'current':>12} {'change':>8}", file=sys.stderr)
+        for metric, old, new in compare(results, baseline):
+            change = f"{(new - old) / old:+.0%}" if old else ""
+            print(f"{metric:48} {old:12g} {new:12g} {change:>8}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+PDF rendering benchmark for create_pdf on synthetic proposals with a large pricing table.
+
+Each proposal has the borehole proposal start and end lines extract_relevant_content looks for,
+a few sections of text and bullets, and a commercial table of N rows written as pipe rows. With
+--format pipe the rows have no |---| line, so markdown2 leaves them as text, which is what the
+original renderer handled: every pipe line rebuilt a table from all pipe lines in the document,
+so it emitted N tables of N rows. It is kept inline as the reference and only run up to
+--legacy-max-rows. With --format markdown the rows are a markdown table rendered as <table>.
+
+The fuzzy extract_relevant_content step that create_pdf runs first is the same for both and is
+timed once on its own; the renderers are then given its output. Reported per render: wall time,
+peak Python memory (tracemalloc), Table pieces drawn and PDF size.
+
+Run from the repository root:
+    python -m benchmarks.pdf_render [--rows 100 1000] [--format pipe] [--legacy-max-rows 100]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import markdown2
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from format_document import extract_relevant_content
+from google_drive_helper import render_pdf
+
+START_LINE = "Proposal for Borehole Drilling and Rehabilitation Services"
+END_LINE = "Please let us know if there are any further details required or adjustments needed to this proposal."
+
+
+# --- Original create_pdf rendering, kept as the reference implementation ---
+
+def legacy_render_pdf(file_path, relevant_content):
+    html_content = markdown2.markdown(relevant_content, extras=["tables"])
+    doc = SimpleDocTemplate(file_path, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = []
+    lines = html_content.split("\n")
+    for line in lines:
+        if line.startswith("<h1>"):
+            story.append(Paragraph(line[4:-5], styles["Title"]))
+            story.append(Spacer(1, 12))
+        elif line.startswith("<h2>"):
+            story.append(Paragraph(line[4:-5], styles["Heading2"]))
+            story.append(Spacer(1, 10))
+        elif line.startswith("<ul>"):
+            story.append(Spacer(1, 5))
+        elif line.startswith("<li>"):
+            story.append(Paragraph(f"• {line[4:-5]}", styles["Normal"]))
+            story.append(Spacer(1, 5))
+        elif "|" in line:
+            table_data = [row.split("|")[1:-1] for row in lines if "|" in row]
+            table = Table(table_data)
+            table.setStyle(TableStyle([
+                ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                ("GRID", (0, 0), (-1, -1), 1, colors.black),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+                ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
+            ]))
+            story.append(table)
+            story.append(Spacer(1, 10))
+        elif line.strip():
+            story.append(Paragraph(line.strip(), styles["Normal"]))
+            story.append(Spacer(1, 8))
+    doc.build(story)
+
+
+# --- Synthetic proposal ---
+
+def build_proposal(rows, table_format):
+    out = [START_LINE, ""]
+    for section in ("Introduction", "Project Scope", "Deliverables"):
+        out += [f"## {section}", "", f"{section} text for the borehole programme. " * 8, ""]
+        out += [f"- {section} item {i}" for i in range(5)] + [""]
+    out += ["## Commercial", "", "| Item | Description | Qty | Unit rate | Amount |"]
+    if table_format == "markdown":
+        out.append("|---|---|---|---|---|")
+    out += [f"| {i} | Drilling and casing, borehole {i} | {i % 7 + 1} | 1,250.00 | {(i % 7 + 1) * 1250:,}.00 |" for i in range(1, rows + 1)]
+    out += ["", "## Conclusion", "", "We look forward to working with you.", "", END_LINE]
+    return "\n".join(out)
+
+
+class _TableCounter:
+    """Counts Table flowables as they are drawn."""
+
+    def __enter__(self):
+        self.count = 0
+        self._draw = Table.draw
+
+        def draw(table, *args, **kwargs):
+            self.count += 1
+            return self._draw(table, *args, **kwargs)
+
+        Table.draw = draw
+        return self
+
+    def __exit__(self, *exc):
+        Table.draw = self._draw
+
+
+def run(label, render, content, path):
+    tracemalloc.start()
+    with _TableCounter() as tables:
+        start = time.perf_counter()
+        render(str(path), content)
+        elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"{label:26} {elapsed:8.2f} s | peak {peak / 1e6:7.1f} MB | "
+        f"{tables.count:6d} table pieces drawn | {os.path.getsize(path) / 1e3:8.0f} KB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--format", choices=["pipe", "markdown"], default="pipe")
+    parser.add_argument("--legacy-max-rows", type=int, default=100, help="Largest table the N^2 reference is run on")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        for rows in args.rows:
+            content = build_proposal(rows, args.format)
+            start = time.perf_counter()
+            relevant_content = extract_relevant_content(content)
+            print(f"{rows} pricing rows ({args.format}), extract_relevant_content {time.perf_counter() - start:.2f} s:")
+            if rows <= args.legacy_max_rows:
+                run("  legacy renderer", legacy_render_pdf, relevant_content, Path(scratch) / f"legacy_{rows}.pdf")
+            else:
+                print(f"  legacy renderer            skipped (above --legacy-max-rows {args.legacy_max_rows})")
+            run("  render_pdf", render_pdf, relevant_content, Path(scratch) / f"single_{rows}.pdf")
+
+
+if __name__ == "__main__":
+    main()
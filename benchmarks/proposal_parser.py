@@ -0,0 +1,126 @@
+"""
+Proposal section parsing benchmark on synthetic long multi-lot proposals.
+
+Each proposal follows the structure the proposal prompt asks for, with every section repeated
+for each lot and many lines of LOT / bullet / numbered content. The reference is the original
+app.py parser, which called extract_section once per placeholder, re-splitting the text and
+recompiling its patterns every time. It is compared with proposal_parser.parse_proposal_content
+(one pass) and with parse_structured_proposal on the same sections returned as JSON.
+A second proposal with markdown and numbered headers shows how many sections each parser finds.
+
+Run from the repository root:
+    python -m benchmarks.proposal_parser [--lots 1 10 50] [--lines 20] [--repeat 5]
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+
+from proposal_parser import PROPOSAL_SECTIONS, parse_proposal_content, parse_structured_proposal
+
+
+# --- Original parser, kept as the reference implementation ---
+
+def legacy_extract_section(proposal_text, section_name):
+    lines = proposal_text.split('\n')
+    content = []
+    capture = False
+    subsection_pattern = re.compile(r'^\s*(LOT \d+:|•|\d+\.)\s*', re.IGNORECASE)
+    end_sections = ['Project Scope', 'Exclusions', 'Deliverables', 'Commercial', 'Schedule', 'Compliance Section', 'Experience & Qualifications', 'Additional Documents Required', 'Conclusion', 'Yours Sincerely']
+    end_pattern = re.compile(
+        r'^\s*({})\b.*'.format('|'.join(re.escape(section) for section in end_sections)),
+        re.IGNORECASE
+    )
+    for line in lines:
+        clean_line = line.strip().lower().replace('_', ' ').replace('/', ' ')
+        if section_name.lower() == clean_line and not capture:
+            capture = True
+            continue
+        if capture:
+            if end_pattern.match(line.strip()):
+                break
+            if subsection_pattern.match(line):
+                content.append('\n' + line.strip())
+            elif line.strip():
+                content.append(line.strip())
+    return '\n'.join(content).strip()
+
+
+def legacy_parse_proposal_content(proposal_text):
+    return {key: legacy_extract_section(proposal_text, title) for key, title in PROPOSAL_SECTIONS.items()}
+
+
+# --- Synthetic proposals ---
+
+def section_body(title, lot, lines):
+    body = [f"LOT {lot}: {title} for site {lot}"]
+    for i in range(lines):
+        if i % 3 == 0:
+            body.append(f"• Item {i} of lot {lot}: supply and install equipment as per RFQ clause {i}.")
+        elif i % 3 == 1:
+            body.append(f"{i}. Milestone {i} delivered within {i * 2} days of the purchase order.")
+        else:
+            body.append(f"Further detail for lot {lot}, line {i}, covering quantities, standards and acceptance.")
+    return body
+
+
+def build_proposal(lots, lines, header=lambda title, index: title.upper()):
+    out = ["ACME ENGINEERING LTD", "Reg No 123456 | VAT 987654 | info@example.com", ""]
+    for index, title in enumerate(PROPOSAL_SECTIONS.values(), 1):
+        out.append(header(title, index))
+        for lot in range(1, lots + 1):
+            out.extend(section_body(title, lot, lines))
+        out.append("")
+    return "\n".join(out)
+
+
+def build_json(lots, lines):
+    return json.dumps({
+        key: "\n".join(line for lot in range(1, lots + 1) for line in section_body(title, lot, lines))
+        for key, title in PROPOSAL_SECTIONS.items()
+    })
+
+
+# --- Benchmark ---
+
+def median_ms(parse, text, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(text)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lots", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--lines", type=int, default=20, help="Content lines per section per lot")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'lots':>5} {'lines':>7} | {'legacy':>10} {'one pass':>10} {'json':>10} | speedup | same output")
+    for lots in args.lots:
+        text = build_proposal(lots, args.lines)
+        structured = build_json(lots, args.lines)
+        legacy = median_ms(legacy_parse_proposal_content, text, args.repeat)
+        single = median_ms(parse_proposal_content, text, args.repeat)
+        from_json = median_ms(parse_structured_proposal, structured, args.repeat)
+        same = legacy_parse_proposal_content(text) == parse_proposal_content(text)
+        print(
+            f"{lots:5d} {text.count(chr(10)) + 1:7d} | {legacy:8.2f}ms {single:8.2f}ms {from_json:8.2f}ms | "
+            f"{legacy / single:6.1f}x | {same}"
+        )
+
+    # Headers as models often write them despite the prompt: markdown, numbered, with colons
+    decorated = build_proposal(2, args.lines, header=lambda title, index: f"## {index}. {title}:" if index % 2 else f"**{title}**")
+    found = {
+        "legacy": sum(bool(value) for value in legacy_parse_proposal_content(decorated).values()),
+        "one pass": sum(bool(value) for value in parse_proposal_content(decorated).values()),
+    }
+    print(f"\nDecorated headers, sections found out of {len(PROPOSAL_SECTIONS)}: {found}")
+
+
+if __name__ == "__main__":
+    main()
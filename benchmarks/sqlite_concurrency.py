@@ -0,0 +1,192 @@
+"""
+Concurrency benchmark for the SQLite data-access layer.
+
+Simulates simultaneous uploads (document inserts) and sidebar listings against a scratch
+files.db, first with the original connect-per-call helpers (rollback journal, one INSERT and
+commit per file), then with the pooled WAL connections and batched executemany inserts of
+db_helper. Reports throughput, latency percentiles and "database is locked" failures.
+
+Run from the repository root:
+    python -m benchmarks.sqlite_concurrency [--uploaders 8] [--listers 8] [--seconds 10]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import db_helper
+from constant import SECTION_KEYWORDS
+
+TABLES = list(SECTION_KEYWORDS)
+
+
+# --- Original helpers, kept as the reference implementation ---
+
+def legacy_initialize_database():
+    conn = sqlite3.connect("files.db")
+    cursor = conn.cursor()
+    for table_name in TABLES:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id INTEGER PRIMARY KEY,
+                file_name TEXT UNIQUE,
+                file_content TEXT,
+                upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                content_hash TEXT,
+                minhash BLOB
+            );
+        """)
+    conn.commit()
+    conn.close()
+
+
+def legacy_insert_batch(section, rows):
+    for file_name, file_content, content_hash, minhash in rows:
+        conn = sqlite3.connect("files.db")
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                INSERT INTO {section} (file_name, file_content, content_hash, minhash)
+                VALUES (?, ?, ?, ?);
+            """, (file_name, file_content, content_hash, minhash))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def legacy_list(section):
+    conn = sqlite3.connect("files.db", check_same_thread=False)
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT file_name FROM "{section}";')
+    names = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return names
+
+
+def legacy_uploaded_sections():
+    conn = sqlite3.connect("files.db")
+    cursor = conn.cursor()
+    uploaded = []
+    for table_name, display_name in SECTION_KEYWORDS.items():
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        if cursor.fetchone()[0] > 0:
+            uploaded.append(display_name)
+    conn.close()
+    return uploaded
+
+
+def pooled_insert_batch(section, rows):
+    db_helper.insert_files_metadata(section, rows)
+
+
+def pooled_list(section):
+    return db_helper.list_file_names(section)
+
+
+def pooled_uploaded_sections():
+    return db_helper.get_uploaded_sections(SECTION_KEYWORDS)
+
+
+# --- Workload ---
+
+def make_rows(worker, batch, size):
+    body = "".join(random.choices(string.ascii_letters + " \n", k=size))
+    return [
+        (f"w{worker}-{batch}-{i}-{random.random():.12f}.pdf", body, f"{worker}{batch}{i}", os.urandom(512))
+        for i in range(4)
+    ]
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def run(label, insert_batch, list_files, uploaded_sections, args):
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {"upload": [], "listing": [], "locked": 0, "errors": 0}
+
+    def record(kind, started):
+        with lock:
+            results[kind].append(time.perf_counter() - started)
+
+    def fail(e):
+        with lock:
+            if "locked" in str(e):
+                results["locked"] += 1
+            else:
+                results["errors"] += 1
+
+    def uploader(worker):
+        batch = 0
+        while not stop.is_set():
+            rows = make_rows(worker, batch, args.doc_bytes)
+            started = time.perf_counter()
+            try:
+                insert_batch(random.choice(TABLES), rows)
+                record("upload", started)
+            except sqlite3.OperationalError as e:
+                fail(e)
+            batch += 1
+
+    def lister():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                list_files(random.choice(TABLES))
+                uploaded_sections()
+                record("listing", started)
+            except sqlite3.OperationalError as e:
+                fail(e)
+
+    threads = [threading.Thread(target=uploader, args=(i,)) for i in range(args.uploaders)]
+    threads += [threading.Thread(target=lister) for _ in range(args.listers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    for kind in ("upload", "listing"):
+        samples = results[kind]
+        print(
+            f"{label:8} {kind:8} {len(samples) / args.seconds:8.1f} ops/s | "
+            f"p50 {percentile(samples, 0.5) * 1e3:7.2f} ms | p95 {percentile(samples, 0.95) * 1e3:7.2f} ms"
+        )
+    print(f"{label:8} locked failures: {results['locked']}, other errors: {results['errors']}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploaders", type=int, default=8)
+    parser.add_argument("--listers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--doc-bytes", type=int, default=20_000)
+    args = parser.parse_args()
+
+    original_dir = Path.cwd()
+    for label, insert_batch, list_files, uploaded_sections, initialize in (
+        ("legacy", legacy_insert_batch, legacy_list, legacy_uploaded_sections, legacy_initialize_database),
+        ("pooled", pooled_insert_batch, pooled_list, pooled_uploaded_sections, db_helper.initialize_database),
+    ):
+        # Each run gets a fresh files.db in a scratch directory
+        with tempfile.TemporaryDirectory() as scratch:
+            os.chdir(scratch)
+            try:
+                initialize()
+                run(label, insert_batch, list_files, uploaded_sections, args)
+            finally:
+                os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cold-start import benchmark for the Streamlit app.
+
+Imports `app` in fresh interpreters with `python -X importtime` and reports wall time and the
+cumulative import time of the heaviest top-level packages, first preceded by the heavy packages
+the app used to import eagerly at module load (lightrag, langchain, gcsfs, the Google API clients,
+numpy, pdfplumber, ...), then as it imports now, with those deferred to the code paths that use them.
+
+Each run uses a scratch directory with a placeholder .streamlit/secrets.toml, so no real
+credentials are needed and nothing is called over the network.
+
+Run from the repository root:
+    python -m benchmarks.startup [--runs 5] [--top 15] [--module app]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# --- What app.py and its imports loaded at module level before imports were deferred ---
+LEGACY_EAGER_IMPORTS = (
+    "numpy",
+    "gcsfs",
+    "google.oauth2.service_account",
+    "google.oauth2.credentials",
+    "googleapiclient.discovery",
+    "google_auth_oauthlib.flow",
+    "lightrag",
+    "lightrag.llm.openai",
+    "lightrag.utils",
+    "lightrag.operate",
+    "langchain_openai",
+    "langchain.docstore.document",
+    "langchain_community.vectorstores",
+    "openai",
+    "PyPDF2",
+    "pdfplumber",
+    "unstructured.cleaners.core",
+    "trafilatura",
+    "aiohttp",
+    "tiktoken",
+)
+
+
+def parse_importtime(stderr):
+    """Cumulative microseconds per top-level package from `-X importtime` output."""
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if name.startswith("  "):
+            continue  # Nested imports are already counted in their importer's cumulative time
+        try:
+            totals[name.strip().split(".")[0]] += int(cumulative)
+        except ValueError:
+            continue  # Header line
+    return totals
+
+
+def measure(statement, scratch):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=scratch, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{result.stderr[-2000:]}")
+    return elapsed, parse_importtime(result.stderr)
+
+
+def run(label, statement, args, scratch):
+    walls = []
+    packages = defaultdict(list)
+    for _ in range(args.runs):
+        wall, totals = measure(statement, scratch)
+        walls.append(wall)
+        for name, micros in totals.items():
+            packages[name].append(micros)
+
+    print(f"{label}: median wall time {statistics.median(walls) * 1000:.0f} ms over {args.runs} runs")
+    heaviest = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+    for name, samples in heaviest:
+        print(f"    {name:28} {statistics.median(samples) / 1000:8.1f} ms")
+    print()
+    return statistics.median(walls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Packages to list per run")
+    parser.add_argument("--module", default="app", help="Module whose cold import is measured")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        secrets = Path(scratch) / ".streamlit" / "secrets.toml"
+        secrets.parent.mkdir()
+        secrets.write_text('OPENAI_API_KEY = "sk-placeholder"\n')
+
+        eager = "; ".join(f"import {name}" for name in LEGACY_EAGER_IMPORTS)
+        legacy = run("eager", f"{eager}; import {args.module}", args, scratch)
+        lazy = run("lazy", f"import {args.module}", args, scratch)
+
+    print(f"Cold import of {args.module}: {legacy * 1000:.0f} ms -> {lazy * 1000:.0f} ms ({legacy / lazy:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
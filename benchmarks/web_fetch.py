@@ -0,0 +1,173 @@
+"""
+Web link ingestion benchmark against a local HTTP server.
+
+The server serves generated article pages with ETag and Last-Modified validators, answers
+conditional requests with 304, and delays every response by a fixed latency. It counts requests,
+304s, TCP connections and the most requests in flight at once. The reference is the original
+pattern: a trafilatura.fetch_url-style GET and extract for every link, one after the other,
+repeated for every uploaded file the links were submitted with. It is compared with
+web_fetcher.fetch_web_pages on a cold cache, on a warm cache (every page revalidated), and after
+one page changes.
+
+Run from the repository root:
+    python -m benchmarks.web_fetch [--pages 24] [--files 3] [--latency-ms 150]
+"""
+import argparse
+import hashlib
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import web_fetcher
+
+# --- Local site ---
+
+
+def render_page(index, revision):
+    paragraphs = "".join(
+        f"<p>Section {n} of tender notice {index}, revision {revision}: the contractor shall drill, case and "
+        f"develop borehole {index}-{n}, carry out pumping tests and submit water quality reports.</p>"
+        for n in range(12)
+    )
+    return (
+        f"<html><head><title>Tender notice {index}</title></head><body><nav>Home | Tenders</nav>"
+        f"<article><h1>Tender notice {index}</h1>{paragraphs}</article><footer>Procurement office</footer></body></html>"
+    ).encode("utf-8")
+
+
+class Site:
+    def __init__(self, pages, latency_ms):
+        self.latency = latency_ms / 1000
+        self.revisions = {index: 1 for index in range(pages)}
+        self.last_modified = formatdate(time.time() - 3600, usegmt=True)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.not_modified = 0
+            self.connections = 0
+            self.in_flight = 0
+            self.peak_in_flight = 0
+
+    def page(self, index):
+        body = render_page(index, self.revisions[index])
+        return body, f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+
+def make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so pooled clients reuse connections
+
+        def setup(self):
+            super().setup()
+            with site.lock:
+                site.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with site.lock:
+                site.requests += 1
+                site.in_flight += 1
+                site.peak_in_flight = max(site.peak_in_flight, site.in_flight)
+            try:
+                time.sleep(site.latency)
+                try:
+                    index = int(self.path.rsplit("/", 1)[-1])
+                    body, etag = site.page(index)
+                except (ValueError, KeyError):
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if self.headers.get("If-None-Match") == etag:
+                    with site.lock:
+                        site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", site.last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with site.lock:
+                    site.in_flight -= 1
+
+    return Handler
+
+
+# --- Original pattern, kept as the reference implementation ---
+
+def legacy_fetch(links, files):
+    import urllib.request
+
+    import trafilatura
+
+    pages = {}
+    for _ in range(files):  # process_file passed the same web_links into every file job
+        for url in links:
+            # Same requests as trafilatura.fetch_url (a new connection per GET, no validators); recent
+            # trafilatura versions refuse loopback addresses, so the GET is made here
+            with urllib.request.urlopen(url) as response:
+                downloaded = response.read().decode("utf-8")
+            pages[url] = trafilatura.extract(downloaded) if downloaded else None
+    return pages
+
+
+# --- Benchmark ---
+
+def timed(label, site, action):
+    site.reset()
+    start = time.perf_counter()
+    result = action()
+    elapsed = time.perf_counter() - start
+    extracted = sum(1 for text in result.values() if text)
+    print(
+        f"{label:30} {elapsed:7.2f} s | {site.requests:4d} requests | {site.not_modified:4d} not modified | "
+        f"{site.connections:3d} connections | {site.peak_in_flight:3d} peak in flight | {extracted} pages with text"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=24)
+    parser.add_argument("--files", type=int, default=3, help="Uploaded files the links were submitted with (legacy only)")
+    parser.add_argument("--latency-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    site = Site(args.pages, args.latency_ms)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(site))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    links = [f"{base}/tender/{index}" for index in range(args.pages)]
+    print(f"{args.pages} pages at {base}, {args.latency_ms:.0f} ms per response, "
+          f"at most {web_fetcher.MAX_CONNECTIONS_PER_HOST} connections per host\n")
+
+    try:
+        timed(f"legacy: serial x {args.files} files", site, lambda: legacy_fetch(links, args.files))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold = timed("fetcher: cold cache", site, lambda: web_fetcher.fetch_web_pages(links, cache_dir))
+            warm = timed("fetcher: warm cache", site, lambda: web_fetcher.fetch_web_pages(links, cache_dir))
+            site.revisions[0] += 1
+            changed = timed("fetcher: one page changed", site, lambda: web_fetcher.fetch_web_pages(links, cache_dir))
+    finally:
+        server.shutdown()
+
+    print(f"\nWarm cache text identical: {'yes' if warm == cold else 'NO'}; "
+          f"changed page re-extracted: {'yes' if changed[links[0]] != cold[links[0]] else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
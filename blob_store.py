@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+# Uploads live under their SHA-256 so identical bytes share one blob and one extraction
+BLOB_ROOT = Path("./temp_files/blobs")
+EXTRACTION_SUFFIX = ".extract.json"
+EXTRACTION_VERSION = 1
+
+MAX_BLOB_AGE_SECONDS = 7 * 24 * 3600  # Evict anything untouched for a week
+MAX_TOTAL_BYTES = 2 * 1024 ** 3  # Keep the store under 2 GB
+SWEEP_INTERVAL_SECONDS = 15 * 60
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(file_path, chunk_size=1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed store for uploaded files and their extracted text.
+    Blobs are sharded by the first two hex digits of their digest.
+    """
+
+    def __init__(self, root=BLOB_ROOT, max_age_seconds=MAX_BLOB_AGE_SECONDS, max_total_bytes=MAX_TOTAL_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        self._in_flight = {}  # digest -> [extraction lock, users]; dropped when the last user is done
+        self._in_flight_guard = threading.Lock()
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+
+    @contextmanager
+    def in_flight(self, digest):
+        """
+        Mark a digest in use for the block, so the sweeper leaves its blob and extraction alone.
+        Yields the digest's extraction lock.
+        """
+        with self._in_flight_guard:
+            entry = self._in_flight.setdefault(digest, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            with self._in_flight_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._in_flight[digest]
+
+    def _shard(self, digest) -> Path:
+        return self.root / digest[:2]
+
+    def blob_path(self, digest, suffix="") -> Path:
+        return self._shard(digest) / f"{digest}{suffix}"
+
+    def extraction_path(self, digest) -> Path:
+        return self._shard(digest) / f"{digest}{EXTRACTION_SUFFIX}"
+
+    def _atomic_write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _touch(path: Path):
+        try:
+            os.utime(path, None)
+        except FileNotFoundError:
+            pass
+
+    def put(self, data: bytes, suffix="") -> tuple:
+        """
+        Store bytes under their SHA-256 and return (digest, path).
+        Writing the same bytes twice is a no-op apart from refreshing the access time.
+        """
+        return self._put(sha256_bytes(data), data, suffix)
+
+    @contextmanager
+    def stored(self, data: bytes, suffix=""):
+        """`put` the bytes and keep them from being swept until the block exits. Yields (digest, path)."""
+        digest = sha256_bytes(data)
+        with self.in_flight(digest):
+            yield self._put(digest, data, suffix)
+
+    def _put(self, digest, data, suffix):
+        path = self.blob_path(digest, suffix)
+        if path.exists():
+            self._touch(path)
+        else:
+            self._atomic_write(path, data)
+        return digest, path
+
+    def get_extraction(self, digest):
+        """Return the cached extraction dict for a digest, or None on a miss."""
+        path = self.extraction_path(digest)
+        try:
+            cached = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if cached.get("version") != EXTRACTION_VERSION:
+            return None
+        self._touch(path)
+        return cached
+
+    def put_extraction(self, digest, text, tables=None):
+        payload = {"version": EXTRACTION_VERSION, "text": text, "tables": tables or []}
+        self._atomic_write(self.extraction_path(digest), json.dumps(payload).encode("utf-8"))
+        return payload
+
+    def get_or_extract(self, digest, extract_func):
+        """
+        Return the cached extraction for `digest`, running `extract_func` at most once per digest.
+        `extract_func` must return a (text, tables) tuple.
+        """
+        cached = self.get_extraction(digest)
+        if cached is not None:
+            logging.info(f"Extraction cache hit for {digest[:12]}")
+            return cached
+
+        with self.in_flight(digest) as lock, lock:
+            # Another thread may have finished the extraction while we waited
+            cached = self.get_extraction(digest)
+            if cached is not None:
+                return cached
+            text, tables = extract_func()
+            return self.put_extraction(digest, text, tables)
+
+    def sweep(self, now=None):
+        """
+        Evict blobs older than `max_age_seconds`, then the least recently used ones
+        until the store fits in `max_total_bytes`. Files of digests in flight are never evicted.
+        Returns the number of files removed.
+        """
+        now = now or time.time()
+        entries = []
+        for path in self.root.glob("*/*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        def evict(path):
+            # Checked under the guard, so an ingest cannot start using the file between check and unlink
+            with self._in_flight_guard:
+                if path.name.split(".", 1)[0] in self._in_flight:
+                    return False
+                path.unlink(missing_ok=True)
+                return True
+
+        removed = 0
+        kept = []
+        for mtime, size, path in entries:
+            if now - mtime > self.max_age_seconds and evict(path):
+                removed += 1
+            else:
+                kept.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in kept)
+        for mtime, size, path in sorted(kept, key=lambda entry: entry[0]):
+            if total <= self.max_total_bytes:
+                break
+            if evict(path):
+                total -= size
+                removed += 1
+
+        if removed:
+            logging.info(f"Blob store sweep evicted {removed} files, {total} bytes remain")
+        return removed
+
+    def start_sweeper(self, interval_seconds=SWEEP_INTERVAL_SECONDS):
+        """Run `sweep` periodically on a daemon thread (idempotent)."""
+        if self._sweeper and self._sweeper.is_alive():
+            return self._sweeper
+
+        def _run():
+            while not self._stop_sweeper.wait(interval_seconds):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logging.error(f"Blob store sweep failed: {e}")
+
+        self._stop_sweeper.clear()
+        self._sweeper = threading.Thread(target=_run, name="blob-store-sweeper", daemon=True)
+        self._sweeper.start()
+        return self._sweeper
+
+    def stop_sweeper(self):
+        self._stop_sweeper.set()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Process-wide blob store with its background sweeper running."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = BlobStore()
+            _default_store.start_sweeper()
+        return _default_store
@@ -0,0 +1,255 @@
+"""
+Record / replay cassette for LLM and embedding calls.
+
+With LLM_CASSETTE=record every completion routed through llm_routing, every OpenAI embedding and
+every query expansion is sent as usual and its response stored in a SQLite cassette
+(LLM_CASSETTE_PATH, ./cassettes/llm.sqlite by default). With LLM_CASSETTE=replay the same calls
+are answered from the cassette without any network access; a call that was never recorded raises
+CassetteMiss instead of reaching OpenAI. Replayed calls are counted as cache hits in the usage
+tracker, so replayed runs do not add to the cost figures.
+
+Completions are keyed by their prompt, system prompt, history and options, not by model, so a
+cassette keeps replaying after stage models are rerouted. Embeddings are stored one text at a
+time as float32, so they replay whatever batches LightRAG groups the texts into.
+
+A cassette can be seeded from an existing LightRAG workspace: the entity extraction prompts and
+answers in kv_store_llm_response_cache.json, and the chunk embeddings in vdb_chunks.json.
+
+From the repository root:
+    python -m cassette seed [--workspace ./analysis_workspace]
+    python -m cassette stats
+"""
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from pathlib import Path
+
+from database import get_pool
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+MODES = (OFF, RECORD, REPLAY)
+
+CASSETTE_MODE = os.environ.get("LLM_CASSETTE", OFF).lower()
+CASSETTE_PATH = Path(os.environ.get("LLM_CASSETTE_PATH", "./cassettes/llm.sqlite"))
+
+_CREATE_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        model TEXT NOT NULL,
+        response BLOB NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS embeddings (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        vector BLOB NOT NULL
+    )
+    """,
+)
+_PUT_RESPONSE = "INSERT OR REPLACE INTO responses (key, kind, model, response) VALUES (?, ?, ?, ?)"
+_PUT_EMBEDDING = "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)"
+# SQLite's default limit on bound parameters is 999
+_LOOKUP_BATCH = 500
+
+
+class CassetteMiss(LookupError):
+    """A call in replay mode that the cassette has no recording of."""
+
+
+def llm_key(prompt, system_prompt=None, history_messages=None, **options):
+    """
+    Key of one completion request. Options that are not plain values (such as the hashing_kv
+    LightRAG passes along) are left out.
+    """
+    request = {
+        "prompt": prompt,
+        "system_prompt": system_prompt,
+        "history": list(history_messages or []),
+        "options": {
+            name: value for name, value in sorted(options.items())
+            if value is None or isinstance(value, (str, int, float, bool))
+        },
+    }
+    return hashlib.sha256(json.dumps(request, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def embedding_key(model, text):
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded completions and embeddings in one SQLite file."""
+
+    def __init__(self, path=CASSETTE_PATH, mode=CASSETTE_MODE):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}'; use one of {', '.join(MODES)}")
+        self.path = Path(path)
+        self.mode = mode
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def recording(self):
+        return self.mode == RECORD
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def _pool(self):
+        with self._lock:
+            if not self._ready:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with get_pool(str(self.path)).transaction() as conn:
+                    for statement in _CREATE_TABLES:
+                        conn.execute(statement)
+                self._ready = True
+        return get_pool(str(self.path))
+
+    # --- Completions ---
+
+    def get_response(self, key):
+        with self._pool().connection() as conn:
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def put_response(self, key, kind, model, response):
+        with self._pool().transaction() as conn:
+            conn.execute(_PUT_RESPONSE, (key, kind, model, zlib.compress(response.encode("utf-8"))))
+
+    def replay_response(self, key, kind):
+        response = self.get_response(key)
+        if response is None:
+            raise CassetteMiss(f"No recorded {kind} response for request {key[:12]} in {self.path}")
+        return response
+
+    # --- Embeddings ---
+
+    def get_embeddings(self, model, texts):
+        """Recorded vector for each text, None where there is none."""
+        import numpy as np
+
+        keys = [embedding_key(model, text) for text in texts]
+        found = {}
+        with self._pool().connection() as conn:
+            for i in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[i:i + _LOOKUP_BATCH]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+        return [found.get(key) for key in keys]
+
+    def put_embeddings(self, model, texts, vectors):
+        import numpy as np
+
+        rows = [
+            (embedding_key(model, text), model, np.asarray(vector, dtype=np.float32).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        self._pool().executemany(_PUT_EMBEDDING, rows)
+
+    def replay_embeddings(self, model, texts):
+        import numpy as np
+
+        vectors = self.get_embeddings(model, texts)
+        missing = sum(vector is None for vector in vectors)
+        if missing:
+            raise CassetteMiss(f"No recorded {model} embedding for {missing} of {len(texts)} texts in {self.path}")
+        return np.array(vectors)
+
+    # --- Seeding and stats ---
+
+    def seed_from_workspace(self, workspace, embedding_model):
+        """
+        Add the extraction calls from LightRAG's response cache and the chunk embeddings from
+        its vector DB. Returns (responses, embeddings) added.
+        """
+        import numpy as np
+
+        workspace = Path(workspace)
+        responses = []
+        cache_path = workspace / "kv_store_llm_response_cache.json"
+        if cache_path.exists():
+            cache = json.loads(cache_path.read_text(encoding="utf-8"))
+            decoder = json.JSONDecoder()
+            # Extraction and gleaning calls are cached under "default"; query modes cache the user
+            # query rather than the prompt sent to the model, so they cannot be keyed here
+            for entry in cache.get("default", {}).values():
+                original_prompt = entry["original_prompt"]
+                history = []
+                if original_prompt.startswith("[{"):
+                    # Gleaning calls are cached as the JSON history, a newline, then the prompt
+                    history, end = decoder.raw_decode(original_prompt)
+                    original_prompt = original_prompt[end + 1:]
+                key = llm_key(original_prompt, None, history, keyword_extraction=False)
+                responses.append((key, "entity_extraction", "", zlib.compress(entry["return"].encode("utf-8"))))
+        if responses:
+            self._pool().executemany(_PUT_RESPONSE, responses)
+
+        embeddings = 0
+        vdb_path, chunks_path = workspace / "vdb_chunks.json", workspace / "kv_store_text_chunks.json"
+        if vdb_path.exists() and chunks_path.exists():
+            vdb = json.loads(vdb_path.read_text(encoding="utf-8"))
+            chunks = json.loads(chunks_path.read_text(encoding="utf-8"))
+            matrix = np.frombuffer(base64.b64decode(vdb["matrix"]), dtype=np.float32).reshape(-1, vdb["embedding_dim"])
+            pairs = [(chunks[row["__id__"]]["content"], vector) for row, vector in zip(vdb["data"], matrix) if row["__id__"] in chunks]
+            if pairs:
+                texts, vectors = zip(*pairs)
+                self.put_embeddings(embedding_model, texts, vectors)
+                embeddings = len(pairs)
+        return len(responses), embeddings
+
+    def stats(self):
+        with self._pool().connection() as conn:
+            responses = conn.execute("SELECT kind, COUNT(*), SUM(LENGTH(response)) FROM responses GROUP BY kind").fetchall()
+            embeddings = conn.execute("SELECT model, COUNT(*), SUM(LENGTH(vector)) FROM embeddings GROUP BY model").fetchall()
+        return {
+            "responses": {kind: {"count": count, "bytes": size} for kind, count, size in responses},
+            "embeddings": {model: {"count": count, "bytes": size} for model, count, size in embeddings},
+        }
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """Process-wide cassette in the mode set by LLM_CASSETTE."""
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette()
+            if _cassette.mode != OFF:
+                logging.info(f"📼 LLM cassette in {_cassette.mode} mode at {_cassette.path}")
+        return _cassette
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["seed", "stats"])
+    parser.add_argument("--workspace", type=Path, default=Path("./analysis_workspace"))
+    parser.add_argument("--cassette", type=Path, default=CASSETTE_PATH)
+    args = parser.parse_args()
+
+    cassette = Cassette(args.cassette, OFF)
+    if args.command == "seed":
+        from rag_factory import EMBEDDING_MODEL
+
+        responses, embeddings = cassette.seed_from_workspace(args.workspace, EMBEDDING_MODEL)
+        print(f"Seeded {args.cassette} with {responses} responses and {embeddings} embeddings from {args.workspace}")
+    print(json.dumps(cassette.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import math
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+# LightRAG tokenizes with the gpt-4o-mini encoding and, by default, cuts 1200-token windows
+# with a 100-token overlap. Those defaults are the baseline the chunk report compares against.
+TIKTOKEN_MODEL = "gpt-4o-mini"
+BASELINE_WINDOW_TOKENS = 1200
+BASELINE_OVERLAP_TOKENS = 100
+# One extraction call plus one gleaning call per chunk (LightRAG's entity_extract_max_gleaning=1)
+EXTRACTION_CALLS_PER_CHUNK = 2
+
+
+@dataclass(frozen=True)
+class ChunkProfile:
+    max_tokens: int
+    overlap_tokens: int
+    min_tokens: int  # A page or heading boundary only closes a chunk once it has this many tokens
+
+
+DEFAULT_PROFILE = ChunkProfile(max_tokens=1200, overlap_tokens=100, min_tokens=400)
+
+# Keyed by the SECTION_KEYWORDS table names
+CHUNK_PROFILES = {
+    "rfp_documents": ChunkProfile(max_tokens=1800, overlap_tokens=120, min_tokens=600),
+    "tor_documents": ChunkProfile(max_tokens=1800, overlap_tokens=120, min_tokens=600),
+    "evaluation_criteria_documents": ChunkProfile(max_tokens=1400, overlap_tokens=100, min_tokens=400),
+    # CVs are dense and self-contained: keep one person's record together, no overlap needed
+    "company_profiles_documents": ChunkProfile(max_tokens=2400, overlap_tokens=0, min_tokens=800),
+    "social_standards_documents": ChunkProfile(max_tokens=1800, overlap_tokens=120, min_tokens=600),
+    "project_history_documents": ChunkProfile(max_tokens=2000, overlap_tokens=100, min_tokens=600),
+    "additional_requirements_documents": ChunkProfile(max_tokens=1600, overlap_tokens=100, min_tokens=500),
+}
+
+_PAGE_MARKER = re.compile(r"^\[Page (\d+)\]$")
+_TABLE_MARKER = re.compile(r"^\[Page (\d+) - Table \d+\]$")
+_NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[A-Z]\.|[IVX]+\.)\s+[A-Z]")
+_MAX_HEADING_CHARS = 80
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    import tiktoken
+
+    return tiktoken.encoding_for_model(TIKTOKEN_MODEL)
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoding().encode(text))
+
+
+@dataclass
+class _Block:
+    kind: str  # "page", "heading", "text" or "table"
+    lines: list = field(default_factory=list)
+    line_tokens: list = field(default_factory=list)
+
+    @property
+    def tokens(self):
+        return sum(self.line_tokens)
+
+    def add(self, line):
+        self.lines.append(line)
+        self.line_tokens.append(count_tokens(line) + 1)  # +1 for the joining newline
+
+
+def _is_heading(line):
+    if len(line) > _MAX_HEADING_CHARS or "|" in line:
+        return False
+    if _NUMBERED_HEADING.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 3 and line.isupper()
+
+
+def split_blocks(text):
+    """
+    Split extracted text into page markers, headings, paragraphs and tables.
+    A table runs from its `[Page N - Table M]` marker to the next blank line.
+    """
+    blocks = []
+    current = None
+
+    def start(kind, line=None):
+        nonlocal current
+        current = _Block(kind)
+        blocks.append(current)
+        if line is not None:
+            current.add(line)
+
+    for raw_line in text.split("\n"):
+        line = raw_line.strip()
+        if not line:
+            current = None
+        elif _PAGE_MARKER.match(line):
+            start("page", line)
+            current = None
+        elif _TABLE_MARKER.match(line):
+            start("table", line)
+        elif current is not None and current.kind == "table":
+            current.add(line)
+        elif _is_heading(line):
+            start("heading", line)
+            current = None
+        else:
+            if current is None or current.kind != "text":
+                start("text")
+            current.add(line)
+    return blocks
+
+
+def _split_long_line(line, max_tokens):
+    tokens = _encoding().encode(line)
+    return [_encoding().decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def _split_oversized(block, max_tokens):
+    """
+    Split a block larger than `max_tokens` on line boundaries.
+    Table pieces repeat the table marker and header row so every piece stays readable.
+    """
+    prefix_size = 2 if block.kind == "table" else 0
+    if sum(block.line_tokens[:prefix_size]) > max_tokens // 2:
+        prefix_size = 0
+    budget = max_tokens - sum(block.line_tokens[:prefix_size])
+
+    def new_piece():
+        return _Block(block.kind, block.lines[:prefix_size], block.line_tokens[:prefix_size])
+
+    pieces = [new_piece()]
+    for line, tokens in zip(block.lines[prefix_size:], block.line_tokens[prefix_size:]):
+        if tokens <= budget:
+            parts = [(line, tokens)]
+        else:
+            parts = [(part, count_tokens(part) + 1) for part in _split_long_line(line, budget - 1)]
+        for part, part_tokens in parts:
+            if pieces[-1].tokens + part_tokens > max_tokens and len(pieces[-1].lines) > prefix_size:
+                pieces.append(new_piece())
+            pieces[-1].lines.append(part)
+            pieces[-1].line_tokens.append(part_tokens)
+    return [piece for piece in pieces if len(piece.lines) > prefix_size]
+
+
+def _join(blocks):
+    return "\n".join(line for block in blocks for line in block.lines)
+
+
+def chunk_text(text, profile=DEFAULT_PROFILE):
+    """
+    Pack blocks greedily into chunks of at most `profile.max_tokens`. When a chunk overflows it is cut
+    at its last page, heading or table boundary (if that leaves at least `profile.min_tokens`), so
+    tables are never split mid-row. Returns LightRAG-style chunk dicts.
+    """
+    chunks = []
+    current = []  # blocks of the open chunk
+    carried = 0  # leading blocks of `current` carried over from the previous chunk as overlap
+    boundary = None  # index in `current` of the last preferred cut point
+    page_marker = None  # page the open chunk starts on
+
+    def tokens_of(blocks):
+        return sum(block.tokens for block in blocks)
+
+    def emit(cut):
+        nonlocal current, carried, boundary, page_marker
+        head, rest = current[:cut], current[cut:]
+        chunks.append(_join(head))
+
+        # Overlap: the tail of the last paragraph (never a table), labelled with its page
+        for block in head:
+            if block.kind == "page":
+                page_marker = block.lines[0]
+        overlap = []
+        last = head[-1]
+        if profile.overlap_tokens and last.kind == "text":
+            tail = _Block("text")
+            for line, tokens in zip(reversed(last.lines), reversed(last.line_tokens)):
+                if tail.tokens + tokens > profile.overlap_tokens:
+                    break
+                tail.lines.insert(0, line)
+                tail.line_tokens.insert(0, tokens)
+            if tail.lines:
+                overlap.append(tail)
+        starts_new_page = bool(rest) and rest[0].kind == "page"
+        if page_marker is not None and (overlap or not starts_new_page):
+            marker = _Block("page")
+            marker.add(page_marker)
+            overlap.insert(0, marker)
+
+        current = overlap + rest
+        carried = len(overlap)
+        boundary = None
+        for index in range(carried + 1, len(current)):
+            if current[index].kind in ("page", "heading", "table"):
+                boundary = index
+
+    for block in split_blocks(text):
+        pieces = _split_oversized(block, profile.max_tokens) if block.tokens > profile.max_tokens else [block]
+        for piece in pieces:
+            if len(current) > carried and tokens_of(current) + piece.tokens > profile.max_tokens:
+                if boundary is not None and tokens_of(current[:boundary]) >= profile.min_tokens:
+                    emit(boundary)
+                if len(current) > carried and tokens_of(current) + piece.tokens > profile.max_tokens:
+                    # Never end a chunk on a dangling page marker or heading
+                    cut = len(current)
+                    while cut - 1 > carried and current[cut - 1].kind in ("page", "heading"):
+                        cut -= 1
+                    emit(cut)
+
+            if piece.kind in ("page", "heading", "table") and len(current) > carried:
+                # Cut before the whole run of page markers and headings that introduces this block
+                boundary = len(current)
+                while boundary - 1 > carried and current[boundary - 1].kind in ("page", "heading"):
+                    boundary -= 1
+            current.append(piece)
+
+    if len(current) > carried:
+        chunks.append(_join(current))
+
+    return [
+        {"tokens": count_tokens(content), "content": content, "chunk_order_index": index}
+        for index, content in enumerate(chunks)
+    ]
+
+
+@dataclass
+class ChunkReport:
+    document_tokens: int
+    baseline_chunks: int
+    chunks: int
+
+    @property
+    def baseline_llm_calls(self):
+        return self.baseline_chunks * EXTRACTION_CALLS_PER_CHUNK
+
+    @property
+    def llm_calls(self):
+        return self.chunks * EXTRACTION_CALLS_PER_CHUNK
+
+    def summary(self, name=""):
+        return (
+            f"{name}: {self.document_tokens} tokens -> {self.chunks} chunks "
+            f"(baseline {self.baseline_chunks}, delta {self.chunks - self.baseline_chunks:+d}); "
+            f"entity-extraction calls {self.llm_calls} (baseline {self.baseline_llm_calls}, "
+            f"delta {self.llm_calls - self.baseline_llm_calls:+d})"
+        )
+
+
+def baseline_chunk_count(document_tokens):
+    """Number of chunks LightRAG's default fixed token windows produce for a document."""
+    return math.ceil(document_tokens / (BASELINE_WINDOW_TOKENS - BASELINE_OVERLAP_TOKENS)) if document_tokens else 0
+
+
+def chunk_document(text, section_table=None):
+    """
+    Chunk a document with the profile for its section table.
+    Returns (chunks, ChunkReport).
+    """
+    profile = CHUNK_PROFILES.get(section_table, DEFAULT_PROFILE)
+    chunks = chunk_text(text, profile)
+    document_tokens = count_tokens(text)
+    return chunks, ChunkReport(document_tokens, baseline_chunk_count(document_tokens), len(chunks))
@@ -0,0 +1,137 @@
+import logging
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+DB_PATH = "files.db"
+POOL_SIZE = 8
+# Each connection keeps this many compiled statements, so the fixed SQL strings used by db_helper
+# are prepared once per connection and reused for every call
+STATEMENT_CACHE_SIZE = 256
+BUSY_TIMEOUT_MS = 5000
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",  # Readers never block the writer and vice versa
+    "PRAGMA synchronous=NORMAL",  # Durable in WAL mode; skips an fsync per commit
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16384",  # 16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",  # 256 MB of the file memory-mapped for reads
+)
+
+
+def connect(path=DB_PATH):
+    """Open a connection with the tuned pragmas applied."""
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,  # Pooled connections move between threads, but only one uses them at a time
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Fixed-size, thread-safe pool of SQLite connections to one database file.
+    A connection is checked out by exactly one thread at a time.
+    """
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = []  # Used as a stack so the warmest statement caches stay in use
+        self._waiting = deque()  # Checkouts are served first come, first served
+        self._created = 0
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+
+    def _checkout(self):
+        ticket = object()
+        with self._condition:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    if self._waiting[0] is ticket:
+                        if self._idle:
+                            return self._idle.pop()
+                        if self._created < self.size:
+                            self._created += 1
+                            break
+                    self._condition.wait()
+            finally:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+        try:
+            return connect(self.path)
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify_all()
+            raise
+
+    def _checkin(self, conn):
+        with self._condition:
+            if self._closed:
+                conn.close()
+                return
+            self._idle.append(conn)
+            self._condition.notify_all()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for reads or for writes that manage their own transaction."""
+        conn = self._checkout()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._checkin(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Borrow a connection and commit on success, roll back on error.
+        SQLite allows one writer at a time, so writers queue on an in-process lock instead of
+        sleeping in SQLite's busy handler; readers are never blocked by it.
+        """
+        with self._write_lock, self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.commit()
+
+    def executemany(self, sql, rows):
+        """Run one parameterized statement for every row in a single transaction. Returns the row count."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self.transaction() as conn:
+            conn.executemany(sql, rows)
+        return len(rows)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=DB_PATH) -> ConnectionPool:
+    """Process-wide connection pool for a database file."""
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+            logging.info(f"Opened SQLite pool for {path} ({pool.size} connections, WAL)")
+        return pool
@@ -1,11 +1,11 @@
 import sqlite3
+import threading
+import zlib
 from pathlib import Path
-from document_processor import DocumentProcessor
+from database import get_pool
+from workspaces import SHARED, layer_for
 
-# Initialize document processor
-process_document = DocumentProcessor()
-
-# Dictionary mapping table names to section display names
+# Dictionary mapping section names (the former per-section table names) to display names
 SECTION_KEYWORDS = {
     "rfp_documents": "Request for Proposal (RFP) Document",
     "tor_documents": "Terms of Reference (ToR)",
@@ -16,77 +16,355 @@ SECTION_KEYWORDS = {
     "additional_requirements_documents": "Additional Requirements and Compliance Documents",
 }
 
+# Extracted text is stored compressed; zstd when the zstandard package is installed, zlib otherwise.
+# The codec is recorded per row, so a database written with either can always be read back.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_LEVEL = 6
+ZLIB_LEVEL = 6
+
+
+def compress_content(text):
+    """Return (codec, blob) for a document's text."""
+    if text is None:
+        return None, None
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress_content(codec, blob):
+    if blob is None:
+        return None
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This document is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(blob).decode("utf-8")
+    return blob.decode("utf-8") if isinstance(blob, bytes) else blob
+
+
+class StoredDocument:
+    """A stored document row; its text is only decompressed when `content` is first read."""
+
+    __slots__ = ("project", "section", "file_name", "content_hash", "_codec", "_blob", "_content")
+
+    def __init__(self, project, section, file_name, content_hash, codec, blob):
+        self.project = project
+        self.section = section
+        self.file_name = file_name
+        self.content_hash = content_hash
+        self._codec = codec
+        self._blob = blob
+        self._content = None
+
+    @property
+    def content(self):
+        if self._content is None and self._blob is not None:
+            self._content = decompress_content(self._codec, self._blob)
+            self._blob = None
+        return self._content
+
+
+# Small columns come first and the content BLOB last, so scans that read names, hashes or
+# signatures never have to walk a row's overflow pages.
+_CREATE_DOCUMENTS = """
+    CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY,
+        project TEXT NOT NULL DEFAULT '',  -- Workspace layer: '' for the shared layer, else the project slug
+        section TEXT NOT NULL,  -- SECTION_KEYWORDS table name
+        file_name TEXT NOT NULL,
+        upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        content_hash TEXT,  -- SHA-256 of the uploaded bytes or extracted text
+        minhash BLOB,  -- MinHash signature used for near-duplicate detection
+        content_codec TEXT,  -- 'zstd' or 'zlib'
+        content_size INTEGER,  -- Uncompressed size in bytes
+        content BLOB,  -- Compressed extracted text
+        UNIQUE (project, section, file_name)
+    )
+"""
+_CREATE_INDEXES = (
+    # The UNIQUE constraint's (project, section, file_name) index covers listings, existence checks and section counts
+    "CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash, project, section, file_name)",
+)
+_DOCUMENT_COLUMNS = "id, section, file_name, upload_time, content_hash, minhash, content_codec, content_size, content"
+
+# Fixed SQL text, so each statement stays compiled in every pooled connection's statement cache
+_INSERT = (
+    "INSERT INTO documents (project, section, file_name, content_hash, minhash, content_codec, content_size, content) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERT_OR_IGNORE = _INSERT.replace("INSERT INTO", "INSERT OR IGNORE INTO", 1)
+_UPDATE = (
+    "UPDATE documents SET content_hash = ?, minhash = ?, content_codec = ?, content_size = ?, content = ?, "
+    "upload_time = CURRENT_TIMESTAMP WHERE project = ? AND section = ? AND file_name = ?"
+)
+_DELETE = "DELETE FROM documents WHERE project = ? AND section = ? AND file_name = ?"
+_DELETE_LAYER = "DELETE FROM documents WHERE project = ?"
+_EXISTS = "SELECT 1 FROM documents WHERE project = ? AND section = ? AND file_name = ?"
+_RECORD = "SELECT content_hash, content_codec, content FROM documents WHERE project = ? AND section = ? AND file_name = ?"
+_NAMES = "SELECT file_name FROM documents WHERE project = ? AND section = ? ORDER BY file_name"
+_SECTIONS = "SELECT DISTINCT project, section FROM documents"
+_PROJECTS = "SELECT DISTINCT project FROM documents WHERE project != '' ORDER BY project"
+# Lookups across layers take a project and the shared layer; pass the same layer twice for one
+_BY_HASH = "SELECT section, file_name FROM documents WHERE content_hash = ? AND project IN (?, ?) LIMIT 1"
+_MINHASHES = "SELECT section, file_name, minhash FROM documents WHERE minhash IS NOT NULL AND project IN (?, ?)"
+
+
+def _document_row(file_name, section, file_content, content_hash, minhash, project=SHARED):
+    codec, blob = compress_content(file_content)
+    size = len(file_content.encode("utf-8")) if file_content is not None else None
+    return project, section, file_name, content_hash, minhash, codec, size, blob
+
+
+def _layer_pair(layers):
+    layers = tuple(layers)
+    return layers[0], layers[-1]
+
+
+def _add_project_column(conn):
+    """Rebuild a `documents` table from before workspace layers; its rows all belong to the shared layer."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+    if "project" in columns:
+        return
+    conn.execute("ALTER TABLE documents RENAME TO documents_before_layers")
+    conn.execute(_CREATE_DOCUMENTS)
+    conn.execute(
+        f"INSERT INTO documents ({_DOCUMENT_COLUMNS}) SELECT {_DOCUMENT_COLUMNS} FROM documents_before_layers"
+    )
+    conn.execute("DROP TABLE documents_before_layers")
+    print("Added the project column to documents.")
+
+
+def _migrate_section_tables(conn):
+    """Move rows from the old per-section tables into `documents`, then drop those tables."""
+    existing_tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table_name in SECTION_KEYWORDS.keys():
+        if table_name not in existing_tables:
+            continue
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+        content_hash = "content_hash" if "content_hash" in columns else "NULL"
+        minhash = "minhash" if "minhash" in columns else "NULL"
+        rows = conn.execute(
+            f"SELECT file_name, file_content, {content_hash}, {minhash}, upload_time FROM {table_name}"
+        ).fetchall()
+        conn.executemany(
+            "INSERT OR IGNORE INTO documents "
+            "(project, section, file_name, content_hash, minhash, content_codec, content_size, content, upload_time) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                _document_row(file_name, table_name, file_content, row_hash, row_minhash) + (upload_time,)
+                for file_name, file_content, row_hash, row_minhash, upload_time in rows
+            ),
+        )
+        conn.execute(f"DROP TABLE {table_name}")
+        print(f"Migrated {len(rows)} rows from {table_name} into documents.")
+
+
+# Listing cache. Every write through this module bumps the data version; sidebar listings are served
+# from memory until it changes, so Streamlit reruns without new uploads or deletions never query SQLite.
+# Writes made by another process are picked up on the next write or restart of this one.
+LISTING_PAGE_SIZE = 25
+
+_data_version = 0
+_listing_cache = {}  # key -> (data version, value)
+_listing_lock = threading.Lock()
+
+
+def data_version():
+    """Counter bumped by every insert, update and delete made through db_helper."""
+    return _data_version
+
+
+def _bump_data_version():
+    global _data_version
+    with _listing_lock:
+        _data_version += 1
+        _listing_cache.clear()
+
+
+def _cached(key, load):
+    with _listing_lock:
+        version = _data_version
+        entry = _listing_cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    value = load()
+    with _listing_lock:
+        # Only keep the result if nothing was written while it loaded
+        if _data_version == version:
+            _listing_cache[key] = (version, value)
+    return value
+
+
 # Initialize database
 def initialize_database():
-    conn = sqlite3.connect("files.db")
-    cursor = conn.cursor()
-    
-    # Create tables for each section if they don't exist
-    for table_name in SECTION_KEYWORDS.keys():
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                id INTEGER PRIMARY KEY,
-                file_name TEXT UNIQUE,
-                file_content TEXT,  -- TEXT used for extracted content (string data)
-                upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-    conn.commit()
-    conn.close()
+    with get_pool().transaction() as conn:
+        conn.execute(_CREATE_DOCUMENTS)
+        _add_project_column(conn)
+        for statement in _CREATE_INDEXES:
+            conn.execute(statement)
+        _migrate_section_tables(conn)
+    _bump_data_version()
 
 # Insert document metadata and content into the database
-def insert_file_metadata(file_name, section, file_content):
-    conn = sqlite3.connect("files.db")
-    cursor = conn.cursor()
+def insert_file_metadata(file_name, section, file_content, content_hash=None, minhash=None, project=SHARED):
+    """Insert a document row. Returns True on success, False if it could not be stored."""
     try:
-        table_name = section
-        cursor.execute(f"""
-            INSERT INTO {table_name} (file_name, file_content)
-            VALUES (?, ?);
-        """, (file_name, file_content))
-        print(f"File content: {file_content}")
-        conn.commit()
+        with get_pool().transaction() as conn:
+            conn.execute(_INSERT, _document_row(file_name, section, file_content, content_hash, minhash, project))
+        _bump_data_version()
+        return True
     except sqlite3.IntegrityError:
         print(f"File {file_name} already exists in the database.")
+        return False
     except Exception as e:
         print(f"Error inserting file metadata: {e}")
-    finally:
-        conn.close()
+        return False
+
+def insert_files_metadata(section, rows, project=SHARED):
+    """
+    Insert many (file_name, file_content, content_hash, minhash) rows in one transaction.
+    Rows whose file name already exists in the section are ignored. Returns the number of rows inserted.
+    """
+    # Compress before taking the write lock
+    rows = [
+        _document_row(name, section, content, content_hash, minhash, project)
+        for name, content, content_hash, minhash in rows
+    ]
+    if not rows:
+        return 0
+    with get_pool().transaction() as conn:
+        before = conn.total_changes
+        conn.executemany(_INSERT_OR_IGNORE, rows)
+        inserted = conn.total_changes - before
+    if inserted:
+        _bump_data_version()
+    return inserted
+
+# Replace a document with its revised version
+def update_file_metadata(file_name, section, file_content, content_hash=None, minhash=None, project=SHARED):
+    """Overwrite the stored content of an existing file. Returns True if a row was updated."""
+    _, _, _, content_hash, minhash, codec, size, blob = _document_row(file_name, section, file_content, content_hash, minhash)
+    try:
+        with get_pool().transaction() as conn:
+            updated = conn.execute(_UPDATE, (content_hash, minhash, codec, size, blob, project, section, file_name)).rowcount > 0
+        if updated:
+            _bump_data_version()
+        return updated
+    except Exception as e:
+        print(f"Error updating file metadata: {e}")
+        return False
 
 # Delete document by file name
-def delete_file(file_name, section):
-    conn = sqlite3.connect("files.db")
-    cursor = conn.cursor()
+def delete_file(file_name, section, project=SHARED):
     try:
-        table_name = section
-        cursor.execute(f"DELETE FROM {table_name} WHERE file_name = ?", (file_name,))
-        conn.commit()
-        print(f"File {file_name} deleted from {table_name}.")
+        with get_pool().transaction() as conn:
+            conn.execute(_DELETE, (project, section, file_name))
+        _bump_data_version()
+        print(f"File {file_name} deleted from {section}.")
     except Exception as e:
         print(f"Error deleting file: {e}")
-    finally:
-        conn.close()
+
+# Delete every document of a workspace layer
+def delete_layer_files(project=SHARED):
+    """Delete the rows of every document in a layer, in every section. Returns the number deleted."""
+    with get_pool().transaction() as conn:
+        deleted = conn.execute(_DELETE_LAYER, (project,)).rowcount
+    _bump_data_version()
+    print(f"Deleted {deleted} files from the {'shared' if project == SHARED else project} layer.")
+    return deleted
+
+# Fetch the stored text of a document
+def get_file_content(file_name, section, project=SHARED):
+    """Return the extracted text stored for a file, or None if it is not in the section."""
+    record = get_file_record(file_name, section, project)
+    return record.content if record else None
+
+def get_file_record(file_name, section, project=SHARED):
+    """Return the StoredDocument for a file in a section, or None. Its content is decompressed on first use."""
+    with get_pool().connection() as conn:
+        row = conn.execute(_RECORD, (project, section, file_name)).fetchone()
+    return StoredDocument(project, section, file_name, *row) if row else None
+
+def file_exists(file_name, section, project=SHARED):
+    """True if a section already holds a file with this name."""
+    with get_pool().connection() as conn:
+        return conn.execute(_EXISTS, (project, section, file_name)).fetchone() is not None
+
+def list_file_names(section, project=SHARED):
+    """Names of the files stored in a section, read from the (project, section, file_name) index only."""
+    with get_pool().connection() as conn:
+        return [row[0] for row in conn.execute(_NAMES, (project, section))]
+
+def list_file_page(section, name_filter="", page=0, page_size=LISTING_PAGE_SIZE, project=SHARED):
+    """
+    One page of a section's file names, optionally filtered by a case-insensitive substring.
+    Served from the listing cache. Returns (names on the page, number of matching files).
+    """
+    names = _cached(("names", project, section), lambda: list_file_names(section, project))
+    if name_filter:
+        needle = name_filter.casefold()
+        names = [name for name in names if needle in name.casefold()]
+    start = max(0, page) * page_size
+    return names[start:start + page_size], len(names)
+
+def _uploaded_section_names():
+    with get_pool().connection() as conn:
+        return frozenset(conn.execute(_SECTIONS).fetchall())
 
 # Retrieve all uploaded sections
-def get_uploaded_sections(section_keywords):
-    conn = sqlite3.connect("files.db")
-    cursor = conn.cursor()
-    uploaded_sections = []
-    for table_name, display_name in section_keywords.items():
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        count = cursor.fetchone()[0]
-        if count > 0:
-            uploaded_sections.append(display_name)
-    conn.close()
-    return uploaded_sections
-    
+def get_uploaded_sections(section_keywords, project=SHARED):
+    """
+    Display names of the sections holding at least one file in the layer they use for `project`.
+    Served from the listing cache.
+    """
+    sections = _cached("sections", _uploaded_section_names)
+    return [
+        display_name for table_name, display_name in section_keywords.items()
+        if (layer_for(table_name, project), table_name) in sections
+    ]
+
+def list_projects():
+    """Slugs of the projects holding at least one document. Served from the listing cache."""
+    def load():
+        with get_pool().connection() as conn:
+            return [row[0] for row in conn.execute(_PROJECTS)]
+    return _cached("projects", load)
+
+
+
+def find_file_by_content_hash(content_hash, layers=(SHARED,)):
+    """
+    Look up a content hash across all sections of one or two workspace layers.
+    :return: (section, file_name) of the first match, or None.
+    """
+    if not content_hash:
+        return None
+    with get_pool().connection() as conn:
+        return conn.execute(_BY_HASH, (content_hash, *_layer_pair(layers))).fetchone()
+
+
+def get_minhash_signatures(layers=(SHARED,)):
+    """
+    Return ((section, file_name), minhash) pairs for every document with a signature in one or two layers.
+    """
+    with get_pool().connection() as conn:
+        rows = conn.execute(_MINHASHES, _layer_pair(layers)).fetchall()
+    return [((section, file_name), minhash) for section, file_name, minhash in rows]
     
     
-def check_if_file_exists_in_section(file_name, section):
+def check_if_file_exists_in_section(file_name, section, project=SHARED):
     """
     Check if the file has already been processed and exists in the database for the selected section.
     :param file_name: The name of the file to check.
     :param section: The selected section (maps to a key in SECTION_KEYWORDS).
+    :param project: The selected project; shared sections are checked in the shared layer.
     :return: True if the file exists in the database, False otherwise.
     """
     # Map the section to its corresponding table name using SECTION_KEYWORDS
@@ -96,19 +374,7 @@ def check_if_file_exists_in_section(file_name, section):
         # If no valid table is found, return False
         return False
 
-    # Connect to the database
-    conn = sqlite3.connect("files.db")
-    cursor = conn.cursor()
-
-    # Query to check if the file already exists in the section's table
-    cursor.execute(f'SELECT 1 FROM "{table_name}" WHERE file_name = ?', (file_name,))
-    result = cursor.fetchone()
-
-    # Close the connection to the database
-    conn.close()
-
-    # If a result is found, it means the file already exists, so return True
-    return result is not None
+    return file_exists(file_name, table_name, layer_for(table_name, project))
 
 
 
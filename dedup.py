@@ -0,0 +1,106 @@
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+# MinHash / LSH parameters: 16 bands of 8 rows put the LSH candidate threshold near 0.7 Jaccard,
+# and candidates are then confirmed against NEAR_DUPLICATE_THRESHOLD on the full signature.
+NUM_PERM = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 5
+NEAR_DUPLICATE_THRESHOLD = 0.85
+_BLOCK_SIZE = 4096
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, int(_MERSENNE_PRIME), size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, int(_MERSENNE_PRIME), size=NUM_PERM, dtype=np.uint64)
+
+# Page and table markers change whenever a PDF is re-exported, so they are ignored
+_MARKER_PATTERN = re.compile(r"\[page \d+(?: - table \d+)?\]")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    words = _WORD_PATTERN.findall(_MARKER_PATTERN.sub(" ", text.lower()))
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def compute_minhash(text: str) -> np.ndarray:
+    """Return the MinHash signature (NUM_PERM uint32 values) of a document's word shingles."""
+    hashes = _shingle_hashes(text)
+    if hashes.size == 0:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint32)
+    signature = np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    # Permute in blocks to keep the (shingles x NUM_PERM) matrix small for long RFQs
+    with np.errstate(over="ignore"):
+        for start in range(0, hashes.size, _BLOCK_SIZE):
+            block = hashes[start:start + _BLOCK_SIZE]
+            permuted = np.bitwise_and((np.outer(block, _PERM_A) + _PERM_B) % _MERSENNE_PRIME, _MAX_HASH)
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def signature_to_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype("<u4").tobytes()
+
+
+def signature_from_bytes(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u4")
+
+
+def estimate_similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two documents behind the signatures."""
+    return float(np.mean(sig_a == sig_b))
+
+
+class MinHashLSH:
+    """Banded LSH index over MinHash signatures."""
+
+    def __init__(self):
+        self._buckets = [defaultdict(set) for _ in range(LSH_BANDS)]
+        self._signatures = {}
+
+    @staticmethod
+    def _band_keys(signature):
+        for band in range(LSH_BANDS):
+            yield band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+
+    def insert(self, key, signature):
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band][band_key].add(key)
+
+    def query(self, signature, threshold=NEAR_DUPLICATE_THRESHOLD):
+        """Return (key, similarity) pairs for indexed documents above `threshold`, best first."""
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        matches = []
+        for key in candidates:
+            similarity = estimate_similarity(signature, self._signatures[key])
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+
+def build_lsh_index(stored_signatures) -> MinHashLSH:
+    """
+    Build an LSH index from (key, signature_bytes) pairs as stored in the database.
+    """
+    index = MinHashLSH()
+    for key, blob in stored_signatures:
+        if blob:
+            index.insert(key, signature_from_bytes(blob))
+    return index
+
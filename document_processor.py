@@ -1,13 +1,7 @@
-from PyPDF2 import PdfReader
-import streamlit as st
-from langchain.docstore.document import Document
-import trafilatura
-from utils import clean_text
+from web_fetcher import fetch_web_pages
 import logging
-import openai
-import pdfplumber
 
-openai.api_key = st.secrets["OPENAI_API_KEY"]
+# pdfplumber and langchain are imported by the methods that need them
 
 logging.basicConfig(level=logging.INFO)
 
@@ -34,10 +28,16 @@ class DocumentProcessor:
     
     
 
-    def extract_text_and_tables_from_pdf(self, file):
+    def extract_pdf_parts(self, file):
+        """
+        Extract page text and table text from a PDF as separate parts.
+        Returns (text, table_texts) so callers can cache them independently.
+        """
         text = ""
         table_texts = []
 
+        import pdfplumber
+
         with pdfplumber.open(file) as pdf:
             for page_num, page in enumerate(pdf.pages, start=1):
                 # Extract text
@@ -54,15 +54,31 @@ class DocumentProcessor:
                         table_str += " | ".join(cleaned_row) + "\n"
                     table_texts.append(table_str)
 
-        # Combine extracted text and tables
-        full_text = text + "\n\n".join(table_texts)
-        return full_text
+        return text, table_texts
+
+    @staticmethod
+    def combine_pdf_parts(text, table_texts):
+        """Combine extracted text and tables into the single string fed to the RAG."""
+        return text + "\n\n".join(table_texts)
+
+    def extract_text_and_tables_from_pdf(self, file):
+        text, table_texts = self.extract_pdf_parts(file)
+        return self.combine_pdf_parts(text, table_texts)
+
+    def extract_pdf_cached(self, file, content_hash, blob_store):
+        """
+        Extract a PDF through the content-addressed cache so identical bytes are parsed once.
+        """
+        cached = blob_store.get_or_extract(content_hash, lambda: self.extract_pdf_parts(file))
+        return self.combine_pdf_parts(cached["text"], cached["tables"])
 
     
     def preprocess_document(self, file):
         """
         Preprocess the document by extracting all text.
         """
+        from langchain.docstore.document import Document
+
         pdf_text = self.extract_text_and_tables_from_pdf(file)
         # Return the entire content as a single Document object
         documents = [Document(page_content=pdf_text)]
@@ -72,10 +88,7 @@ class DocumentProcessor:
         """
         Download and extract text content from a webpage using trafilatura.
         """
-        downloaded = trafilatura.fetch_url(url)
-        if downloaded:
-            web_page = trafilatura.extract(downloaded)
-            return clean_text(web_page) if web_page else None
-        else:
+        web_page = fetch_web_pages([url]).get(url)
+        if not web_page:
             logging.error(f"Failed to fetch webpage: {url}")
-            return None
\ No newline at end of file
+        return web_page
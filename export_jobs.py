@@ -0,0 +1,212 @@
+import itertools
+import logging
+import random
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import tracing
+
+EXPORT_WORKERS = 2
+MAX_ATTEMPTS = 6
+INITIAL_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 32.0
+
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+DONE = "done"
+FAILED = "failed"
+
+
+def retryable_status(error):
+    """HTTP status of a retryable googleapiclient HttpError (429 or 5xx), else None."""
+    from googleapiclient.errors import HttpError
+
+    if not isinstance(error, HttpError):
+        return None
+    status = getattr(error.resp, "status", None)
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return None
+    return status if status == 429 or 500 <= status < 600 else None
+
+
+def _retry_after(error):
+    try:
+        return float(error.resp.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def call_with_backoff(call, on_retry=None, max_attempts=MAX_ATTEMPTS, sleep=time.sleep):
+    """
+    Run `call()`, retrying HttpError 429 and 5xx responses with jittered exponential backoff
+    (or the server's Retry-After). Any other error, or the last failed attempt, is raised.
+    """
+    backoff = INITIAL_BACKOFF_SECONDS
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return call()
+        except Exception as e:
+            status = retryable_status(e)
+            if status is None or attempt == max_attempts:
+                raise
+            delay = _retry_after(e) or backoff * random.uniform(0.5, 1.5)
+            backoff = min(MAX_BACKOFF_SECONDS, backoff * 2)
+            logging.warning(f"⚠️ Google API returned {status}; retrying in {delay:.1f}s (attempt {attempt}/{max_attempts})")
+            if on_retry:
+                on_retry(attempt, status, delay)
+            sleep(delay)
+
+
+@dataclass
+class ExportJob:
+    id: int
+    kind: str  # "docs" or "pdf"
+    label: str
+    status: str = QUEUED
+    retries: int = 0
+    link: str = None
+    error: str = None
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: float = None
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING, RETRYING)
+
+    @property
+    def seconds(self):
+        return round((self.finished_at or time.time()) - self.submitted_at, 1)
+
+
+class ExportJobRunner:
+    """
+    Runs proposal exports on a small worker pool so the Streamlit session stays responsive.
+    Each job's API steps are retried on 429 and 5xx; the job handle carries status, retries and the result link.
+    Steps that create a file must be wrapped in google_docs_helper.create_once, since a failed create may
+    still have made the file.
+    """
+
+    def __init__(self, workers=EXPORT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, kind, label, work):
+        """
+        Queue `work(step)` and return its job id. `work` returns the document link and should wrap each
+        API call as `step(lambda: ...)` so it is retried on its own.
+        """
+        with self._lock:
+            job = ExportJob(id=next(self._ids), kind=kind, label=label)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, work)
+        logging.info(f"📤 Export job {job.id} ({kind}) queued: {label}")
+        return job.id
+
+    def _update(self, job, **changes):
+        with self._lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+
+    def _run(self, job, work):
+        self._update(job, status=RUNNING)
+
+        def on_retry(attempt, status, delay):
+            self._update(job, status=RETRYING, retries=job.retries + 1)
+
+        def step(call):
+            result = call_with_backoff(call, on_retry=on_retry)
+            if job.status == RETRYING:
+                self._update(job, status=RUNNING)
+            return result
+
+        try:
+            with tracing.span(f"export.{job.kind}", job=job.id) as export_span:
+                link = work(step)
+                export_span.set(retries=job.retries)
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job, status=FAILED, error=str(e), finished_at=time.time())
+            logging.error(f"❌ Export job {job.id} failed after {job.seconds}s: {e}")
+            return
+        self._update(job, status=DONE, link=link, finished_at=time.time())
+        logging.info(f"✅ Export job {job.id} finished in {job.seconds}s: {link}")
+
+    def get(self, job_id):
+        """A copy of the job's current state, or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return ExportJob(**vars(job)) if job else None
+
+    def jobs(self, job_ids):
+        return [job for job in (self.get(job_id) for job_id in job_ids) if job]
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_export_runner() -> ExportJobRunner:
+    """Process-wide export job runner."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = ExportJobRunner()
+        return _runner
+
+
+# --- Export jobs ---
+
+def submit_docs_export(user, token_info, replacements, document_name, folder_name):
+    """Queue a Google Docs export through ProposalExporter. Returns the job id."""
+
+    export_key = uuid.uuid4().hex
+
+    def work(step):
+        from google_docs_helper import ProposalExporter, get_google_services
+
+        docs_service, drive_service = get_google_services(user, token_info)
+        exporter = ProposalExporter(docs_service, drive_service, user, run_step=step)
+        doc_id = exporter.export(replacements, document_name, folder_name, export_key=export_key)
+        return f"https://docs.google.com/document/d/{doc_id}/view"
+
+    return get_export_runner().submit("docs", document_name, work)
+
+
+def submit_pdf_export(credentials, content, file_name, folder_name, root_folder_name="Proposals"):
+    """Queue a PDF render and upload through GoogleDriveHelper. Returns the job id."""
+
+    export_key = uuid.uuid4().hex
+
+    def work(step):
+        import tempfile
+        from pathlib import Path
+
+        from google_docs_helper import EXPORT_KEY_PROPERTY, create_once, find_exported_file
+        from google_drive_helper import GoogleDriveHelper
+
+        drive_helper = GoogleDriveHelper(credentials)
+        with tracing.span("export.create_folders"):
+            root_folder_id = step(lambda: drive_helper.create_folder(root_folder_name))
+            folder_id = step(lambda: drive_helper.create_folder(folder_name, parent_folder_id=root_folder_id))
+        with tempfile.TemporaryDirectory() as scratch, tracing.span("export.upload_pdf"):
+            file_path = str(Path(scratch) / file_name)
+            # Generated proposals have no fixed boundary lines, so the whole text is rendered
+            upload = create_once(
+                lambda: drive_helper.upload_file(
+                    folder_id, file_path, content, file_name=file_name, template="proposal",
+                    app_properties={EXPORT_KEY_PROPERTY: export_key},
+                ),
+                lambda: (find_exported_file(drive_helper.service, export_key, fields="webViewLink") or {}).get("webViewLink"),
+            )
+            return step(upload)
+
+    return get_export_runner().submit("pdf", file_name, work)
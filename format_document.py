@@ -1,38 +1,131 @@
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
+import re
 
-def find_best_match(text, choices, threshold=80):
+# rapidfuzz is a C implementation of the same scorers; fuzzywuzzy is the pure-Python fallback
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    from fuzzywuzzy import fuzz, process
+
+# Start and end anchor lines per proposal template. Content runs from the start line through the
+# end line; a None anchor means the start or end of the text.
+TEMPLATE_ANCHORS = {
+    "borehole": (
+        "Proposal for Borehole Drilling and Rehabilitation Services",
+        "Please let us know if there are any further details required or adjustments needed to this proposal.",
+    ),
+    "proposal": (None, None),
+}
+DEFAULT_TEMPLATE = "borehole"
+MATCH_THRESHOLD = 80
+
+_NOISE = re.compile(r"[^a-z0-9]+")
+# Bullets and table rows are never anchor lines, so they are not fuzzy candidates
+_LIST_OR_TABLE_ROW = re.compile(r"^\s*(?:[-*•]\s|\|)")
+
+
+def _normalize(text):
+    """Lowercase, "&" spelled out, with markdown, punctuation and whitespace runs collapsed to single spaces."""
+    return _NOISE.sub(" ", text.lower().replace("&", " and ")).strip()
+
+
+class _Anchor:
+    """Tracks the lines that can match one anchor phrase during the scan."""
+
+    def __init__(self, phrase):
+        self.phrase = _normalize(phrase)
+        # Only lines of roughly the phrase's length are fuzzy candidates; shorter ones would score
+        # 100 on partial_ratio just by being a substring of the phrase
+        self.min_length = len(self.phrase) // 2
+        self.max_length = 2 * len(self.phrase) + 20
+        self.exact = []  # (line start, line end) of every line containing the phrase
+        self.candidates = []  # (line start, line end), scored only if no line contains the phrase
+
+    def check(self, raw_line, line, start, end):
+        """Record the line if it matches; True if it contains the phrase."""
+        if self.phrase in line:
+            self.exact.append((start, end))
+            return True
+        if self.min_length <= len(line) <= self.max_length and not _LIST_OR_TABLE_ROW.match(raw_line):
+            self.candidates.append((start, end))
+        return False
+
+    def _fuzzy(self, text, after=0, threshold=0):
+        choices = {(start, end): _normalize(text[start:end]) for start, end in self.candidates if start >= after}
+        match = process.extractOne(self.phrase, choices, processor=None, scorer=fuzz.partial_ratio, score_cutoff=threshold)
+        return (match[1], *match[2]) if match else None
+
+    def best(self, text, after=0, threshold=MATCH_THRESHOLD):
+        """(score, line start, line end) of the first exact match at or after `after`, else of the best fuzzy one."""
+        exact = next(((100, start, end) for start, end in self.exact if start >= after), None)
+        if exact:
+            return exact
+        best = self._fuzzy(text, after, threshold)
+        return best if best and best[0] > threshold else None
+
+    def closest(self, text):
+        best = self._fuzzy(text)
+        return (text[best[1]:best[2]], best[0]) if best else None
+
+
+def _verbatim_line(text, phrase, after=0):
+    """(line start, line end) of the first line at or after `after` containing `phrase` as is, else None."""
+    index = text.find(phrase, after)
+    if index == -1:
+        return None
+    line_end = text.find("\n", index + len(phrase))
+    return text.rfind("\n", 0, index) + 1, len(text) if line_end == -1 else line_end
+
+
+def find_boundaries(text, start_phrase, end_phrase, threshold=MATCH_THRESHOLD):
     """
-    Finds the best matching phrase in `choices` from `text` using fuzzy matching.
-    Returns the best match if it meets the threshold, otherwise None.
+    Character offsets (start, end) of the content from the line holding `start_phrase` through
+    the line holding `end_phrase`. Phrases present verbatim are found with plain substring search;
+    otherwise one pass over the lines looks for them after normalization, and a line containing
+    the normalized phrase wins outright; only if none does are the lines of similar length scored
+    with the fuzzy matcher, and the best one used if it scores above `threshold`. Raises ValueError if an anchor is not found.
     """
-    best_match = process.extractOne(text, choices, scorer=fuzz.partial_ratio)
-    if best_match and best_match[1] >= threshold:
-        return best_match[0]  # Return the actual best-matched phrase
-    return None
+    start_line = _verbatim_line(text, start_phrase) if start_phrase else (0, 0)
+    if start_line:
+        end_line = _verbatim_line(text, end_phrase, start_line[0]) if end_phrase else (len(text), len(text))
+        if end_line:
+            return start_line[0], end_line[1]
+
+    start_anchor = _Anchor(start_phrase) if start_phrase else None
+    end_anchor = _Anchor(end_phrase) if end_phrase else None
+    start_found = start_anchor is None
+
+    offset = 0
+    for raw_line in text.split("\n"):
+        line_start, line_end = offset, offset + len(raw_line)
+        offset = line_end + 1
+        line = _normalize(raw_line)
+        if not line:
+            continue
+        if not start_found and start_anchor.check(raw_line, line, line_start, line_end):
+            start_found = True
+            continue
+        if end_anchor and end_anchor.check(raw_line, line, line_start, line_end) and start_found:
+            break  # Both anchors matched exactly, in order; nothing later can change the result
+
+    start = 0
+    if start_anchor:
+        match = start_anchor.best(text, threshold=threshold)
+        if match is None:
+            raise ValueError(f"Start phrase not found. Closest match: {start_anchor.closest(text)}")
+        start = match[1]
+    end = len(text)
+    if end_anchor:
+        match = end_anchor.best(text, after=start, threshold=threshold)
+        if match is None:
+            raise ValueError(f"End phrase not found. Closest match: {end_anchor.closest(text)}")
+        end = match[2]
+    return start, end
+
 
-def extract_relevant_content(text):
+def extract_relevant_content(text, template=DEFAULT_TEMPLATE):
     """
-    Extracts the relevant portion of the proposal dynamically using fuzzy matching.
+    Extracts the relevant portion of the proposal between the template's start and end anchors.
     """
-    start_phrase = "Proposal for Borehole Drilling and Rehabilitation Services"
-    end_phrase = "Please let us know if there are any further details required or adjustments needed to this proposal."
-
-    # Use fuzzy matching to find the closest match
-    text_lines = text.split("\n")
-    start_match = process.extractOne(start_phrase, text_lines, scorer=fuzz.partial_ratio)
-    end_match = process.extractOne(end_phrase, text_lines, scorer=fuzz.partial_ratio)
-
-    if start_match and start_match[1] > 80:  # Confidence threshold
-        start_index = text_lines.index(start_match[0])
-    else:
-        raise ValueError(f"Start phrase not found. Closest match: {start_match}")
-
-    if end_match and end_match[1] > 80:  # Confidence threshold
-        end_index = text_lines.index(end_match[0])
-    else:
-        raise ValueError(f"End phrase not found. Closest match: {end_match}")
-
-    # Extract and return the relevant portion
-    relevant_content = "\n".join(text_lines[start_index:end_index + 1])
-    return relevant_content
\ No newline at end of file
+    start_phrase, end_phrase = TEMPLATE_ANCHORS[template]
+    start, end = find_boundaries(text, start_phrase, end_phrase)
+    return text[start:end]
@@ -1,6 +1,20 @@
+import json
+import logging
+import threading
+from pathlib import Path
+
 from googleapiclient.discovery import Resource
 from googleapiclient.errors import HttpError
 
+import tracing
+
+# Drive ids resolved for each user (template, Proposals folder, dated folders), kept across sessions
+DRIVE_ID_CACHE_PATH = Path(__file__).parent / "auth_cache" / "drive_ids.json"
+TEMPLATE_NAME = "ProposalTemplate"
+PROPOSALS_FOLDER_NAME = "Proposals"
+# appProperties key tagging each exported file with its export job, so a retried create can find it
+EXPORT_KEY_PROPERTY = "proposalExportKey"
+
 
 def debug_find_placeholders(docs_service, doc_id):
         """
@@ -25,6 +39,37 @@ def debug_find_placeholders(docs_service, doc_id):
             print(f"Error fetching document: {e}")
 
 
+def is_not_found(error):
+    return isinstance(error, HttpError) and getattr(error.resp, "status", None) == 404
+
+
+def find_exported_file(drive_service, export_key, fields="id"):
+    """The file an export tagged with `export_key` already created, or None."""
+    query = f"appProperties has {{ key='{EXPORT_KEY_PROPERTY}' and value='{export_key}' }} and trashed=false"
+    files = drive_service.files().list(q=query, spaces="drive", fields=f"files({fields})").execute().get("files", [])
+    return files[0] if files else None
+
+
+def create_once(create, find):
+    """
+    Wrap a Drive create or copy so retrying it cannot leave a duplicate. The request may have reached
+    Drive even when it failed (a 5xx or a timeout after the file was made), so every attempt after the
+    first calls `find()` and returns the file it finds instead of creating another.
+    """
+    attempted = False
+
+    def call():
+        nonlocal attempted
+        if attempted:
+            existing = find()
+            if existing is not None:
+                return existing
+        attempted = True
+        return create()
+
+    return call
+
+
 class GoogleDocsHelper:
     """
     Handles Google Docs integration using template-based approach.
@@ -36,36 +81,51 @@ class GoogleDocsHelper:
         self.docs_service = docs_service
         self.drive_service = drive_service
 
-    def create_from_template(self, template_id, replacements, document_name):
+    def copy_template(self, template_id, document_name, parent_folder_id=None, app_properties=None):
+        """
+        Copies a Google Docs template, straight into `parent_folder_id` when given, and returns the new document ID.
+        """
+        body = {"name": document_name}
+        if parent_folder_id:
+            body["parents"] = [parent_folder_id]
+        if app_properties:
+            body["appProperties"] = app_properties
+        copied_file = self.drive_service.files().copy(fileId=template_id, body=body, fields="id").execute()
+        return copied_file["id"]
+
+    def fill_template(self, doc_id, replacements):
+        """
+        Replaces every {PLACEHOLDER} in the document in one batchUpdate.
+        """
+        requests = []
+        for placeholder, content in replacements.items():
+            requests.append({
+                "replaceAllText": {
+                    "containsText": {"text": f"{{{placeholder}}}", "matchCase": True},
+                    "replaceText": content or "[MISSING CONTENT]"
+                }
+            })
+
+        self.docs_service.documents().batchUpdate(
+            documentId=doc_id,
+            body={"requests": requests}
+        ).execute()
+
+    def create_from_template(self, template_id, replacements, document_name, parent_folder_id=None, debug=False):
         """
         Copies a Google Docs template, replaces placeholders, and returns the new document ID.
+        With `debug`, the copied document's text is fetched and printed before replacement.
         """
         try:
-            # ✅ Step 1: Copy the existing Google Docs template
-            copied_file = self.drive_service.files().copy(
-                fileId=template_id,
-                body={"name": document_name}
-            ).execute()
-            new_doc_id = copied_file["id"]
-
-            # ✅ Step 2: Fetch document content for debugging
-            debug_find_placeholders(self.docs_service, new_doc_id)
-
-            # ✅ Step 3: Build text replacement requests
-            requests = []
-            for placeholder, content in replacements.items():
-                requests.append({
-                    "replaceAllText": {
-                        "containsText": {"text": f"{{{placeholder}}}", "matchCase": True},
-                        "replaceText": content or "[MISSING CONTENT]"
-                    }
-                })
-
-            # ✅ Step 4: Execute text replacement
-            self.docs_service.documents().batchUpdate(
-                documentId=new_doc_id,
-                body={"requests": requests}
-            ).execute()
+            # ✅ Step 1: Copy the template, directly into the target folder
+            new_doc_id = self.copy_template(template_id, document_name, parent_folder_id)
+
+            # ✅ Step 2: Optionally fetch document content for debugging (one extra documents().get)
+            if debug:
+                debug_find_placeholders(self.docs_service, new_doc_id)
+
+            # ✅ Step 3: Replace placeholders in one batch
+            self.fill_template(new_doc_id, replacements)
 
             return new_doc_id  # Returns the Google Docs file ID
 
@@ -159,6 +219,155 @@ class GoogleDriveAPI:
 
 
 
+class DriveIdCache:
+    """
+    Drive ids per user, persisted to a JSON file so template and folder lookups survive restarts.
+    Entries are trusted until an API call reports them missing; callers then invalidate and resolve again.
+    """
+
+    def __init__(self, path=DRIVE_ID_CACHE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self._ids = json.loads(self.path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._ids = {}
+
+    def get(self, user, key):
+        with self._lock:
+            return self._ids.get(user, {}).get(key)
+
+    def set(self, user, key, value):
+        with self._lock:
+            self._ids.setdefault(user, {})[key] = value
+            self._save()
+
+    def invalidate(self, user, *keys):
+        with self._lock:
+            entries = self._ids.get(user, {})
+            for key in keys:
+                entries.pop(key, None)
+            self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._ids, indent=1))
+        tmp.replace(self.path)
+
+
+_drive_id_cache = None
+_drive_id_cache_lock = threading.Lock()
+
+
+def get_drive_id_cache() -> DriveIdCache:
+    """Process-wide Drive id cache."""
+    global _drive_id_cache
+    with _drive_id_cache_lock:
+        if _drive_id_cache is None:
+            _drive_id_cache = DriveIdCache()
+        return _drive_id_cache
+
+
+class ProposalExporter:
+    """
+    Exports a proposal to Google Docs with as few API round trips as possible.
+
+    The template id and the Proposals/<date> folder ids are cached per user, so a warm export is one
+    files().copy straight into the dated folder plus one batchUpdate. If the copy reports a cached id as
+    missing (template or folder deleted or moved), the ids are resolved again and the copy retried once.
+    Every API step goes through `run_step(call)`, which background jobs use to add retries. With an
+    `export_key` the copy is tagged with it and a retried copy first looks for the tagged document.
+    """
+
+    def __init__(self, docs_service, drive_service, user, cache=None,
+                 template_name=TEMPLATE_NAME, root_folder_name=PROPOSALS_FOLDER_NAME, run_step=None):
+        self.docs_helper = GoogleDocsHelper(docs_service, drive_service)
+        self.drive_api = GoogleDriveAPI(drive_service)
+        self.user = user or "default"
+        self.cache = cache or get_drive_id_cache()
+        self.template_name = template_name
+        self.root_folder_name = root_folder_name
+        self.run_step = run_step or (lambda call: call())
+
+    def _cached(self, key, resolve):
+        value = self.cache.get(self.user, key)
+        if value is None:
+            value = self.run_step(resolve)
+            self.cache.set(self.user, key, value)
+        return value
+
+    def _keys(self, folder_name):
+        return (
+            f"template:{self.template_name}",
+            f"folder:root/{self.root_folder_name}",
+            f"folder:{self.root_folder_name}/{folder_name}",
+        )
+
+    def resolve_ids(self, folder_name):
+        """(template id, target folder id), from the cache or from Drive on a miss."""
+        template_key, root_key, folder_key = self._keys(folder_name)
+        template_id = self._cached(template_key, lambda: self.drive_api.get_template_id(self.template_name))
+        root_folder_id = self._cached(root_key, lambda: self.drive_api.create_folder(self.root_folder_name))
+        folder_id = self._cached(folder_key, lambda: self.drive_api.create_folder(folder_name, parent_folder_id=root_folder_id))
+        return template_id, folder_id
+
+    def _copy(self, template_id, document_name, folder_id, export_key):
+        if not export_key:
+            return self.run_step(lambda: self.docs_helper.copy_template(template_id, document_name, folder_id))
+        app_properties = {EXPORT_KEY_PROPERTY: export_key}
+        copy = create_once(
+            lambda: self.docs_helper.copy_template(template_id, document_name, folder_id, app_properties),
+            lambda: (find_exported_file(self.docs_helper.drive_service, export_key) or {}).get("id"),
+        )
+        return self.run_step(copy)
+
+    def export(self, replacements, document_name, folder_name, export_key=None):
+        """Create the filled-in document inside Proposals/<folder_name>. Returns its document id."""
+        with tracing.span("export.resolve_ids"):
+            template_id, folder_id = self.resolve_ids(folder_name)
+        try:
+            with tracing.span("export.copy_template"):
+                doc_id = self._copy(template_id, document_name, folder_id, export_key)
+        except HttpError as e:
+            if not is_not_found(e):
+                raise
+            logging.info(f"Cached Drive ids for {self.user} are stale ({e}); resolving them again")
+            self.cache.invalidate(self.user, *self._keys(folder_name))
+            with tracing.span("export.resolve_ids", stale=True):
+                template_id, folder_id = self.resolve_ids(folder_name)
+            with tracing.span("export.copy_template"):
+                doc_id = self._copy(template_id, document_name, folder_id, export_key)
+        with tracing.span("export.fill_template", placeholders=len(replacements)):
+            self.run_step(lambda: self.docs_helper.fill_template(doc_id, replacements))
+        return doc_id
+
+
+# httplib2 connections are not thread-safe, so each thread (session or export worker) keeps its own services
+_services = threading.local()
+
+
+def get_google_services(user, token_info):
+    """
+    Docs and Drive services for a user, built once per thread and reused for later exports.
+    Returns (docs_service, drive_service).
+    """
+    if not hasattr(_services, "by_user"):
+        _services.by_user = {}
+    services = _services.by_user.get(user)
+    if services is None or services[0] != token_info.get("refresh_token"):
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+
+        creds = Credentials.from_authorized_user_info(token_info)
+        services = _services.by_user[user] = (
+            token_info.get("refresh_token"),
+            build("docs", "v1", credentials=creds, cache_discovery=False),
+            build("drive", "v3", credentials=creds, cache_discovery=False),
+        )
+    return services[1], services[2]
+
+
 # class GoogleDocsHelper:
 #     """
 #     Handles Google Docs integration using template-based approach
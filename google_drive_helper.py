@@ -1,4 +1,6 @@
+import html
 import json
+import re
 import time
 from googleapiclient.http import MediaFileUpload
 from google.oauth2.credentials import Credentials
@@ -8,58 +10,125 @@ import markdown2
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
-from format_document import extract_relevant_content
-
-
-def create_pdf(file_path, content):
+from format_document import DEFAULT_TEMPLATE, extract_relevant_content
+import tracing
+
+
+TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+    ("GRID", (0, 0), (-1, -1), 1, colors.black),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+    ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
+])
+
+# Long tables are emitted as several Table flowables of this many rows, each repeating the header,
+# so reportlab never re-measures a thousand-row remainder at every page break
+TABLE_CHUNK_ROWS = 100
+
+_SEPARATOR_ROW = re.compile(r"^\|?(\s*:?-+:?\s*\|)+\s*:?-*:?\s*$")  # |---|:---:|
+_HTML_CELL = re.compile(r"^<t[hd][^>]*>(.*)</t[hd]>$")
+_HTML_TABLE_TAGS = {"<table>", "</table>", "<thead>", "</thead>", "<tbody>", "</tbody>"}
+
+
+def _pipe_cells(row):
+    """Cells of a `| a | b |` row left as text, or None if it is prose with fewer than two non-empty cells."""
+    cells = [html.unescape(cell.strip()) for cell in row.split("|")[1:-1]]
+    return cells if sum(1 for cell in cells if cell) >= 2 else None
+
+
+def _table_flowables(rows):
+    """One table's rows as Table flowables of at most TABLE_CHUNK_ROWS rows, header repeated."""
+    rows = [row for row in rows if row]
+    if not rows:
+        return
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    header, body = rows[0], rows[1:]
+    for start in range(0, max(len(body), 1), TABLE_CHUNK_ROWS):
+        table = Table([header] + body[start:start + TABLE_CHUNK_ROWS], repeatRows=1)
+        table.setStyle(TABLE_STYLE)
+        yield table
+    yield Spacer(1, 10)
+
+
+def iter_flowables(html_content, styles):
     """
-    Converts Markdown content into formatted text and generates a well-spaced PDF.
+    Build the story in one pass over the HTML lines. Contiguous table rows, from markdown2
+    <table> markup or pipe rows it left as text, are grouped into a single table.
     """
-    
-    relevant_content = extract_relevant_content(content)
-    
-    # Convert Markdown to HTML
-    html_content = markdown2.markdown(relevant_content, extras=["tables"])
+    rows = []  # Rows of the table being read
+    cells = None  # Cells of the HTML <tr> being read
+    for line in html_content.split("\n"):
+        stripped = line.strip()
+
+        # Tables
+        if stripped in _HTML_TABLE_TAGS:
+            continue
+        if stripped == "<tr>":
+            cells = []
+            continue
+        if cells is not None:
+            if stripped == "</tr>":
+                rows.append(cells)
+                cells = None
+            else:
+                cell = _HTML_CELL.match(stripped)
+                cells.append(html.unescape(cell.group(1) if cell else stripped))
+            continue
+        row = stripped.removeprefix("<p>").removesuffix("</p>").strip()
+        pipe_cells = _pipe_cells(row) if "|" in row else None
+        if pipe_cells:  # Pipe rows markdown2 did not turn into a table
+            if not (len(rows) == 1 and _SEPARATOR_ROW.match(row)):  # Skip the |---| line under the header
+                rows.append(pipe_cells)
+            continue
+        if rows:
+            yield from _table_flowables(rows)
+            rows = []
 
-    # Set up PDF document
-    doc = SimpleDocTemplate(file_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Process HTML content line by line
-    lines = html_content.split("\n")
-    for line in lines:
         if line.startswith("<h1>"):  # Large title
-            story.append(Paragraph(line[4:-5], styles["Title"]))
-            story.append(Spacer(1, 12))
+            yield Paragraph(line[4:-5], styles["Title"])
+            yield Spacer(1, 12)
         elif line.startswith("<h2>"):  # Section headings
-            story.append(Paragraph(line[4:-5], styles["Heading2"]))
-            story.append(Spacer(1, 10))
+            yield Paragraph(line[4:-5], styles["Heading2"])
+            yield Spacer(1, 10)
         elif line.startswith("<ul>"):  # Bullet points
-            story.append(Spacer(1, 5))
+            yield Spacer(1, 5)
         elif line.startswith("<li>"):
-            story.append(Paragraph(f"• {line[4:-5]}", styles["Normal"]))
-            story.append(Spacer(1, 5))
-        elif "|" in line:  # Handle tables
-            table_data = [row.split("|")[1:-1] for row in lines if "|" in row]
-            table = Table(table_data)
-            table.setStyle(TableStyle([
-                ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("GRID", (0, 0), (-1, -1), 1, colors.black),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
-            ]))
-            story.append(table)
-            story.append(Spacer(1, 10))
-        elif line.strip():  # Normal text paragraphs
-            story.append(Paragraph(line.strip(), styles["Normal"]))
-            story.append(Spacer(1, 8))
+            yield Paragraph(f"• {line[4:-5]}", styles["Normal"])
+            yield Spacer(1, 5)
+        elif stripped:  # Normal text paragraphs
+            yield Paragraph(stripped, styles["Normal"])
+            yield Spacer(1, 8)
+
+    if rows:
+        yield from _table_flowables(rows)
+
+
+def render_pdf(file_path, markdown_content):
+    """Render Markdown content to a PDF at `file_path`."""
+    # Convert Markdown to HTML
+    html_content = markdown2.markdown(markdown_content, extras=["tables"])
+
+    # Set up PDF document
+    doc = SimpleDocTemplate(file_path, pagesize=letter)
+    styles = getSampleStyleSheet()
 
     # Build the PDF
-    doc.build(story)
+    doc.build(list(iter_flowables(html_content, styles)))
+
+
+def create_pdf(file_path, content, template=DEFAULT_TEMPLATE):
+    """
+    Converts Markdown content into formatted text and generates a well-spaced PDF.
+    Only the part between the template's anchors (see format_document.TEMPLATE_ANCHORS) is rendered.
+    """
+    with tracing.span("export.extract_content", template=template):
+        relevant_content = extract_relevant_content(content, template)
+    with tracing.span("export.render_pdf"):
+        render_pdf(file_path, relevant_content)
 
 
 
@@ -126,17 +195,19 @@ class GoogleDriveHelper:
 
 
 
-    def upload_file(self, folder_id, file_path, content, file_name=None):
-        """Upload file to specific folder"""
+    def upload_file(self, folder_id, file_path, content, file_name=None, template=DEFAULT_TEMPLATE, app_properties=None):
+        """Upload file to specific folder, tagged with `app_properties` when given"""
         if not file_name:
             file_name = f"proposal_{int(time.time())}.pdf"
         
-        create_pdf(file_path, content)
+        create_pdf(file_path, content, template)
         media = MediaFileUpload(file_path, mimetype='application/pdf')
         file_metadata = {
             "name": file_name,
             "parents": [folder_id]
         }
+        if app_properties:
+            file_metadata["appProperties"] = app_properties
 
         file = self.service.files().create(
             body=file_metadata,
@@ -1,47 +1,59 @@
 from pathlib import Path
 import time
 import streamlit as st
+from blob_store import get_blob_store
+from db_helper import check_if_file_exists_in_section
 from ingress import ingress_file_doc
+import tracing
+from web_fetcher import fetch_web_pages, parse_links
 
 
 from concurrent.futures import ThreadPoolExecutor
 
-def process_files_and_links(files, web_links, section):
+def process_files_and_links(files, web_links, section, reingest=False, project=""):
+    # Links are fetched once per batch rather than once per uploaded file
+    links = [link for link in parse_links(web_links) if not check_if_file_exists_in_section(link, section, project)]
     with st.spinner("Processing..."):
         with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = [executor.submit(process_file, file, section, web_links) for file in files]
+            futures = [executor.submit(process_file, file, section, reingest, project) for file in files]
+            if links:
+                futures.append(executor.submit(process_links, links, section, project))
             for future in futures:
                 future.result()  # ✅ Call function directly
     st.session_state["files_processed"] = True
 
-def process_file(uploaded_file, section, web_links):
+def process_links(links, section, project=""):
+    try:
+        with tracing.span("ingest.web_fetch", links=len(links)):
+            web_pages = fetch_web_pages(links)
+        response = ingress_file_doc(f"{len(web_pages)} web link(s)", None, None, section, web_pages=web_pages, project=project)
+        if "error" in response:
+            st.error(f"Web link processing error: {response['error']}")
+    except Exception as e:
+        st.error(f"Unexpected error while processing web links: {e}")
+
+def process_file(uploaded_file, section, reingest=False, project=""):
     try:
         file_name = uploaded_file.name
         st.session_state["file_name"] = file_name
-        # Use pathlib to define the file path
-        temp_dir = Path("./temp_files")
-        temp_dir.mkdir(parents=True, exist_ok=True)  # Ensure the directory exists
-        
-        # Define the file path
-        file_path = temp_dir / file_name  # Concatenate the directory path and file name
-
-        # Save file locally for processing
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getvalue())
-
-
-        # Call the function with correct arguments
-        try:
-            response = ingress_file_doc(file_name, file_path, web_links or [], section)
-            if "error" in response:
-                st.error(f"File processing error: {response['error']}")
-            else:
-                placeholder = st.empty()
-                placeholder.success(f"File '{file_name}' processed successfully!")
-                time.sleep(5)
-                placeholder.empty()
-        except Exception as e:
-            st.error(f"Unexpected error: {e}")
+
+        # Store the upload by content hash so concurrent uploads with the same name never clobber each other;
+        # the blob store's sweeper leaves it alone until the ingest below is done
+        with get_blob_store().stored(uploaded_file.getvalue(), suffix=Path(file_name).suffix.lower()) as (content_hash, file_path):
+            # Call the function with correct arguments
+            try:
+                response = ingress_file_doc(file_name, file_path, None, section, content_hash=content_hash, reingest=reingest, project=project)
+                if "error" in response:
+                    st.error(f"File processing error: {response['error']}")
+                elif not response.get("success"):
+                    st.info(f"File '{file_name}' was not re-processed: its content is already in the knowledge base.")
+                else:
+                    placeholder = st.empty()
+                    placeholder.success(f"File '{file_name}' processed successfully!")
+                    time.sleep(5)
+                    placeholder.empty()
+            except Exception as e:
+                st.error(f"Unexpected error: {e}")
 
     except Exception as e:
         st.error(f"Connection error: {e}")
@@ -1,22 +1,37 @@
-import sqlite3
-import time
+import logging
 import traceback
 import streamlit as st
-from constant import SECTION_KEYWORDS, select_section
-import traceback
-from pathlib import Path
-from db_helper import insert_file_metadata
+import accounting
+import tracing
+from constant import SECTION_KEYWORDS
+from blob_store import get_blob_store, sha256_bytes, sha256_file
+from chunker import chunk_document
+from db_helper import file_exists, find_file_by_content_hash, get_file_record, get_minhash_signatures, insert_files_metadata, update_file_metadata
 from document_processor import DocumentProcessor
+from utils import clean_text
+from snapshots import SnapshotConflict, checkout_snapshot, discard_checkout, publish_snapshot, snapshots_enabled
+from web_fetcher import fetch_web_pages, parse_links
+from workspaces import SHARED, layer_for, visible_layers, workspace_dir, workspace_prefix
 
 process_document = DocumentProcessor()
 
+# Checkout, insert and publish cycles tried before an ingest that keeps losing the publish race gives up
+PUBLISH_ATTEMPTS = 3
+
 
-def ingress_file_doc(file_name: str, file_path: str = None, web_links: list = None, section=""):
-    from app import RAGFactory
-    import traceback
+@tracing.traced("ingest")
+def ingress_file_doc(file_name: str, file_path: str = None, web_links: list = None, section="", content_hash: str = None, web_pages: dict = None, reingest: bool = False, project: str = SHARED):
+    # numpy (MinHash) and lightrag are only loaded once something is actually ingested
+    from dedup import build_lsh_index, compute_minhash, signature_to_bytes
+    from llm_routing import ENTITY_EXTRACTION
+    from rag_factory import RAGFactory, count_llm_cache_hits
+    from storage import push_workspace
+    from workspace_ops import insert_document, reingest_document
     
     # Get the section from session state
     section = st.session_state.get("current_section", section)  # Use session state or fallback to provided section
+    tracing.annotate(file=file_name, section=section)
+    email = (st.session_state.get("credentials") or {}).get("email", "")
 
     try:
         # Map section to table name
@@ -24,70 +39,187 @@ def ingress_file_doc(file_name: str, file_path: str = None, web_links: list = No
         if not table_name:
             return {"error": "No table mapping found for the given section."}
 
-        # Connect to the database
-        conn = sqlite3.connect("files.db", check_same_thread=False)
-        cursor = conn.cursor()
-
-        # Check if file already exists in the database
-        if file_path:
-            cursor.execute(f"SELECT file_name FROM {table_name} WHERE file_name = ?", (file_name,))
-            if cursor.fetchone():
-                st.sidebar.warning(f"File '{file_name}' already exists in the '{section}' section.")
-
-        # Check if web links already exist in the database
-        if web_links:
-            for link in web_links:
-                cursor.execute(f"SELECT file_name FROM {table_name} WHERE file_name = ?", (link,))
-                if cursor.fetchone():
-                    st.sidebar.warning(f"Web link '{link}' already exists in the '{section}' section.")
-
-        # Initialize text content list
-        text_content = []
+        # Company knowledge goes to the shared layer, everything else to the selected project's workspace
+        layer = layer_for(table_name, project)
+        tracing.annotate(layer=layer or "shared")
+
+        # Near-duplicate index over everything this layer can already see, in every section
+        with tracing.span("ingest.dedup_index"):
+            lsh_index = build_lsh_index(get_minhash_signatures(visible_layers(layer)))
+        batch_hashes = set()
+        documents = []  # (name, content, content_hash, minhash)
+        revisions = []  # (name, old_content, new_content, content_hash, minhash)
+        skipped = []
+
+        def is_exact_duplicate(name, content_hash):
+            duplicate = find_file_by_content_hash(content_hash, visible_layers(layer))
+            if duplicate:
+                skipped.append(f"'{name}' is identical to '{duplicate[1]}' in {SECTION_KEYWORDS[duplicate[0]]}")
+            elif content_hash in batch_hashes:
+                skipped.append(f"'{name}' is identical to another item in this upload")
+            return bool(duplicate) or content_hash in batch_hashes
+
+        def near_duplicate_check(name, text):
+            """Return the MinHash signature of `text`, or None if it near-duplicates stored content."""
+            signature = compute_minhash(text)
+            matches = lsh_index.query(signature)
+            if matches:
+                (match_table, match_name), similarity = matches[0]
+                skipped.append(f"'{name}' is a near-duplicate ({similarity:.0%}) of '{match_name}' in {SECTION_KEYWORDS.get(match_table, match_table)}")
+                return None
+            return signature
+
+        def accept(name, content, content_hash, signature):
+            batch_hashes.add(content_hash)
+            lsh_index.insert((table_name, name), signature)
+            documents.append((name, content, content_hash, signature_to_bytes(signature)))
 
         # Process file content if file_path is provided
         if file_path:
             file_path_str = str(file_path)  # Convert Path object to string
-            if file_path_str.endswith(".pdf"):
-                extracted_text = process_document.extract_text_and_tables_from_pdf(file_path_str)
-                if extracted_text:
-                    text_content.append(extracted_text)
-            elif file_path_str.endswith(".txt"):
-                text_content.append(process_document.extract_txt_content(file_path_str))
-            else:
+            if not file_path_str.endswith((".pdf", ".txt")):
                 return {"error": "Unsupported file format."}
 
-        # Process web links if provided
-        if web_links:
-            for link in web_links:
-                web_content = process_document.process_webpage(link)
-                if web_content:
-                    text_content.append(web_content)
-
-        # Ensure there is content to process
-        if not text_content:
+            # Exact duplicates are caught from the raw bytes, before any extraction happens
+            content_hash = content_hash or sha256_file(file_path_str)
+
+            def extract():
+                if file_path_str.endswith(".pdf"):
+                    # Identical bytes are only parsed once, whatever section they are uploaded to
+                    with tracing.span("ingest.extract_pdf"):
+                        extracted_text = process_document.extract_pdf_cached(file_path_str, content_hash, get_blob_store())
+                else:
+                    with tracing.span("ingest.extract_txt"):
+                        extracted_text = process_document.extract_txt_content(file_path_str)
+                # Same normalization web pages get, so hashes and chunks are comparable across sources
+                with tracing.span("ingest.clean_text"):
+                    return clean_text(extracted_text) if extracted_text else extracted_text
+
+            existing = get_file_record(file_name, table_name, layer)
+            if existing and not reingest:
+                skipped.append(f"File '{file_name}' already exists in the '{section}' section")
+            elif existing and existing.content_hash == content_hash:
+                skipped.append(f"File '{file_name}' is unchanged since it was last ingested")
+            elif existing:
+                # A revised version of a stored file: only its changed chunks are re-processed below
+                extracted_text = extract()
+                if extracted_text:
+                    signature = signature_to_bytes(compute_minhash(extracted_text))
+                    revisions.append((file_name, existing.content, extracted_text, content_hash, signature))
+            elif not is_exact_duplicate(file_name, content_hash):
+                extracted_text = extract()
+                signature = near_duplicate_check(file_name, extracted_text) if extracted_text else None
+                if signature is not None:
+                    accept(file_name, extracted_text, content_hash, signature)
+
+        # Process web links if provided; callers batching several jobs pass the pages already fetched
+        if web_links and web_pages is None:
+            known_links = []
+            for link in parse_links(web_links):
+                if file_exists(link, table_name, layer):
+                    skipped.append(f"Web link '{link}' already exists in the '{section}' section")
+                else:
+                    known_links.append(link)
+            with tracing.span("ingest.web_fetch", links=len(known_links)):
+                web_pages = fetch_web_pages(known_links)
+
+        for link, web_content in (web_pages or {}).items():
+            if web_content:
+                web_hash = sha256_bytes(web_content.encode("utf-8"))
+                if not is_exact_duplicate(link, web_hash):
+                    signature = near_duplicate_check(link, web_content)
+                    if signature is not None:
+                        accept(link, web_content, web_hash, signature)
+
+        for message in skipped:
+            st.sidebar.warning(f"{message}; skipped.")
+
+        # Nothing new to embed or graph-index
+        if not documents and not revisions:
+            if skipped:
+                return {"skipped": skipped}
             return {"error": "No valid content extracted from file or web links."}
 
-        # Insert metadata into the database
-        for content in text_content:
-            insert_file_metadata(file_name, table_name, content)
-
-        # Create unique working directory for the file
-        working_dir = Path("./analysis_workspace")
+        # The layer's workspace directory
+        working_dir = workspace_dir(layer)
         working_dir.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
 
-        # Process data using RAGFactory
-        rag = RAGFactory.create_rag(str(working_dir))
-        rag.insert(text_content)
+        def build_workspace():
+            """Insert the new documents and revisions into the workspace. Returns (chunk reports, reingest stats)."""
+            with tracing.span("ingest.load_rag"):
+                rag = RAGFactory.create_rag(str(working_dir))
+            chunk_reports = []
+            # Process data using RAGFactory, chunking along page, heading and table boundaries
+            for name, content, _, _ in documents:
+                with tracing.span("ingest.chunk"):
+                    chunks, report = chunk_document(content, table_name)
+                logging.info(f"Chunking {report.summary(name)}")
+                chunk_reports.append(report)
+                # Embedding and entity extraction calls show up as child spans, and are billed to the document
+                with accounting.usage_scope("ingest", email=email, section=table_name, document=name), \
+                        tracing.span("ingest.insert", chunks=len(chunks)), count_llm_cache_hits(ENTITY_EXTRACTION):
+                    insert_document(rag, content, chunks)
+
+            # Revised files: diff chunk hashes against the workspace and only embed / extract what changed
+            reingest_stats = []
+            for name, old_content, new_content, _, _ in revisions:
+                with tracing.span("ingest.chunk"):
+                    chunks, report = chunk_document(new_content, table_name)
+                chunk_reports.append(report)
+                with accounting.usage_scope("ingest", email=email, section=table_name, document=name), \
+                        tracing.span("ingest.reingest", chunks=len(chunks)), count_llm_cache_hits(ENTITY_EXTRACTION):
+                    reingest_stats.append(reingest_document(rag, old_content, new_content, chunks))
+            return chunk_reports, reingest_stats
+
+        # Share the updated workspace; only files that changed are uploaded. If another ingest publishes
+        # the layer first, its snapshot is checked out and the documents are inserted again on top of it.
+        for attempt in range(1, PUBLISH_ATTEMPTS + 1):
+            if snapshots_enabled():
+                # Start from the version query replicas serve, so the published snapshot builds on it
+                with tracing.span("ingest.checkout_snapshot") as checkout_span:
+                    checkout_span.set(version=checkout_snapshot(working_dir, layer))
+            chunk_reports, reingest_stats = build_workspace()
+            try:
+                if snapshots_enabled():
+                    with tracing.span("ingest.publish_snapshot") as publish_span:
+                        publish_span.set(**publish_snapshot(working_dir, layer))
+                else:
+                    with tracing.span("ingest.push_workspace") as push_span:
+                        push_span.set(**push_workspace(working_dir, prefix=workspace_prefix(layer)))
+                break
+            except SnapshotConflict as e:
+                if attempt == PUBLISH_ATTEMPTS:
+                    logging.error(f"❌ Snapshot not published after {attempt} attempts, other ingests kept publishing first ({e})")
+                    return {"error": "Other uploads kept changing this workspace at the same time; nothing was saved.", "skipped": skipped}
+                logging.warning(f"⚠️ Another ingest published first ({e}); rebuilding on its snapshot (attempt {attempt}/{PUBLISH_ATTEMPTS})")
+            except Exception as e:
+                if snapshots_enabled():
+                    # Nothing was published, so nothing is recorded; the next ingest starts from the published files
+                    discard_checkout(working_dir)
+                    logging.error(f"❌ Snapshot not published: {e}")
+                    return {"error": f"The workspace could not be published, nothing was saved: {e}", "skipped": skipped}
+                logging.warning(f"⚠️ Workspace not pushed to GCS: {e}")
+                break
+
+        # Record the documents only once the workspace holding them is shared, so the database never
+        # lists a document that no snapshot contains (without snapshots the local workspace is the copy that counts)
+        with tracing.span("ingest.save_metadata"):
+            insert_files_metadata(table_name, documents, layer)
+            for name, _, new_content, doc_hash, minhash in revisions:
+                update_file_metadata(name, table_name, new_content, content_hash=doc_hash, minhash=minhash, project=layer)
+
+        for (name, *_), stats in zip(revisions, reingest_stats):
+            st.sidebar.info(
+                f"🔁 '{name}' re-ingested: {stats['added']} new, {stats['kept']} unchanged, "
+                f"{stats['retired']} retired chunks"
+            )
 
         # Show success message
         st.success(f"File '{file_name}' processed and inserted successfully!")
-        return {"success": True}
+        return {"success": True, "skipped": skipped, "chunk_reports": chunk_reports, "reingested": reingest_stats}
 
     except Exception as e:
         traceback.print_exc()
         return {"error": str(e)}
 
-    finally:
-        conn.close()
-
 
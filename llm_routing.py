@@ -0,0 +1,288 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+import accounting
+from cassette import get_cassette, llm_key
+from chunker import count_tokens
+from llm_scheduler import DEFAULT_COMPLETION_RESERVE, get_scheduler
+import tracing
+
+# Pipeline stages that call an LLM
+ENTITY_EXTRACTION = "entity_extraction"
+DESCRIPTION_SUMMARY = "description_summary"
+KEYWORD_EXTRACTION = "keyword_extraction"
+QUERY_EXPANSION = "query_expansion"
+FINAL_GENERATION = "final_generation"
+STAGES = (ENTITY_EXTRACTION, DESCRIPTION_SUMMARY, KEYWORD_EXTRACTION, QUERY_EXPANSION, FINAL_GENERATION)
+# Embedding calls are tracked alongside the LLM stages but are not routed by stage
+EMBEDDING = "embedding"
+
+MODEL_TIERS = {
+    "fast": "gpt-4o-mini",
+    "strong": "gpt-4o",
+}
+
+# Bulk ingest work runs on the fast tier; only the proposal itself uses the strong model.
+# Override per stage with an [LLM_STAGE_MODELS] table in secrets.toml (tier or model name).
+DEFAULT_STAGE_TIERS = {
+    ENTITY_EXTRACTION: "fast",
+    DESCRIPTION_SUMMARY: "fast",
+    KEYWORD_EXTRACTION: "fast",
+    QUERY_EXPANSION: "fast",
+    FINAL_GENERATION: "strong",
+}
+
+# Chat models a stage can be routed to
+COMPLETION_MODELS = ("gpt-4o", "gpt-4o-mini")
+
+# USD per million tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+
+def openai_client(api_key=None):
+    """
+    OpenAI client that never retries. The scheduler is the only layer that retries a 429: the SDK's
+    own retries and LightRAG's tenacity wrappers would repeat it inside an admitted slot, unseen by
+    the lane's backoff. A new client per call, as LightRAG does, since calls come from several event loops.
+    """
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=api_key, max_retries=0)
+
+
+async def openai_complete(model, prompt, system_prompt=None, history_messages=None, api_key=None, **kwargs):
+    """One chat completion, taking and returning the same as LightRAG's openai_complete_if_cache."""
+    from lightrag.utils import safe_unicode_decode
+
+    kwargs.pop("hashing_kv", None)
+    kwargs.pop("keyword_extraction", None)
+    messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    messages += list(history_messages or [])
+    messages.append({"role": "user", "content": prompt})
+
+    client = openai_client(api_key)
+    if "response_format" in kwargs:
+        response = await client.beta.chat.completions.parse(model=model, messages=messages, **kwargs)
+    else:
+        response = await client.chat.completions.create(model=model, messages=messages, **kwargs)
+
+    if hasattr(response, "__aiter__"):
+        async def stream():
+            async for chunk in response:
+                content = chunk.choices[0].delta.content
+                if content is None:
+                    continue
+                yield safe_unicode_decode(content.encode("utf-8")) if r"\u" in content else content
+
+        return stream()
+    content = response.choices[0].message.content
+    return safe_unicode_decode(content.encode("utf-8")) if r"\u" in content else content
+
+
+async def openai_embed(texts, model, api_key=None):
+    """One embeddings request, as LightRAG's openai_embed but without its retries."""
+    import numpy as np
+
+    response = await openai_client(api_key).embeddings.create(model=model, input=texts, encoding_format="float")
+    return np.array([item.embedding for item in response.data])
+
+
+@lru_cache(maxsize=1)
+def _prompt_prefixes():
+    """LightRAG's extraction and summary prompts, recognised by the first line of their templates."""
+    from lightrag.prompt import PROMPTS
+
+    extraction = tuple(
+        PROMPTS[name].split("\n", 1)[0]
+        for name in ("entity_extraction", "entiti_continue_extraction", "entiti_if_loop_extraction")
+    )
+    return extraction, PROMPTS["summarize_entity_descriptions"].split("\n", 1)[0]
+
+
+def resolve_stage_models(overrides=None):
+    """
+    Map every stage to a model name. `overrides` maps stages to a tier ("fast"/"strong") or a model name.
+    """
+    stage_models = {stage: MODEL_TIERS[tier] for stage, tier in DEFAULT_STAGE_TIERS.items()}
+    for stage, value in dict(overrides or {}).items():
+        if stage not in stage_models:
+            logging.warning(f"Ignoring model override for unknown LLM stage '{stage}'")
+            continue
+        model = MODEL_TIERS.get(value, value)
+        if model not in COMPLETION_MODELS:
+            logging.warning(f"Ignoring unsupported model '{value}' for LLM stage '{stage}'")
+            continue
+        stage_models[stage] = model
+    return stage_models
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+@dataclass
+class StageUsage:
+    calls: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    latency_seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+
+    @property
+    def avg_latency_seconds(self):
+        return self.latency_seconds / self.calls if self.calls else 0.0
+
+
+class UsageTracker:
+    """
+    Thread-safe per-stage and per-model totals of LLM calls, latency, tokens and estimated cost.
+    Each call is also attributed to the current accounting.usage_scope, which persists it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage = {}
+
+    def record(self, stage, model, latency_seconds, prompt_tokens=0, completion_tokens=0, error=False):
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            usage = self._usage.setdefault((stage, model), StageUsage())
+            usage.calls += 1
+            usage.errors += int(error)
+            usage.latency_seconds += latency_seconds
+            usage.prompt_tokens += prompt_tokens
+            usage.completion_tokens += completion_tokens
+            usage.cost_usd += cost
+        accounting.record(stage, model, latency_seconds, prompt_tokens, completion_tokens, cost, error)
+        logging.info(
+            f"LLM {stage} on {model}: {latency_seconds:.2f}s, "
+            f"{prompt_tokens}+{completion_tokens} tokens, ~${cost:.4f}{' (failed)' if error else ''}"
+        )
+
+    def record_cache_hits(self, stage, model, count=1):
+        """Answers LightRAG served from its LLM response cache instead of calling the model."""
+        if count <= 0:
+            return
+        with self._lock:
+            self._usage.setdefault((stage, model), StageUsage()).cache_hits += count
+        accounting.record(stage, model, cache_hits=count)
+
+    def snapshot(self):
+        """Return {(stage, model): StageUsage} copies."""
+        with self._lock:
+            return {key: StageUsage(**vars(usage)) for key, usage in self._usage.items()}
+
+    def rows(self):
+        """Per-stage rows for display, in pipeline order."""
+        order = {stage: index for index, stage in enumerate(STAGES)}
+        return [
+            {
+                "stage": stage,
+                "model": model,
+                "calls": usage.calls,
+                "cache hits": usage.cache_hits,
+                "errors": usage.errors,
+                "avg latency (s)": round(usage.avg_latency_seconds, 2),
+                "prompt tokens": usage.prompt_tokens,
+                "completion tokens": usage.completion_tokens,
+                "est. cost ($)": round(usage.cost_usd, 4),
+            }
+            for (stage, model), usage in sorted(self.snapshot().items(), key=lambda item: order.get(item[0][0], 99))
+        ]
+
+    def total_cost(self):
+        with self._lock:
+            return sum(usage.cost_usd for usage in self._usage.values())
+
+    def reset(self):
+        with self._lock:
+            self._usage.clear()
+
+
+usage_tracker = UsageTracker()
+
+
+def detect_stage(prompt, system_prompt=None, history_messages=None, keyword_extraction=False):
+    """Work out which pipeline stage a LightRAG llm_model_func call belongs to."""
+    if keyword_extraction:
+        return KEYWORD_EXTRACTION
+    extraction_prefixes, summary_prefix = _prompt_prefixes()
+    if prompt.startswith(summary_prefix):
+        return DESCRIPTION_SUMMARY
+    if history_messages or prompt.startswith(extraction_prefixes):
+        return ENTITY_EXTRACTION
+    return FINAL_GENERATION
+
+
+def _prompt_tokens(prompt, system_prompt, history_messages):
+    text = "\n".join([system_prompt or ""] + [m.get("content", "") for m in history_messages or []] + [prompt])
+    return count_tokens(text)
+
+
+def make_routed_llm_func(stage_models, tracker=usage_tracker, scheduler=None, api_key=None):
+    """
+    Build an llm_model_func for LightRAG that sends each call to the model configured for its stage
+    through the shared rate-limit scheduler, and records latency, tokens and estimated cost.
+    `api_key` is the OpenAI key or a function returning it, read when a call is sent.
+    """
+
+    async def routed_llm_func(prompt, system_prompt=None, history_messages=[], keyword_extraction=False, **kwargs):
+        stage = detect_stage(prompt, system_prompt, history_messages, keyword_extraction)
+        model = stage_models[stage]
+        cassette = get_cassette()
+        if cassette.replaying:
+            # Answered from the recording without the scheduler or the network
+            key = llm_key(prompt, system_prompt, history_messages, keyword_extraction=keyword_extraction, **kwargs)
+            result = cassette.replay_response(key, stage)
+            tracker.record_cache_hits(stage, model)
+            return result
+        prompt_tokens = _prompt_tokens(prompt, system_prompt, history_messages)
+        reserved = kwargs.get("max_tokens") or DEFAULT_COMPLETION_RESERVE
+        active_scheduler = scheduler or get_scheduler()
+        latency = 0.0
+
+        async def call():
+            nonlocal latency
+            start = time.perf_counter()
+            try:
+                return await openai_complete(
+                    model,
+                    prompt,
+                    system_prompt=system_prompt,
+                    history_messages=history_messages,
+                    keyword_extraction=keyword_extraction,
+                    api_key=api_key() if callable(api_key) else api_key,
+                    **kwargs,
+                )
+            finally:
+                latency = time.perf_counter() - start
+
+        try:
+            # The span includes time queued in the scheduler; the call's own latency is an attribute
+            with tracing.span(f"llm.{stage}", model=model, prompt_tokens=prompt_tokens) as llm_span:
+                result = await active_scheduler.run_async(model, call, prompt_tokens + reserved)
+                llm_span.set(call_ms=round(latency * 1000, 1))
+        except Exception:
+            tracker.record(stage, model, latency, prompt_tokens, error=True)
+            raise
+        # Streamed responses are not counted, their length is unknown until the caller drains them
+        completion_tokens = count_tokens(result) if isinstance(result, str) else 0
+        if isinstance(result, str):
+            active_scheduler.refund(model, reserved - completion_tokens)
+        tracker.record(stage, model, latency, prompt_tokens, completion_tokens)
+        if cassette.recording and isinstance(result, str):
+            key = llm_key(prompt, system_prompt, history_messages, keyword_extraction=keyword_extraction, **kwargs)
+            cassette.put_response(key, stage, model, result)
+        return result
+
+    return routed_llm_func
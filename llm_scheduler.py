@@ -0,0 +1,313 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Request priorities: lower runs first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# (requests per minute, tokens per minute) per model; override with [LLM_RATE_LIMITS] in secrets.toml
+DEFAULT_RATE_LIMITS = {
+    "gpt-4o": (500, 30_000),
+    "gpt-4o-mini": (500, 200_000),
+    "text-embedding-3-large": (3_000, 1_000_000),
+}
+FALLBACK_RATE_LIMIT = (500, 30_000)
+
+# Tokens reserved for a completion whose length is not capped by max_tokens; refunded once known
+DEFAULT_COMPLETION_RESERVE = 1_000
+
+MAX_RATE_LIMIT_RETRIES = 5
+INITIAL_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 60.0
+# After a 429 the lane runs at a fraction of its budget and earns it back with every success
+MIN_RATE_SCALE = 0.1
+RATE_SCALE_RECOVERY = 0.05
+_MAX_POLL_SECONDS = 0.5
+_WAIT_SAMPLES = 500
+
+_current_priority = contextvars.ContextVar("llm_priority", default=BACKGROUND)
+
+
+@contextmanager
+def llm_priority(priority):
+    """Run every LLM and embedding call made inside the block (and its asyncio tasks) at `priority`."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority():
+    return _current_priority.get()
+
+
+@lru_cache(maxsize=1)
+def _rate_limit_error():
+    # openai is only imported once a call is actually made
+    from openai import RateLimitError
+
+    return RateLimitError
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `capacity` per minute, scaled by `scale`. Not thread-safe."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.scale = 1.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        rate = self.capacity * self.scale / 60.0
+        self.available = min(self.capacity, self.available + (now - self._updated) * rate)
+        self._updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be taken (0 if it can be taken now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / (self.capacity * self.scale / 60.0)
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.available -= min(amount, self.capacity)
+
+    def refund(self, amount, now):
+        self._refill(now)
+        self.available = min(self.capacity, self.available + amount)
+
+
+class _Lane:
+    """Admission state for one model: RPM and TPM buckets, a priority queue of waiters and 429 backoff."""
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.waiters = []  # heap of (priority, sequence)
+        self.cooldown_until = 0.0
+        self.backoff_seconds = INITIAL_BACKOFF_SECONDS
+        self.rate_limited = 0
+
+    def set_scale(self, scale):
+        self.requests.scale = self.tokens.scale = scale
+
+    @property
+    def scale(self):
+        return self.requests.scale
+
+
+class LLMScheduler:
+    """
+    In-process admission control shared by every LLM and embedding call.
+
+    Each model has token buckets for requests and tokens per minute. Waiting calls are admitted strictly
+    by priority (interactive before background ingest), then in arrival order. A 429 pauses the model's lane,
+    halves its budget and retries with exponential backoff; successes slowly restore the budget.
+    Works across threads and event loops: waiting is a plain sleep or an asyncio sleep around a lock.
+    """
+
+    def __init__(self, rate_limits=None):
+        self._lock = threading.Lock()
+        self._rate_limits = dict(DEFAULT_RATE_LIMITS)
+        self._rate_limits.update(rate_limits or {})
+        self._lanes = {}
+        self._sequence = itertools.count()
+        self._waits = {priority: deque(maxlen=_WAIT_SAMPLES) for priority in PRIORITY_NAMES}
+        self._admitted = {priority: 0 for priority in PRIORITY_NAMES}
+
+    def _lane(self, model):
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = self._lanes[model] = _Lane(*self._rate_limits.get(model, FALLBACK_RATE_LIMIT))
+        return lane
+
+    # --- admission ---
+
+    def _enqueue(self, model, priority):
+        with self._lock:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._lane(model).waiters, ticket)
+            return ticket
+
+    def _try_admit(self, model, ticket, tokens):
+        """Admit `ticket` if it is at the head of its lane and both buckets allow it; else return seconds to wait."""
+        with self._lock:
+            lane = self._lane(model)
+            now = time.monotonic()
+            if lane.waiters[0] != ticket:
+                return _MAX_POLL_SECONDS / 10
+            wait = max(
+                lane.cooldown_until - now,
+                lane.requests.wait_time(1, now),
+                lane.tokens.wait_time(tokens, now),
+            )
+            if wait > 0:
+                return min(wait, _MAX_POLL_SECONDS)
+            lane.requests.take(1, now)
+            lane.tokens.take(tokens, now)
+            heapq.heappop(lane.waiters)
+            return 0.0
+
+    def _admitted_after(self, priority, waited):
+        with self._lock:
+            self._waits[priority].append(waited)
+            self._admitted[priority] += 1
+        if waited > 1:
+            logging.info(f"LLM {PRIORITY_NAMES[priority]} request waited {waited:.1f}s for rate limit budget")
+
+    def acquire(self, model, tokens, priority=None):
+        """Block the calling thread until a request of `tokens` may be sent to `model`."""
+        priority = current_priority() if priority is None else priority
+        ticket = self._enqueue(model, priority)
+        start = time.monotonic()
+        admitted = False
+        try:
+            while (wait := self._try_admit(model, ticket, tokens)) > 0:
+                time.sleep(wait)
+            admitted = True
+        finally:
+            if not admitted:
+                self._abandon(model, ticket)
+        self._admitted_after(priority, time.monotonic() - start)
+
+    async def acquire_async(self, model, tokens, priority=None):
+        """Coroutine version of `acquire` that sleeps without blocking the event loop."""
+        priority = current_priority() if priority is None else priority
+        ticket = self._enqueue(model, priority)
+        start = time.monotonic()
+        admitted = False
+        try:
+            while (wait := self._try_admit(model, ticket, tokens)) > 0:
+                await asyncio.sleep(wait)
+            admitted = True
+        finally:
+            if not admitted:
+                self._abandon(model, ticket)
+        self._admitted_after(priority, time.monotonic() - start)
+
+    def _abandon(self, model, ticket):
+        with self._lock:
+            lane = self._lane(model)
+            if ticket in lane.waiters:
+                lane.waiters.remove(ticket)
+                heapq.heapify(lane.waiters)
+
+    def refund(self, model, tokens):
+        """Return reserved tokens that the call did not use."""
+        if tokens > 0:
+            with self._lock:
+                self._lane(model).tokens.refund(tokens, time.monotonic())
+
+    # --- outcome feedback ---
+
+    def _on_success(self, model):
+        with self._lock:
+            lane = self._lane(model)
+            lane.backoff_seconds = INITIAL_BACKOFF_SECONDS
+            if lane.scale < 1.0:
+                lane.set_scale(min(1.0, lane.scale + RATE_SCALE_RECOVERY))
+
+    def _on_rate_limited(self, model, error):
+        """Pause the lane and shrink its budget. Returns the backoff applied."""
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        with self._lock:
+            lane = self._lane(model)
+            lane.rate_limited += 1
+            backoff = retry_after if retry_after else lane.backoff_seconds * random.uniform(0.8, 1.2)
+            lane.backoff_seconds = min(MAX_BACKOFF_SECONDS, lane.backoff_seconds * 2)
+            lane.cooldown_until = max(lane.cooldown_until, time.monotonic() + backoff)
+            lane.set_scale(max(MIN_RATE_SCALE, lane.scale / 2))
+        logging.warning(f"⚠️ Rate limited on {model}; backing off {backoff:.1f}s at {lane.scale:.0%} of budget")
+        return backoff
+
+    # --- call wrappers ---
+
+    def run(self, model, call, tokens, priority=None):
+        """Call `call()` once admitted, retrying on 429s."""
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            self.acquire(model, tokens, priority)
+            try:
+                result = call()
+            except Exception as e:
+                if not isinstance(e, _rate_limit_error()) or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                self._on_rate_limited(model, e)
+                continue
+            self._on_success(model)
+            return result
+
+    async def run_async(self, model, call, tokens, priority=None):
+        """Await `call()` once admitted, retrying on 429s. `call` must return a new awaitable each time."""
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await self.acquire_async(model, tokens, priority)
+            try:
+                result = await call()
+            except Exception as e:
+                if not isinstance(e, _rate_limit_error()) or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                self._on_rate_limited(model, e)
+                continue
+            self._on_success(model)
+            return result
+
+    # --- metrics ---
+
+    def metrics(self):
+        """Queue depth per model and priority, wait-time statistics per priority and 429 counts."""
+        with self._lock:
+            now = time.monotonic()
+            lanes = {
+                model: {
+                    "queued": {
+                        name: sum(1 for priority, _ in lane.waiters if priority == level)
+                        for level, name in PRIORITY_NAMES.items()
+                    },
+                    "rate_limited": lane.rate_limited,
+                    "budget_scale": round(lane.scale, 2),
+                    "cooling_down_seconds": round(max(0.0, lane.cooldown_until - now), 1),
+                }
+                for model, lane in self._lanes.items()
+            }
+            waits = {}
+            for level, name in PRIORITY_NAMES.items():
+                samples = sorted(self._waits[level])
+                waits[name] = {
+                    "admitted": self._admitted[level],
+                    "avg_wait_seconds": round(sum(samples) / len(samples), 3) if samples else 0.0,
+                    "p95_wait_seconds": round(samples[round(0.95 * (len(samples) - 1))], 3) if samples else 0.0,
+                    "max_wait_seconds": round(samples[-1], 3) if samples else 0.0,
+                }
+        return {"lanes": lanes, "waits": waits}
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(rate_limits=None) -> LLMScheduler:
+    """Process-wide scheduler; `rate_limits` only applies when it is first created."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = LLMScheduler(rate_limits)
+        return _default_scheduler
@@ -0,0 +1,117 @@
+import json
+import logging
+import re
+
+# Template placeholder -> section title as the proposal prompt writes it, in document order
+PROPOSAL_SECTIONS = {
+    "INTRODUCTION_CONTENT": "Introduction",
+    "PROJECT_SCOPE_CONTENT": "Project Scope",
+    "EXCLUSIONS_CONTENT": "Exclusions",
+    "DELIVERABLES_CONTENT": "Deliverables",
+    "COMMERCIAL_CONTENT": "Commercial",
+    "SCHEDULE_CONTENT": "Schedule",
+    "COMPLIANCE_CONTENT": "Compliance Section",
+    "EXPERIENCE_CONTENT": "Experience & Qualifications",
+    "ADDITIONAL_DOCUMENTS_CONTENT": "Additional Documents Required",
+    "CONCLUSION_CONTENT": "Conclusion",
+    "SIGN_OFF_CONTENT": "Yours Sincerely,",
+}
+
+# Other header spellings the model produces for the same sections
+_HEADER_ALIASES = {
+    "COMPLIANCE_CONTENT": ("Compliance",),
+    "EXPERIENCE_CONTENT": ("Experience and Qualifications", "Experience"),
+    "ADDITIONAL_DOCUMENTS_CONTENT": ("Additional Documents",),
+    "SIGN_OFF_CONTENT": ("Yours Sincerely", "Sign Off"),
+}
+
+# Markdown marks, numbering ("1.", "2)", "IV.") and trailing punctuation around a header line
+_HEADER_DECORATION = re.compile(r"^[\s#*>]*(?:(?:\d+|[ivx]+)[.)]\s+)?|[\s*:,.]*$", re.IGNORECASE)
+_SUBSECTION_PATTERN = re.compile(r"^\s*(LOT \d+:|•|\d+\.)\s*", re.IGNORECASE)
+_MAX_HEADER_LENGTH = 60
+
+
+def _normalize_header(line):
+    line = line.lower().replace("_", " ").replace("/", " ").replace("&", " and ")
+    return " ".join(_HEADER_DECORATION.sub("", line).split())
+
+
+_HEADERS = {
+    _normalize_header(title): key
+    for key, title in PROPOSAL_SECTIONS.items()
+    for title in (title, *_HEADER_ALIASES.get(key, ()))
+}
+
+
+def parse_proposal_content(proposal_text):
+    """
+    Extracts proposal sections with proper placeholder keys, in one pass over the lines.
+    Headers match with or without markdown, numbering, a trailing colon or different case;
+    a section whose header repeats (one block per lot) collects every block.
+    """
+    buckets = {key: [] for key in PROPOSAL_SECTIONS}
+    current = None
+    for line in proposal_text.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if len(stripped) <= _MAX_HEADER_LENGTH:
+            key = _HEADERS.get(_normalize_header(stripped))
+            if key:
+                current = buckets[key]
+                continue  # Skip the section header line itself
+        if current is None:
+            continue  # Letterhead before the first section
+        # Preserve subsections and lists with proper formatting
+        current.append("\n" + stripped if _SUBSECTION_PATTERN.match(line) else stripped)
+
+    parsed_data = {key: "\n".join(lines).strip() for key, lines in buckets.items()}
+    missing = [key for key, value in parsed_data.items() if not value]
+    if missing:
+        logging.debug(f"🔍 Proposal sections without content: {missing}")
+    return parsed_data
+
+
+# --- Structured output ---
+
+STRUCTURED_OUTPUT_INSTRUCTIONS = """
+---Output Format---
+Return ONLY a JSON object, with nothing before or after it, with exactly these keys:
+{keys}
+Each value is the plain text of that section without its title, using newlines between paragraphs and list items.
+Use an empty string for a section with no information in the knowledge base.
+""".format(keys=", ".join(PROPOSAL_SECTIONS))
+
+
+def parse_structured_proposal(response):
+    """
+    Sections from a response written under STRUCTURED_OUTPUT_INSTRUCTIONS, keyed like
+    parse_proposal_content. Raises ValueError if the response holds no JSON object.
+    """
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("Response does not contain a JSON object")
+    try:
+        data = json.loads(response[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Response is not valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("Response JSON is not an object")
+
+    sections = {}
+    for key in PROPOSAL_SECTIONS:
+        value = data.get(key) or ""
+        if isinstance(value, list):
+            value = "\n".join(str(item) for item in value)
+        sections[key] = str(value).strip()
+    return sections
+
+
+def render_proposal_text(sections):
+    """Plain-text proposal with one titled block per section; parse_proposal_content reads it back."""
+    blocks = [
+        f"{title.upper()}\n{sections[key]}"
+        for key, title in PROPOSAL_SECTIONS.items()
+        if sections.get(key)
+    ]
+    return "\n\n".join(blocks)
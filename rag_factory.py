@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+import streamlit as st
+
+from cassette import get_cassette
+from chunker import count_tokens
+from llm_routing import EMBEDDING, FINAL_GENERATION, KEYWORD_EXTRACTION, make_routed_llm_func, openai_embed, resolve_stage_models, usage_tracker
+from llm_scheduler import get_scheduler
+import tracing
+
+if TYPE_CHECKING:
+    from lightrag import LightRAG
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+
+async def embedding_func(texts: list[str]):
+    tokens = sum(count_tokens(text) for text in texts)
+    cassette = get_cassette()
+    if cassette.replaying:
+        embeddings = cassette.replay_embeddings(EMBEDDING_MODEL, texts)
+        usage_tracker.record_cache_hits(EMBEDDING, EMBEDDING_MODEL)
+        return embeddings
+    start = time.perf_counter()
+    with tracing.span("embed", texts=len(texts)):
+        try:
+            embeddings = await get_llm_scheduler().run_async(
+                EMBEDDING_MODEL,
+                lambda: openai_embed(
+                    texts,
+                    model=EMBEDDING_MODEL,
+                    api_key=st.secrets["OPENAI_API_KEY"],
+                ),
+                tokens=tokens,
+            )
+        except Exception:
+            usage_tracker.record(EMBEDDING, EMBEDDING_MODEL, time.perf_counter() - start, tokens, error=True)
+            raise
+    usage_tracker.record(EMBEDDING, EMBEDDING_MODEL, time.perf_counter() - start, tokens)
+    if cassette.recording and embeddings is not None:
+        cassette.put_embeddings(EMBEDDING_MODEL, texts, embeddings)
+    if embeddings is None:
+        import numpy as np
+
+        logging.error("Received empty embeddings from API.")
+        return np.array([])
+    return embeddings
+
+
+def get_secrets_table(name):
+    """Optional table from secrets.toml, empty if missing"""
+    try:
+        return dict(st.secrets.get(name, {}))
+    except FileNotFoundError:
+        return {}
+
+
+def get_stage_models():
+    """Model per pipeline stage, with optional [LLM_STAGE_MODELS] overrides from secrets.toml"""
+    return resolve_stage_models(get_secrets_table("LLM_STAGE_MODELS"))
+
+
+_scheduler = None
+
+
+def get_llm_scheduler():
+    """
+    Shared rate limiter for every OpenAI call, configured on first use from the [LLM_RATE_LIMITS]
+    table in secrets.toml, whose entries are model = [rpm, tpm].
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = get_scheduler({model: tuple(limits) for model, limits in get_secrets_table("LLM_RATE_LIMITS").items()})
+    return _scheduler
+
+
+class RAGFactory:
+    """
+    Builds LightRAG instances with the shared embedding function and routed LLM.
+    lightrag is imported, and the stage models read from secrets, on first use rather than when the app starts.
+    """
+    _shared_embedding = None
+    _embedding_lock = threading.Lock()
+    _stage_models = None
+    # Replacements set with use_backends (e.g. offline fakes); None means OpenAI
+    _llm_model_func = None
+    _embedding_func = None
+
+    @classmethod
+    def use_backends(cls, llm_model_func=None, embedding_func=None):
+        """
+        Build every LightRAG instance with these functions instead of the routed OpenAI LLM and the
+        OpenAI embeddings; they take the same arguments. Called with no arguments, restores OpenAI.
+        """
+        with cls._embedding_lock:
+            cls._llm_model_func = llm_model_func
+            cls._embedding_func = embedding_func
+            cls._shared_embedding = None
+
+    @classmethod
+    def stage_models(cls):
+        """Model per pipeline stage, resolved from secrets.toml on the first call."""
+        with cls._embedding_lock:
+            if cls._stage_models is None:
+                cls._stage_models = get_stage_models()
+            return cls._stage_models
+
+    @classmethod
+    def shared_embedding(cls):
+        with cls._embedding_lock:
+            if cls._shared_embedding is None:
+                from lightrag.utils import EmbeddingFunc
+
+                cls._shared_embedding = EmbeddingFunc(
+                    embedding_dim=3072,
+                    max_token_size=8192,
+                    func=cls._embedding_func or embedding_func
+                )
+            return cls._shared_embedding
+
+    @classmethod
+    def create_rag(cls, working_dir: str) -> "LightRAG":
+        """Create a LightRAG instance with shared configuration, upload to GCS if specified"""
+        from lightrag import LightRAG
+
+        return LightRAG(
+            working_dir=working_dir,
+            addon_params={
+                "insert_batch_size": 10  # Process 10 documents per batch
+            },
+            llm_model_func=cls._llm_model_func or make_routed_llm_func(
+                cls.stage_models(), scheduler=get_llm_scheduler(), api_key=lambda: st.secrets["OPENAI_API_KEY"]
+            ),
+            embedding_func=cls.shared_embedding()
+        )
+
+
+@contextmanager
+def count_llm_cache_hits(stage):
+    """
+    Record the LLM answers LightRAG serves from its response cache inside the block against `stage`.
+    LightRAG keeps one process-wide counter, so hits from concurrent ingests may be attributed to each other.
+    """
+    from lightrag.utils import statistic_data
+
+    before = statistic_data["llm_cache"]
+    try:
+        yield
+    finally:
+        usage_tracker.record_cache_hits(stage, RAGFactory.stage_models()[stage], statistic_data["llm_cache"] - before)
+
+
+def cached_query_stage(rag, query, mode):
+    """
+    The query stage LightRAG will answer from its response cache, looked up before the query runs:
+    FINAL_GENERATION when the whole answer is cached (keywords are then not extracted either),
+    KEYWORD_EXTRACTION when only the keywords are, else None.
+    """
+    from lightrag.lightrag import always_get_an_event_loop
+    from lightrag.utils import compute_args_hash
+
+    cache = rag.llm_response_cache
+    if cache is None or not rag.enable_llm_cache:
+        return None
+    mode_cache = always_get_an_event_loop().run_until_complete(cache.get_by_id(mode)) or {}
+    if compute_args_hash(mode, query, cache_type="query") in mode_cache:
+        return FINAL_GENERATION
+    if compute_args_hash(mode, query, cache_type="keywords") in mode_cache:
+        return KEYWORD_EXTRACTION
+    return None
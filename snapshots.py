@@ -0,0 +1,458 @@
+"""
+Versioned, immutable workspace snapshots for running several app replicas.
+
+Instead of every replica pulling and mutating its own copy of a workspace, ingest publishes a
+snapshot of the layer's workspace: each file is stored once under its SHA-256 (objects/ab/abcd...),
+a version manifest lists the files of that version, and a small CURRENT pointer per layer names the
+live version. The pointer is swapped with a compare-and-swap against the version the writer started
+from, so a publish never silently replaces one it did not see.
+
+Query replicas pin a version: its files are materialized once into a local directory and loaded
+read-only, and a background thread swaps in the next version when the pointer moves, while queries
+already running keep the instance they started with.
+
+WORKSPACE_SNAPSHOTS selects the store: unset for the old per-file push / pull, "gcs" for the
+bucket, or a local directory that stands in for the bucket (several replicas on one machine, or
+tests). From the repository root:
+    python -m snapshots publish [--project rfq-no-1]
+    python -m snapshots versions [--project rfq-no-1]
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from storage import MANIFEST_NAME, SKIPPED_SUFFIXES, TRANSFER_WORKERS, sha256_path
+from workspaces import SHARED, workspace_dir, workspace_prefix
+
+SNAPSHOT_STORE = os.environ.get("WORKSPACE_SNAPSHOTS", "")
+SNAPSHOT_PREFIX = "workspace_snapshots"  # Under this prefix in the bucket
+SNAPSHOT_CACHE = Path(os.environ.get("WORKSPACE_SNAPSHOT_CACHE", "./snapshot_cache"))
+
+CURRENT_NAME = "CURRENT"
+# Version a local workspace was checked out from or last published as; never part of a snapshot
+CHECKOUT_NAME = ".snapshot.json"
+
+POLL_SECONDS = 30
+KEEP_LOCAL_VERSIONS = 2  # Materialized versions kept per layer, the pinned one included
+
+
+class SnapshotConflict(RuntimeError):
+    """The current pointer moved since the writer checked its workspace out."""
+
+
+def _object_name(digest):
+    return f"objects/{digest[:2]}/{digest}"
+
+
+def _atomic_write(path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+# --- Stores ---
+
+class LocalSnapshotStore:
+    """A directory laid out like the bucket; the pointer swap is guarded by a file lock."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def __str__(self):
+        return str(self.root)
+
+    def has_object(self, digest):
+        return (self.root / _object_name(digest)).exists()
+
+    def put_object(self, digest, path):
+        target = self.root / _object_name(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+
+    def get_object(self, digest, path):
+        shutil.copyfile(self.root / _object_name(digest), path)
+
+    def read(self, name):
+        try:
+            return (self.root / name).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def write(self, name, text):
+        _atomic_write(self.root / name, text.encode("utf-8"))
+
+    def list(self, prefix):
+        folder = self.root / prefix
+        return sorted(f"{prefix}/{path.name}" for path in folder.iterdir() if path.is_file()) if folder.is_dir() else []
+
+    def current(self, key):
+        pointer = self.read(f"{key}/{CURRENT_NAME}")
+        return json.loads(pointer)["version"] if pointer else None
+
+    def swap_current(self, key, version, expected):
+        lock_path = self.root / key / f"{CURRENT_NAME}.lock"
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            current = self.current(key)
+            if current != expected:
+                raise SnapshotConflict(f"{key} is at {current}, not {expected}")
+            self.write(f"{key}/{CURRENT_NAME}", json.dumps({"version": version}))
+
+
+class GCSSnapshotStore:
+    """Snapshots in the bucket; the pointer swap relies on the object generation precondition."""
+
+    def __init__(self, bucket=None, prefix=SNAPSHOT_PREFIX):
+        self._bucket = bucket
+        self.prefix = prefix
+
+    def __str__(self):
+        return f"gs://{self.bucket.name}/{self.prefix}"
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            from storage import get_bucket
+
+            self._bucket = get_bucket()
+        return self._bucket
+
+    def _blob(self, name):
+        return self.bucket.blob(f"{self.prefix}/{name}")
+
+    def has_object(self, digest):
+        return self._blob(_object_name(digest)).exists()
+
+    def put_object(self, digest, path):
+        from storage import upload_file
+
+        upload_file(self.bucket, path, f"{self.prefix}/{_object_name(digest)}", digest)
+
+    def get_object(self, digest, path):
+        self._blob(_object_name(digest)).download_to_filename(str(path))
+
+    def _read_with_generation(self, name):
+        blob = self.bucket.get_blob(f"{self.prefix}/{name}")
+        if blob is None:
+            return None, 0
+        return blob.download_as_bytes(if_generation_match=blob.generation).decode("utf-8"), blob.generation
+
+    def read(self, name):
+        return self._read_with_generation(name)[0]
+
+    def write(self, name, text):
+        self._blob(name).upload_from_string(text, content_type="application/json")
+
+    def list(self, prefix):
+        return sorted(blob.name[len(self.prefix) + 1:] for blob in self.bucket.list_blobs(prefix=f"{self.prefix}/{prefix}/"))
+
+    def current(self, key):
+        pointer = self.read(f"{key}/{CURRENT_NAME}")
+        return json.loads(pointer)["version"] if pointer else None
+
+    def swap_current(self, key, version, expected):
+        from google.api_core.exceptions import PreconditionFailed
+
+        pointer, generation = self._read_with_generation(f"{key}/{CURRENT_NAME}")
+        current = json.loads(pointer)["version"] if pointer else None
+        if current != expected:
+            raise SnapshotConflict(f"{key} is at {current}, not {expected}")
+        blob = self._blob(f"{key}/{CURRENT_NAME}")
+        blob.cache_control = "no-store"
+        try:
+            # Generation 0 means the pointer must not exist yet
+            blob.upload_from_string(json.dumps({"version": version}), content_type="application/json", if_generation_match=generation)
+        except PreconditionFailed:
+            raise SnapshotConflict(f"{key} was published by another writer while publishing {version}")
+
+
+def snapshots_enabled():
+    return bool(SNAPSHOT_STORE)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store():
+    """Process-wide store chosen by WORKSPACE_SNAPSHOTS."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if not SNAPSHOT_STORE:
+                raise RuntimeError("Workspace snapshots are off; set WORKSPACE_SNAPSHOTS to 'gcs' or a directory")
+            _store = GCSSnapshotStore() if SNAPSHOT_STORE.lower() == "gcs" else LocalSnapshotStore(SNAPSHOT_STORE)
+            logging.info(f"📸 Workspace snapshots in {_store}")
+        return _store
+
+
+# --- Versions ---
+
+def _snapshot_files(local_dir):
+    local_dir = Path(local_dir)
+    return sorted(
+        path for path in local_dir.rglob("*")
+        if path.is_file() and path.name not in (MANIFEST_NAME, CHECKOUT_NAME) and not path.name.endswith(SKIPPED_SUFFIXES)
+    )
+
+
+def _checked_out_version(local_dir):
+    try:
+        return json.loads((Path(local_dir) / CHECKOUT_NAME).read_text())["version"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def _mark_checked_out(local_dir, version):
+    _atomic_write(Path(local_dir) / CHECKOUT_NAME, json.dumps({"version": version}).encode("utf-8"))
+
+
+def discard_checkout(local_dir):
+    """Forget which version the workspace holds, so the next checkout_snapshot restores every file."""
+    (Path(local_dir) / CHECKOUT_NAME).unlink(missing_ok=True)
+
+
+def load_version(key, version, store=None):
+    store = store or get_snapshot_store()
+    manifest = store.read(f"{key}/versions/{version}.json")
+    if manifest is None:
+        raise FileNotFoundError(f"Snapshot {version} of {key} not found in {store}")
+    return json.loads(manifest)
+
+
+def list_versions(layer=SHARED, store=None):
+    """Published versions of a layer, oldest first."""
+    store = store or get_snapshot_store()
+    return [Path(name).stem for name in store.list(f"{workspace_prefix(layer)}/versions") if name.endswith(".json")]
+
+
+def publish_snapshot(local_dir=None, layer=SHARED, store=None):
+    """
+    Publish the workspace as a new version of the layer and make it current. Only files the store
+    does not already hold are uploaded. Raises SnapshotConflict if another version was published
+    after this workspace was checked out; the new version stays in the store but is not current.
+    """
+    store = store or get_snapshot_store()
+    local_dir = Path(local_dir or workspace_dir(layer))
+    key = workspace_prefix(layer)
+    parent = _checked_out_version(local_dir)
+
+    files = {path.relative_to(local_dir).as_posix(): {"sha256": sha256_path(path), "size": path.stat().st_size} for path in _snapshot_files(local_dir)}
+    if parent and load_version(key, parent, store)["files"] == files and store.current(key) == parent:
+        logging.info(f"📸 {key} unchanged since snapshot {parent}, nothing to publish")
+        return {"version": parent, "uploaded": 0, "files": len(files)}
+
+    def upload(name, digest):
+        if store.has_object(digest):
+            return 0
+        store.put_object(digest, local_dir / name)
+        return 1
+
+    with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as executor:
+        futures = {}
+        for name, state in files.items():
+            futures.setdefault(state["sha256"], executor.submit(upload, name, state["sha256"]))
+        uploaded = sum(future.result() for future in futures.values())
+
+    body = json.dumps(files, sort_keys=True)
+    version = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%fZ}-{hashlib.sha256(body.encode('utf-8')).hexdigest()[:8]}"
+    store.write(f"{key}/versions/{version}.json", json.dumps({
+        "version": version,
+        "parent": parent,
+        "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "files": files,
+    }, indent=1, sort_keys=True))
+    store.swap_current(key, version, expected=parent)
+    _mark_checked_out(local_dir, version)
+    logging.info(f"📸 Published {key} snapshot {version}: {len(files)} files, {uploaded} uploaded")
+    return {"version": version, "uploaded": uploaded, "files": len(files)}
+
+
+def _fetch_objects(store, digests, cache_root=SNAPSHOT_CACHE):
+    """Download the objects missing from the local object cache and return {digest: cached path}."""
+    paths = {digest: cache_root / _object_name(digest) for digest in digests}
+
+    def fetch(digest):
+        path = paths[digest]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        store.get_object(digest, tmp)
+        if sha256_path(tmp) != digest:
+            tmp.unlink()
+            raise ValueError(f"Snapshot object {digest[:12]} failed its checksum")
+        os.replace(tmp, path)
+
+    with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as executor:
+        for future in [executor.submit(fetch, digest) for digest, path in paths.items() if not path.exists()]:
+            future.result()
+    return paths
+
+
+def checkout_snapshot(local_dir=None, layer=SHARED, store=None):
+    """
+    Bring a writer's workspace to the layer's current version before it is changed: files that
+    differ are replaced and files the version does not have are removed. Returns the version, or
+    None if the layer has never been published (the workspace is then left as it is).
+    """
+    store = store or get_snapshot_store()
+    local_dir = Path(local_dir or workspace_dir(layer))
+    key = workspace_prefix(layer)
+    version = store.current(key)
+    if version is None or version == _checked_out_version(local_dir):
+        return version
+
+    files = load_version(key, version, store)["files"]
+    objects = _fetch_objects(store, {state["sha256"] for state in files.values()})
+    for path in _snapshot_files(local_dir):
+        if path.relative_to(local_dir).as_posix() not in files:
+            path.unlink()
+    for name, state in files.items():
+        target = local_dir / name
+        if not target.exists() or sha256_path(target) != state["sha256"]:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(objects[state["sha256"]], target)
+    _mark_checked_out(local_dir, version)
+    logging.info(f"📸 Checked out {key} snapshot {version} into {local_dir}")
+    return version
+
+
+# --- Readers ---
+
+class SnapshotReader:
+    """
+    The pinned version of one layer, loaded read-only from a local copy of its files, and swapped
+    for the next version in the background when the current pointer moves.
+    """
+
+    def __init__(self, layer=SHARED, store=None, cache_root=SNAPSHOT_CACHE):
+        self.layer = layer
+        self.key = workspace_prefix(layer)
+        self.store = store or get_snapshot_store()
+        self.cache_root = Path(cache_root)
+        self.version = None
+        self._rag = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._poller = None
+        self._stop_poller = threading.Event()
+
+    def rag(self):
+        """LightRAG instance of the pinned version, or None if the layer has never been published."""
+        with self._lock:
+            rag = self._rag
+        if rag is None:
+            self.refresh()
+            with self._lock:
+                rag = self._rag
+        return rag
+
+    def _materialize(self, version):
+        """Local directory holding the files of `version`; built once, then renamed into place."""
+        target = self.cache_root / self.key / version
+        if target.exists():
+            return target
+        files = load_version(self.key, version, self.store)["files"]
+        objects = _fetch_objects(self.store, {state["sha256"] for state in files.values()}, self.cache_root)
+        staging = target.with_name(f".{version}.{uuid.uuid4().hex}.tmp")
+        staging.mkdir(parents=True)
+        for name, state in files.items():
+            (staging / name).parent.mkdir(parents=True, exist_ok=True)
+            # Copies rather than links: LightRAG rewrites its query cache file in place
+            shutil.copyfile(objects[state["sha256"]], staging / name)
+        _mark_checked_out(staging, version)
+        try:
+            os.replace(staging, target)
+        except OSError:
+            # Another replica sharing the cache materialized it first
+            shutil.rmtree(staging, ignore_errors=True)
+            if not target.exists():
+                raise
+        return target
+
+    def refresh(self):
+        """Pin the current version if it changed. Returns True when a new version was swapped in."""
+        from rag_factory import RAGFactory
+
+        with self._refresh_lock:
+            version = self.store.current(self.key)
+            if version is None or version == self.version:
+                return False
+            path = self._materialize(version)
+            rag = RAGFactory.create_rag(str(path))
+            with self._lock:
+                previous, self.version, self._rag = self.version, version, rag
+            logging.info(f"📸 {self.key} now serving snapshot {version} (was {previous})")
+            self._prune()
+            return True
+
+    def _prune(self):
+        folder = self.cache_root / self.key
+        versions = sorted(path for path in folder.iterdir() if path.is_dir() and not path.name.startswith("."))
+        for path in versions[:-KEEP_LOCAL_VERSIONS]:
+            if path.name != self.version:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def start_poller(self, interval_seconds=POLL_SECONDS):
+        """Run `refresh` periodically on a daemon thread (idempotent)."""
+        if self._poller and self._poller.is_alive():
+            return self._poller
+
+        def _run():
+            while not self._stop_poller.wait(interval_seconds):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logging.error(f"Snapshot refresh of {self.key} failed: {e}")
+
+        self._stop_poller.clear()
+        self._poller = threading.Thread(target=_run, name=f"snapshot-poller-{self.layer or 'shared'}", daemon=True)
+        self._poller.start()
+        return self._poller
+
+    def stop_poller(self):
+        self._stop_poller.set()
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_snapshot_reader(layer=SHARED) -> SnapshotReader:
+    """Process-wide reader per layer, polling for new versions in the background."""
+    with _readers_lock:
+        reader = _readers.get(layer)
+        if reader is None:
+            reader = _readers[layer] = SnapshotReader(layer)
+            reader.start_poller()
+        return reader
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["publish", "versions"])
+    parser.add_argument("--project", default=SHARED, help="Project layer; the shared layer if left out")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        print(json.dumps(publish_snapshot(layer=args.project), indent=2))
+        return
+    current = get_snapshot_store().current(workspace_prefix(args.project))
+    for version in list_versions(args.project):
+        print(f"{'*' if version == current else ' '} {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Packages that cost noticeable import time; the app should only load them on the code paths that use them
+HEAVY_PACKAGES = (
+    "lightrag",
+    "langchain",
+    "langchain_openai",
+    "langchain_community",
+    "openai",
+    "tiktoken",
+    "numpy",
+    "gcsfs",
+    "google.cloud.storage",
+    "googleapiclient",
+    "google.oauth2",
+    "google_auth_oauthlib",
+    "pdfplumber",
+    "PyPDF2",
+    "trafilatura",
+    "aiohttp",
+    "unstructured",
+    "faiss",
+    "reportlab",
+    "fuzzywuzzy",
+)
+
+_timings = {}
+_lock = threading.Lock()
+
+
+def record(name, seconds):
+    """Keep the first and latest duration of a startup phase, plus how often it ran."""
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            _timings[name] = {"first_ms": round(seconds * 1000, 1), "last_ms": round(seconds * 1000, 1), "runs": 1}
+            first = True
+        else:
+            timing["last_ms"] = round(seconds * 1000, 1)
+            timing["runs"] += 1
+            first = False
+    if first:
+        logging.info(f"⏱️ {name}: {seconds * 1000:.0f} ms (heavy packages loaded: {', '.join(loaded_heavy_packages()) or 'none'})")
+
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def loaded_heavy_packages():
+    return [name for name in HEAVY_PACKAGES if name in sys.modules]
+
+
+def report():
+    """Startup and rerun timings, and which heavy packages have been imported so far."""
+    with _lock:
+        timings = {name: dict(timing) for name, timing in _timings.items()}
+    return {"timings": timings, "heavy_packages_loaded": loaded_heavy_packages()}
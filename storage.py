@@ -1,70 +1,327 @@
-from google.cloud import storage
-import streamlit as st
+import base64
+import gzip
+import hashlib
 import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import streamlit as st
+
+BUCKET_NAME = "lightrag-bucket"
+WORKSPACE_PREFIX = "analysis_workspace"
+
+# Per-file state of the last push or pull, kept inside the workspace and never uploaded itself
+MANIFEST_NAME = ".gcs_manifest.json"
+SKIPPED_SUFFIXES = (".tmp", ".log")
+
+TRANSFER_WORKERS = 8
+# Uploads above this size go through a resumable session in chunks (multiples of 256 KB)
+RESUMABLE_THRESHOLD = 8 * 1024 * 1024
+RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024
+# Uncompressed files above this size are split into parts uploaded in parallel, then composed
+COMPOSITE_THRESHOLD = 64 * 1024 * 1024
+COMPOSITE_PART_SIZE = 32 * 1024 * 1024
+MAX_COMPOSE_SOURCES = 32
+
+# LightRAG's JSON stores and GraphML graph compress 5-10x; they are stored with Content-Encoding: gzip
+# and transcoded back to plain bytes when downloaded
+GZIP_CONTENT_TYPES = {
+    ".json": "application/json",
+    ".graphml": "application/xml",
+}
+GZIP_LEVEL = 6
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _service_account_info():
+    try:
+        return json.loads(base64.b64decode(st.secrets.gcs.service_account_b64).decode())
+    except Exception:
+        # Fall back to credentials uploaded into the session
+        credentials = st.session_state.get("credentials")
+        if credentials:
+            return credentials
+        raise Exception("No service account credentials found in secrets or session state.")
+
 
-# Load GCP credentials from Streamlit session state
 def get_storage_client():
-    credentials = st.session_state.get("credentials")
-    if credentials:
-        try:
-            # Using the credentials to initialize the storage client
-            storage_client = storage.Client.from_service_account_info(credentials)
-            return storage_client
-        except Exception as e:
-            raise Exception(f"Error initializing GCS client: {e}")
+    """Process-wide authenticated storage client, created on first use and reused for every transfer."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import storage
+
+            try:
+                _client = storage.Client.from_service_account_info(_service_account_info())
+            except Exception as e:
+                raise Exception(f"Error initializing GCS client: {e}")
+            logging.info("Initialized GCS client")
+        return _client
+
+
+def get_bucket(bucket_name=BUCKET_NAME):
+    return get_storage_client().bucket(bucket_name)
+
+
+def sha256_path(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# --- Manifest ---
+
+def _load_manifest(local_dir):
+    try:
+        return json.loads((Path(local_dir) / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_manifest(local_dir, manifest):
+    path = Path(local_dir) / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def _file_state(path, sha256=None):
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256 or sha256_path(path)}
+
+
+def _workspace_files(local_dir):
+    local_dir = Path(local_dir)
+    return sorted(
+        path for path in local_dir.rglob("*")
+        if path.is_file() and path.name != MANIFEST_NAME and not path.name.endswith(SKIPPED_SUFFIXES)
+    )
+
+
+def changed_files(local_dir):
+    """
+    Workspace files that differ from what was last pushed or pulled, as {relative path: sha256}.
+    Files whose size and mtime match the manifest are not re-hashed.
+    """
+    local_dir = Path(local_dir)
+    manifest = _load_manifest(local_dir)
+    changed = {}
+    for path in _workspace_files(local_dir):
+        name = path.relative_to(local_dir).as_posix()
+        previous = manifest.get(name)
+        stat = path.stat()
+        if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+            continue
+        digest = sha256_path(path)
+        if previous and previous["sha256"] == digest:
+            continue
+        changed[name] = digest
+    return changed
+
+
+# --- Upload ---
+
+def _gzip_to_tempfile(path):
+    spool = tempfile.TemporaryFile()
+    with open(path, "rb") as source, gzip.GzipFile(fileobj=spool, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    spool.seek(0)
+    return spool
+
+
+def _upload_composite(bucket, path, blob_name, content_type, metadata):
+    """Upload a large file as parallel part objects and compose them into one blob."""
+    size = path.stat().st_size
+    part_size = max(COMPOSITE_PART_SIZE, -(-size // MAX_COMPOSE_SOURCES))
+    offsets = range(0, size, part_size)
+    part_names = [f"{blob_name}.part-{index:03d}" for index in range(len(offsets))]
+
+    def upload_part(index, offset):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            bucket.blob(part_names[index]).upload_from_string(f.read(part_size), content_type="application/octet-stream")
+
+    with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as executor:
+        for future in [executor.submit(upload_part, index, offset) for index, offset in enumerate(offsets)]:
+            future.result()
+
+    parts = [bucket.blob(name) for name in part_names]
+    try:
+        blob = bucket.blob(blob_name)
+        blob.content_type = content_type
+        blob.metadata = metadata
+        blob.compose(parts)
+    finally:
+        for part in parts:
+            try:
+                part.delete()
+            except Exception as e:
+                logging.warning(f"Could not delete upload part {part.name}: {e}")
+
+
+def upload_file(bucket, path, blob_name, sha256=None):
+    """
+    Upload one file: gzip-encoded for JSON and GraphML, resumable in chunks when large,
+    and composed from parallel parts when very large and not compressible.
+    Returns the number of bytes sent.
+    """
+    path = Path(path)
+    metadata = {"sha256": sha256 or sha256_path(path)}
+    content_type = GZIP_CONTENT_TYPES.get(path.suffix.lower())
+
+    if content_type is None and path.stat().st_size > COMPOSITE_THRESHOLD:
+        _upload_composite(bucket, path, blob_name, "application/octet-stream", metadata)
+        return path.stat().st_size
+
+    if content_type:
+        source = _gzip_to_tempfile(path)
+        size = source.seek(0, os.SEEK_END)
+        source.seek(0)
     else:
-        raise Exception("No service account credentials found in session state.")
+        source = open(path, "rb")
+        size = path.stat().st_size
+
+    with source:
+        blob = bucket.blob(blob_name, chunk_size=RESUMABLE_CHUNK_SIZE if size > RESUMABLE_THRESHOLD else None)
+        blob.metadata = metadata
+        if content_type:
+            blob.content_encoding = "gzip"
+        blob.upload_from_file(source, size=size, content_type=content_type or "application/octet-stream")
+    return size
+
+
+def push_workspace(local_dir="./analysis_workspace", prefix=WORKSPACE_PREFIX, bucket=None):
+    """
+    Upload the workspace files that changed since the last push, one object per file, in parallel.
+    Returns counts of what was sent.
+    """
+    local_dir = Path(local_dir)
+    start = time.perf_counter()
+    changed = changed_files(local_dir)
+    stats = {"uploaded": 0, "unchanged": len(_workspace_files(local_dir)) - len(changed), "bytes_sent": 0, "failed": 0}
+    if not changed:
+        logging.info(f"☁️ Workspace unchanged, nothing to push ({stats['unchanged']} files)")
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        return stats
+
+    bucket = bucket or get_bucket()
+    manifest = _load_manifest(local_dir)
+
+    def push(name, digest):
+        sent = upload_file(bucket, local_dir / name, f"{prefix}/{name}", digest)
+        return name, digest, sent
+
+    with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as executor:
+        futures = [executor.submit(push, name, digest) for name, digest in changed.items()]
+        for future in futures:
+            try:
+                name, digest, sent = future.result()
+            except Exception as e:
+                logging.error(f"❌ Error uploading workspace file to GCS: {e}")
+                stats["failed"] += 1
+                continue
+            manifest[name] = _file_state(local_dir / name, digest)
+            stats["uploaded"] += 1
+            stats["bytes_sent"] += sent
+
+    _save_manifest(local_dir, manifest)
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logging.info(f"☁️ Pushed workspace to gs://{bucket.name}/{prefix}: {stats}")
+    return stats
 
-BUCKET_NAME = "lightrag-bucket"
+
+# --- Download ---
+
+def download_file(blob, path):
+    """Stream a blob to `path` atomically; gzip-encoded blobs are stored decompressed."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    blob.download_to_filename(str(tmp))
+    os.replace(tmp, path)
+
+
+def pull_workspace(local_dir="./analysis_workspace", prefix=WORKSPACE_PREFIX, bucket=None):
+    """
+    Download the workspace objects whose content differs from the local copy, in parallel.
+    Objects are compared by the sha256 recorded at upload, so unchanged files are never fetched.
+    Returns counts of what was fetched.
+    """
+    local_dir = Path(local_dir)
+    local_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    bucket = bucket or get_bucket()
+    manifest = _load_manifest(local_dir)
+    local_changes = changed_files(local_dir)
+
+    stale = []
+    remote_files = 0
+    for blob in bucket.list_blobs(prefix=f"{prefix}/"):
+        name = blob.name[len(prefix) + 1:]
+        if not name or name.endswith("/") or ".part-" in name:
+            continue
+        remote_files += 1
+        remote_sha = (blob.metadata or {}).get("sha256")
+        local_sha = local_changes.get(name) or manifest.get(name, {}).get("sha256")
+        if remote_sha is None or remote_sha != local_sha or not (local_dir / name).exists():
+            stale.append((name, blob, remote_sha))
+
+    stats = {"downloaded": 0, "up_to_date": 0, "failed": 0}
+
+    def pull(name, blob):
+        download_file(blob, local_dir / name)
+        return name
+
+    with ThreadPoolExecutor(max_workers=TRANSFER_WORKERS) as executor:
+        futures = {executor.submit(pull, name, blob): (name, remote_sha) for name, blob, remote_sha in stale}
+        for future, (name, remote_sha) in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"❌ Error downloading {name}: {e}")
+                stats["failed"] += 1
+                continue
+            manifest[name] = _file_state(local_dir / name, remote_sha)
+            stats["downloaded"] += 1
+
+    stats["up_to_date"] = remote_files - len(stale)
+    _save_manifest(local_dir, manifest)
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logging.info(f"☁️ Pulled workspace from gs://{bucket.name}/{prefix}: {stats}")
+    return stats
+
+
+# --- Single objects ---
 
 def upload_to_gcs(uploaded_file, destination_blob_path, file_type):
-    """Uploads a file (JSON or GraphML) directly to Google Cloud Storage."""
-    # Ensure credentials are loaded before proceeding
-    if "credentials" not in st.session_state or st.session_state["credentials"] is None:
-        raise Exception("Service account credentials are missing. Please upload your credentials.")
-    
+    """Uploads a file-like object (JSON or GraphML) to Google Cloud Storage, gzip-encoded."""
     try:
-        storage_client = get_storage_client()
-        bucket = storage_client.bucket(BUCKET_NAME)
-        blob = bucket.blob(destination_blob_path)
-
-        # Set correct content type
-        content_types = {
-            "json": "application/json",
-            "graphml": "application/xml"
-        }
-        content_type = content_types.get(file_type, "application/octet-stream")
-
-        # Upload directly from the file-like object
-        blob.upload_from_file(uploaded_file, content_type=content_type)
+        blob = get_bucket().blob(destination_blob_path)
+        content_type = GZIP_CONTENT_TYPES.get(f".{file_type}", "application/octet-stream")
+        data = uploaded_file.read()
+        if f".{file_type}" in GZIP_CONTENT_TYPES:
+            data = gzip.compress(data if isinstance(data, bytes) else data.encode("utf-8"), GZIP_LEVEL, mtime=0)
+            blob.content_encoding = "gzip"
+        blob.upload_from_string(data, content_type=content_type)
         return f"gs://{BUCKET_NAME}/{destination_blob_path}"
-
     except Exception as e:
         raise Exception(f"Error uploading file to GCS: {e}")
 
-def process_and_upload(file_data, file_type):
-    """Processes and uploads a file to the correct GCS subfolder."""
-    # Ensure credentials are loaded before proceeding
-    if "credentials" not in st.session_state or st.session_state["credentials"] is None:
-        raise Exception("Service account credentials are missing. Please upload your credentials.")
-    
-    try:
-        destination_blob_path = f"analysis_workspace"
-        return upload_to_gcs(file_data, destination_blob_path, file_type)
-    except Exception as e:
-        raise Exception(f"Error processing and uploading file: {e}")
-
-def download_from_gcs(blob_path):
-    """Downloads a file from Google Cloud Storage."""
-    # Ensure credentials are loaded before proceeding
-    if "credentials" not in st.session_state or st.session_state["credentials"] is None:
-        raise Exception("Service account credentials are missing. Please upload your credentials.")
-    
-    try:
-        storage_client = get_storage_client()
-        bucket = storage_client.bucket(BUCKET_NAME)
-        blob = bucket.blob(blob_path)
 
-        return blob.download_as_text()
+def download_from_gcs(blob_path, destination_path):
+    """Downloads a file from Google Cloud Storage to a local path."""
+    try:
+        download_file(get_bucket().blob(blob_path), destination_path)
+        return Path(destination_path)
     except Exception as e:
         raise Exception(f"Error downloading file from GCS: {e}")
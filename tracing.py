@@ -0,0 +1,223 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Finished spans are appended to TRACE_LOG_NAME as one JSON object per line; METRICS_NAME holds a
+# Prometheus text-format summary per stage, rewritten whenever a top-level span (a request) ends
+TRACE_DIR = Path(os.environ.get("TRACE_DIR", "./logs"))
+TRACE_LOG_NAME = "traces.jsonl"
+METRICS_NAME = "metrics.prom"
+METRIC_PREFIX = "proposal_stage"
+
+# Durations kept per stage for the percentiles
+RECENT_SPANS = 200
+QUANTILES = (0.5, 0.95)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage. Attributes can be added while it runs with `span.set(...)`."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "started_at", "_start", "duration", "error")
+
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_json(self):
+        record = {
+            "ts": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="milliseconds"),
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "duration_ms": round(self.duration * 1000, 2),
+            "status": "error" if self.error else "ok",
+        }
+        if self.error:
+            record["error"] = self.error
+        record.update(self.attrs)
+        return json.dumps(record, default=str)
+
+
+class _StageStats:
+    def __init__(self):
+        self.recent = deque(maxlen=RECENT_SPANS)
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+
+class Tracer:
+    """Process-wide span sink: JSON log lines, per-stage percentiles and the metrics file."""
+
+    def __init__(self, trace_dir=TRACE_DIR):
+        self.trace_dir = Path(trace_dir)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._logger = None
+
+    def _json_logger(self):
+        if self._logger is None:
+            self.trace_dir.mkdir(parents=True, exist_ok=True)
+            logger = logging.getLogger("tracing.spans")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False  # Span lines go to the JSON file only, not the console
+            if not logger.handlers:
+                handler = logging.FileHandler(self.trace_dir / TRACE_LOG_NAME, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def finish(self, span):
+        with self._lock:
+            stats = self._stats.setdefault(span.name, _StageStats())
+            stats.recent.append(span.duration)
+            stats.count += 1
+            stats.errors += int(bool(span.error))
+            stats.total_seconds += span.duration
+        try:
+            self._json_logger().info(span.to_json())
+            if span.parent_id is None:
+                self.write_metrics()
+        except OSError as e:
+            logging.warning(f"Could not write trace output: {e}")
+
+    def stage_rows(self):
+        """p50 / p95 per stage over the most recent spans, for display."""
+        with self._lock:
+            stats = {name: (sorted(s.recent), s.count, s.errors) for name, s in self._stats.items()}
+        return [
+            {
+                "stage": name,
+                "count": count,
+                "errors": errors,
+                "p50 (ms)": round(_percentile(recent, 0.5) * 1000, 1),
+                "p95 (ms)": round(_percentile(recent, 0.95) * 1000, 1),
+                "last (ms)": round(recent[-1] * 1000, 1) if recent else None,
+            }
+            for name, (recent, count, errors) in sorted(stats.items())
+        ]
+
+    def metrics_text(self):
+        with self._lock:
+            stats = {name: (sorted(s.recent), s.count, s.errors, s.total_seconds) for name, s in self._stats.items()}
+        lines = [
+            f"# HELP {METRIC_PREFIX}_duration_seconds Duration of traced stages (quantiles over the last {RECENT_SPANS})",
+            f"# TYPE {METRIC_PREFIX}_duration_seconds summary",
+        ]
+        for name, (recent, count, _, total) in sorted(stats.items()):
+            for q in QUANTILES:
+                lines.append(f'{METRIC_PREFIX}_duration_seconds{{stage="{name}",quantile="{q}"}} {_percentile(recent, q):.6f}')
+            lines.append(f'{METRIC_PREFIX}_duration_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{METRIC_PREFIX}_duration_seconds_count{{stage="{name}"}} {count}')
+        lines += [
+            f"# HELP {METRIC_PREFIX}_errors_total Traced stages that raised",
+            f"# TYPE {METRIC_PREFIX}_errors_total counter",
+        ]
+        lines += [f'{METRIC_PREFIX}_errors_total{{stage="{name}"}} {errors}' for name, (_, _, errors, _) in sorted(stats.items())]
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self):
+        self.trace_dir.mkdir(parents=True, exist_ok=True)
+        path = self.trace_dir / METRICS_NAME
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_text(self.metrics_text())
+        os.replace(tmp, path)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def _percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a stage. Spans opened inside it (in the same thread, or in asyncio tasks it starts)
+    become its children and share its trace id.
+    """
+    current = Span(name, _current_span.get(), attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - current._start
+        _current_span.reset(token)
+        get_tracer().finish(current)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+def traced(name):
+    """Decorator form of `span` for plain and async functions."""
+
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def stage_rows():
+    return get_tracer().stage_rows()
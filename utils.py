@@ -1,97 +1,61 @@
 import re
-from unstructured.cleaners.core import (
-    clean,
-    clean_non_ascii_chars,
-    replace_unicode_quotes,
-)
-from langchain_community.vectorstores import FAISS
-import openai
 import streamlit as st
 
-openai.api_key = st.secrets["OPENAI_API_KEY"]
 
+# Mathematical sans-serif bold and italic alphanumerics mapped back to ASCII
+_BOLD_TABLE = {
+    **{0x1D5D4 + i: ord("A") + i for i in range(26)},  # bold uppercase
+    **{0x1D5EE + i: ord("a") + i for i in range(26)},  # bold lowercase
+    **{0x1D7EC + i: ord("0") + i for i in range(10)},  # bold digits
+}
+_ITALIC_TABLE = {
+    **{0x1D608 + i: ord("A") + i for i in range(26)},  # italic uppercase
+    **{0x1D622 + i: ord("a") + i for i in range(26)},  # italic lowercase
+}
+_MATH_ALNUM_TABLE = {**_BOLD_TABLE, **_ITALIC_TABLE}
+
+# Extended pattern to include specific symbols like ↓ (U+2193) or ↳ (U+21B3)
+_EMOJI_AND_SYMBOL_PATTERN = re.compile(
+    "["
+    "\U0001f600-\U0001f64f"  # emoticons
+    "\U0001f300-\U0001f5ff"  # symbols & pictographs
+    "\U0001f680-\U0001f6ff"  # transport & map symbols
+    "\U0001f1e0-\U0001f1ff"  # flags (iOS)
+    "\U00002193"  # downwards arrow
+    "\U000021b3"  # downwards arrow with tip rightwards
+    "\U00002192"  # rightwards arrow
+    "]+",
+    flags=re.UNICODE,
+)
 
-def unbold_text(text):
-    # Mapping of bold numbers to their regular equivalents
-    bold_numbers = {
-        "𝟬": "0",
-        "𝟭": "1",
-        "𝟮": "2",
-        "𝟯": "3",
-        "𝟰": "4",
-        "𝟱": "5",
-        "𝟲": "6",
-        "𝟳": "7",
-        "𝟴": "8",
-        "𝟵": "9",
-    }
-
-    # Function to convert bold characters (letters and numbers)
-    def convert_bold_char(match):
-        char = match.group(0)
-        # Convert bold numbers
-        if char in bold_numbers:
-            return bold_numbers[char]
-        # Convert bold uppercase letters
-        elif "\U0001d5d4" <= char <= "\U0001d5ed":
-            return chr(ord(char) - 0x1D5D4 + ord("A"))
-        # Convert bold lowercase letters
-        elif "\U0001d5ee" <= char <= "\U0001d607":
-            return chr(ord(char) - 0x1D5EE + ord("a"))
-        else:
-            return char  # Return the character unchanged if it's not a bold number or letter
-
-    # Regex for bold characters (numbers, uppercase, and lowercase letters)
-    bold_pattern = re.compile(
-        r"[\U0001D5D4-\U0001D5ED\U0001D5EE-\U0001D607\U0001D7CE-\U0001D7FF]"
-    )
-    text = bold_pattern.sub(convert_bold_char, text)
+# Bold/italic alphanumerics and emojis are all astral characters, apart from three BMP arrows.
+# clean_text scans once for runs of those and fixes each run: translating math alphanumerics first and
+# collapsing emoji runs second matches the original unbold -> unitalic -> emoji order, because no
+# character outside a run can belong to either set.
+_BMP_SYMBOLS = ("\u2192", "\u2193", "\u21b3")
+_SYMBOL_RUN_PATTERN = re.compile("[\U00010000-\U0010ffff\u2192\u2193\u21b3]+")
 
-    return text
+_URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
 
 
-def unitalic_text(text):
-    # Function to convert italic characters (both letters)
-    def convert_italic_char(match):
-        char = match.group(0)
-        # Unicode ranges for italic characters
-        if "\U0001d608" <= char <= "\U0001d621":  # Italic uppercase A-Z
-            return chr(ord(char) - 0x1D608 + ord("A"))
-        elif "\U0001d622" <= char <= "\U0001d63b":  # Italic lowercase a-z
-            return chr(ord(char) - 0x1D622 + ord("a"))
-        else:
-            return char  # Return the character unchanged if it's not an italic letter
-
-    # Regex for italic characters (uppercase and lowercase letters)
-    italic_pattern = re.compile(r"[\U0001D608-\U0001D621\U0001D622-\U0001D63B]")
-    text = italic_pattern.sub(convert_italic_char, text)
+def _replace_symbol_run(match):
+    return _EMOJI_AND_SYMBOL_PATTERN.sub(" ", match.group(0).translate(_MATH_ALNUM_TABLE))
+
+
+def unbold_text(text):
+    return text.translate(_BOLD_TABLE)
 
-    return text
+
+def unitalic_text(text):
+    return text.translate(_ITALIC_TABLE)
 
 
 def remove_emojis_and_symbols(text):
-    # Extended pattern to include specific symbols like ↓ (U+2193) or ↳ (U+21B3)
-    emoji_and_symbol_pattern = re.compile(
-        "["
-        "\U0001f600-\U0001f64f"  # emoticons
-        "\U0001f300-\U0001f5ff"  # symbols & pictographs
-        "\U0001f680-\U0001f6ff"  # transport & map symbols
-        "\U0001f1e0-\U0001f1ff"  # flags (iOS)
-        "\U00002193"  # downwards arrow
-        "\U000021b3"  # downwards arrow with tip rightwards
-        "\U00002192"  # rightwards arrow
-        "]+",
-        flags=re.UNICODE,
-    )
-
-    return emoji_and_symbol_pattern.sub(r" ", text)
+    return _EMOJI_AND_SYMBOL_PATTERN.sub(" ", text)
 
 
 def replace_urls_with_placeholder(text, placeholder="[URL]"):
-    # Regular expression pattern for matching URLs
-    url_pattern = r"https?://\S+|www\.\S+"
-
-    return re.sub(url_pattern, placeholder, text)
+    return _URL_PATTERN.sub(placeholder, text)
 
 
 def remove_non_ascii(text: str) -> str:
@@ -100,16 +64,43 @@ def remove_non_ascii(text: str) -> str:
 
 
 def clean_text(text_content: str) -> str:
-    cleaned_text = unbold_text(text_content)
-    cleaned_text = unitalic_text(cleaned_text)
-    cleaned_text = remove_emojis_and_symbols(cleaned_text)
-    cleaned_text = clean(cleaned_text)
-    cleaned_text = replace_unicode_quotes(cleaned_text)
-    cleaned_text = clean_non_ascii_chars(cleaned_text)
-    cleaned_text = replace_urls_with_placeholder(cleaned_text)
+    """
+    Normalize extracted text: unbold/unitalic math alphanumerics, drop emojis and
+    non-ASCII characters, fix mojibake quotes and replace URLs with a placeholder.
 
+    Output is identical to the original unbold -> unitalic -> emoji -> clean ->
+    replace_unicode_quotes -> clean_non_ascii_chars -> URL pipeline, but each step
+    only runs when a cheap check shows it can change the text.
+    """
+    if text_content.isascii():
+        # Only whitespace trimming, &apos; and URLs can change pure ASCII text
+        cleaned_text = text_content.strip()
+    else:
+        cleaned_text = text_content
+        has_astral = len(text_content.encode("utf-16-le")) != 2 * len(text_content)
+        if has_astral or any(symbol in text_content for symbol in _BMP_SYMBOLS):
+            cleaned_text = _SYMBOL_RUN_PATTERN.sub(_replace_symbol_run, text_content)
+        cleaned_text = cleaned_text.strip()
+
+    # Mojibake sequences all start with "â\x80"; every other quote fix yields non-ASCII that is dropped anyway
+    if "â\x80" in cleaned_text:
+        from unstructured.cleaners.core import replace_unicode_quotes
+
+        cleaned_text = replace_unicode_quotes(cleaned_text)
+    elif "&apos;" in cleaned_text:
+        cleaned_text = cleaned_text.replace("&apos;", "'")
+
+    if not cleaned_text.isascii():
+        cleaned_text = cleaned_text.encode("ascii", "ignore").decode("ascii")
+    if "http" in cleaned_text or "www." in cleaned_text:
+        cleaned_text = _URL_PATTERN.sub("[URL]", cleaned_text)
     return cleaned_text
 
+
+def clean_texts(texts: list[str]) -> list[str]:
+    """Batch form of clean_text for lists of pages, chunks or documents."""
+    return [clean_text(text) for text in texts]
+
 def format_response(response):
     """
     Split response text into readable sentences and format for display.
@@ -125,6 +116,10 @@ def format_response(response):
 
 
 def create_empty_vectordb():
+    import openai
+    from langchain_community.vectorstores import FAISS
+
+    openai.api_key = st.secrets["OPENAI_API_KEY"]
     embeddings = openai(model_name="text-embedding-ada-002")
     texts = [
         "No documents are available for this section. Upload documents to get accurate results.",
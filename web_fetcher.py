@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urldefrag
+
+# aiohttp and trafilatura are imported when links are actually fetched, not at app start
+from utils import clean_text
+
+WEB_CACHE_DIR = Path("./temp_files/web_cache")
+
+# Connection pool shared by every link in a batch; aiohttp enforces the per-host cap
+MAX_CONNECTIONS = 16
+MAX_CONNECTIONS_PER_HOST = 4
+REQUEST_TIMEOUT = {"total": 30, "connect": 10, "sock_read": 20}  # aiohttp.ClientTimeout arguments
+MAX_EXTRACTION_WORKERS = 4
+USER_AGENT = "Mozilla/5.0 (compatible; ProposalGenerator/1.0)"
+
+
+def parse_links(web_links):
+    """
+    Normalize the sidebar text area (or a list of links) into unique URLs, keeping input order.
+    Fragments are dropped because they never change the fetched page.
+    """
+    if not web_links:
+        return []
+    if isinstance(web_links, str):
+        web_links = web_links.splitlines()
+    links = []
+    for link in web_links:
+        link = urldefrag(link.strip())[0]
+        if link and link not in links:
+            links.append(link)
+    return links
+
+
+class ResponseCache:
+    """
+    On-disk cache of fetched pages with their ETag / Last-Modified validators
+    and the text extracted from them, keyed by the SHA-256 of the URL.
+    """
+
+    def __init__(self, cache_dir=WEB_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    def get(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            meta["body"] = body_path.read_bytes()
+            return meta
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _write(self, path, data: bytes):
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def put(self, url, body, etag=None, last_modified=None, text=None):
+        meta_path, body_path = self._paths(url)
+        self._write(body_path, body)
+        meta = {"url": url, "etag": etag, "last_modified": last_modified, "fetched_at": time.time(), "text": text}
+        self._write(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def set_text(self, url, text):
+        meta_path, _ = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        meta["text"] = text
+        self._write(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+async def _fetch_one(session, url, cache):
+    """
+    Fetch one URL, revalidating against the cache.
+    Returns (body, cached_text) where cached_text is set when the page was not modified.
+    """
+    import aiohttp
+
+    entry = cache.get(url)
+    try:
+        async with session.get(url, headers=cache.conditional_headers(entry)) as response:
+            if response.status == 304 and entry:
+                logging.info(f"Not modified, using cached copy: {url}")
+                return entry["body"], entry.get("text")
+            if response.status != 200:
+                logging.error(f"Failed to fetch webpage {url}: HTTP {response.status}")
+                return None, None
+            body = await response.read()
+            cache.put(url, body, etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+            return body, None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        if entry:
+            logging.warning(f"Fetching {url} failed ({e!r}); serving stale cached copy")
+            return entry["body"], entry.get("text")
+        logging.error(f"Failed to fetch webpage {url}: {e!r}")
+        return None, None
+
+
+def _extract_text(body):
+    import trafilatura
+
+    web_page = trafilatura.extract(body)
+    return clean_text(web_page) if web_page else None
+
+
+async def fetch_pages(urls, cache, executor, timeout=None):
+    """
+    Fetch all URLs concurrently over one pooled session, extracting each page on `executor` as soon
+    as it arrives. Returns {url: cleaned_text or None}.
+    """
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    timeout = timeout or aiohttp.ClientTimeout(**REQUEST_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST, ttl_dns_cache=300)
+
+    async def fetch_and_extract(session, url):
+        body, cached_text = await _fetch_one(session, url, cache)
+        if cached_text is not None or not body:
+            return cached_text
+        # trafilatura is CPU-bound, so it runs on the worker pool while other pages are still downloading
+        text = await loop.run_in_executor(executor, _extract_text, body)
+        if text:
+            cache.set_text(url, text)
+        return text
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers={"User-Agent": USER_AGENT}) as session:
+        results = await asyncio.gather(*(fetch_and_extract(session, url) for url in urls))
+    return dict(zip(urls, results))
+
+
+def fetch_web_pages(web_links, cache_dir=WEB_CACHE_DIR, max_workers=MAX_EXTRACTION_WORKERS):
+    """
+    Fetch and extract a batch of web links once each.
+    Returns {url: cleaned_text or None} in input order.
+    """
+    links = parse_links(web_links)
+    if not links:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pages = asyncio.run(fetch_pages(links, ResponseCache(cache_dir), executor))
+    return {url: pages[url] for url in links}
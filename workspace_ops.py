@@ -0,0 +1,301 @@
+import logging
+import time
+from dataclasses import asdict
+
+from lightrag.lightrag import always_get_an_event_loop
+from lightrag.operate import extract_entities
+from lightrag.prompt import GRAPH_FIELD_SEP
+from lightrag.utils import compute_mdhash_id
+
+
+def document_id(content: str) -> str:
+    """LightRAG's id for a full document, as computed by insert / insert_custom_chunks."""
+    return compute_mdhash_id(content.strip(), prefix="doc-")
+
+
+# Per document: its chunk ids and the graph nodes and edges its extraction wrote
+DOC_INDEX_NAMESPACE = "doc_chunks"
+
+
+def _doc_index(rag):
+    """KV store of doc id -> {"chunk_ids", "entities", "relations"}, kept next to the workspace's other stores."""
+    index = getattr(rag, "_doc_index", None)
+    if index is None:
+        index = rag.key_string_value_json_storage_cls(
+            namespace=DOC_INDEX_NAMESPACE, global_config=asdict(rag), embedding_func=rag.embedding_func
+        )
+        rag._doc_index = index
+    return index
+
+
+async def _set_doc_entry(rag, doc_id, chunk_ids, entities, relations):
+    index = _doc_index(rag)
+    # KV upsert never overwrites, so replace the entry
+    await index.delete([doc_id])
+    await index.upsert({doc_id: {
+        "chunk_ids": sorted(chunk_ids),
+        "entities": sorted(entities),
+        "relations": sorted(list(edge) for edge in relations),
+    }})
+
+
+async def _doc_chunks(rag, doc_id):
+    """
+    The chunks owned by `doc_id` and its index entry. Documents ingested before the index existed
+    have no entry; their chunks are found with one scan of the chunk store.
+    """
+    entry = await _doc_index(rag).get_by_id(doc_id)
+    if entry is None:
+        logging.info(f"No chunk index for {doc_id}, scanning the whole workspace")
+        return await rag.text_chunks.filter(lambda chunk: chunk.get("full_doc_id") == doc_id), None
+    chunks = await rag.text_chunks.get_by_ids(entry["chunk_ids"])
+    # Chunks shared with a document ingested earlier stay owned by that document
+    return {
+        chunk_id: chunk for chunk_id, chunk in zip(entry["chunk_ids"], chunks)
+        if chunk and chunk.get("full_doc_id") == doc_id
+    }, entry
+
+
+class _GraphWriteRecorder:
+    """Stands in for the graph storage during extraction and notes the nodes and edges written."""
+
+    def __init__(self, graph):
+        self._graph = graph
+        self.entities = set()
+        self.relations = set()
+
+    def __getattr__(self, name):
+        return getattr(self._graph, name)
+
+    async def upsert_node(self, node_id, node_data):
+        self.entities.add(node_id)
+        return await self._graph.upsert_node(node_id, node_data)
+
+    async def upsert_edge(self, source_node_id, target_node_id, edge_data):
+        self.relations.add(tuple(sorted((source_node_id, target_node_id))))
+        return await self._graph.upsert_edge(source_node_id, target_node_id, edge_data)
+
+
+def _relation_ids(source, target):
+    # The graph is undirected but the relationship vector id depends on extraction order
+    return [compute_mdhash_id(source + target, prefix="rel-"), compute_mdhash_id(target + source, prefix="rel-")]
+
+
+async def aretire_chunks(rag, chunk_ids, entities=None, relations=None):
+    """
+    Remove chunks from the chunk stores and detach them from the graph.
+
+    Entities and relationships whose only sources were these chunks are deleted from the graph and their
+    vector stores; the rest keep their remaining sources. Vector deletions are batched into one call per store.
+    Only the `entities` and `relations` (source, target) named are visited; without them the whole graph is.
+    Returns counts of what changed.
+    """
+    chunk_ids = set(chunk_ids)
+    stats = {"chunks": len(chunk_ids), "entities_deleted": 0, "entities_updated": 0,
+             "relations_deleted": 0, "relations_updated": 0}
+    if not chunk_ids:
+        return stats
+
+    await rag.chunks_vdb.delete(list(chunk_ids))
+    await rag.text_chunks.delete(list(chunk_ids))
+
+    graph = rag.chunk_entity_relation_graph._graph
+    nodes_to_delete = []
+    edges_to_delete = set()
+
+    # Only the elements the document's extraction wrote, or one pass over the graph without an index
+    if entities is None:
+        nodes = graph.nodes(data=True)
+    else:
+        nodes = [(node, graph.nodes[node]) for node in entities if graph.has_node(node)]
+    if relations is None:
+        edges = graph.edges(data=True)
+    else:
+        edges = [(source, target, graph.edges[source, target]) for source, target in relations if graph.has_edge(source, target)]
+
+    for node, data in nodes:
+        sources = data.get("source_id", "").split(GRAPH_FIELD_SEP)
+        if chunk_ids.isdisjoint(sources):
+            continue
+        remaining = [source for source in sources if source not in chunk_ids]
+        if remaining:
+            data["source_id"] = GRAPH_FIELD_SEP.join(remaining)
+            stats["entities_updated"] += 1
+        else:
+            nodes_to_delete.append(node)
+            # Edges disappear with their endpoint, so their vectors must go too
+            edges_to_delete.update(tuple(sorted(edge)) for edge in graph.edges(node))
+
+    for source, target, data in edges:
+        sources = data.get("source_id", "").split(GRAPH_FIELD_SEP)
+        if chunk_ids.isdisjoint(sources):
+            continue
+        remaining = [s for s in sources if s not in chunk_ids]
+        if remaining:
+            data["source_id"] = GRAPH_FIELD_SEP.join(remaining)
+            stats["relations_updated"] += 1
+        else:
+            edges_to_delete.add(tuple(sorted((source, target))))
+
+    if edges_to_delete:
+        await rag.relationships_vdb.delete([rel_id for edge in edges_to_delete for rel_id in _relation_ids(*edge)])
+        rag.chunk_entity_relation_graph.remove_edges(list(edges_to_delete))
+    if nodes_to_delete:
+        await rag.entities_vdb.delete([compute_mdhash_id(node, prefix="ent-") for node in nodes_to_delete])
+        rag.chunk_entity_relation_graph.remove_nodes(nodes_to_delete)
+
+    stats["entities_deleted"] = len(nodes_to_delete)
+    stats["relations_deleted"] = len(edges_to_delete)
+    return stats
+
+
+async def _save(rag):
+    for storage in (rag.entities_vdb, rag.relationships_vdb, rag.chunks_vdb, rag.chunk_entity_relation_graph, _doc_index(rag)):
+        await storage.index_done_callback()
+
+
+async def adelete_document(rag, doc_id):
+    """
+    Delete one document from every LightRAG store: its full text, status, chunks, chunk vectors,
+    and the entities and relationships extracted only from it.
+    Returns counts of what changed, or None if the workspace does not know the document.
+    """
+    start = time.perf_counter()
+    chunks, entry = await _doc_chunks(rag, doc_id)
+    if not chunks and await rag.full_docs.get_by_id(doc_id) is None:
+        logging.warning(f"Document {doc_id} not found in the workspace")
+        return None
+
+    if entry is None:
+        stats = await aretire_chunks(rag, chunks)
+    else:
+        stats = await aretire_chunks(rag, chunks, entry["entities"], entry["relations"])
+        await _doc_index(rag).delete([doc_id])
+    await rag.full_docs.delete([doc_id])
+    if await rag.doc_status.get_by_id(doc_id) is not None:
+        await rag.doc_status.delete([doc_id])
+    await _save(rag)
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logging.info(f"🗑️ Deleted {doc_id} from the workspace: {stats}")
+    return stats
+
+
+def delete_document(rag, content):
+    """Synchronous wrapper: delete the document whose full text is `content` from the workspace."""
+    loop = always_get_an_event_loop()
+    return loop.run_until_complete(adelete_document(rag, document_id(content)))
+
+
+async def _aupsert_chunks(rag, doc_id, chunks):
+    """
+    Embed and graph-extract new chunk records, then store them under `doc_id`.
+    Returns the records and the graph nodes and edges the extraction wrote.
+    """
+    records = {
+        compute_mdhash_id(chunk["content"], prefix="chunk-"): {**chunk, "full_doc_id": doc_id}
+        for chunk in chunks
+    }
+    recorder = _GraphWriteRecorder(rag.chunk_entity_relation_graph)
+    if not records:
+        return records, recorder.entities, recorder.relations
+    await rag.chunks_vdb.upsert(records)
+    await extract_entities(
+        records,
+        knowledge_graph_inst=recorder,
+        entity_vdb=rag.entities_vdb,
+        relationships_vdb=rag.relationships_vdb,
+        global_config=asdict(rag),
+        # Chunks extracted before, e.g. moved to a new doc id, are answered from the cache
+        llm_response_cache=rag.llm_response_cache,
+    )
+    await rag.text_chunks.upsert(records)
+    return records, recorder.entities, recorder.relations
+
+
+async def ainsert_document(rag, content, chunks):
+    """
+    Insert a new document from chunk dicts (tokens, content, chunk_order_index), as LightRAG's
+    insert_custom_chunks does, and index its chunks and graph elements for deletion and re-ingest.
+    Chunks already stored for another document are not extracted again.
+    Returns the number of chunks inserted, or None if the document is already in the workspace.
+    """
+    doc_id = document_id(content)
+    if await rag.full_docs.get_by_id(doc_id) is not None:
+        logging.warning(f"Document {doc_id} is already in the workspace")
+        return None
+
+    chunks = [{**chunk, "content": chunk["content"].strip()} for chunk in chunks]
+    by_id = {compute_mdhash_id(chunk["content"], prefix="chunk-"): chunk for chunk in chunks}
+    new_ids = await rag.text_chunks.filter_keys(list(by_id))
+    records, entities, relations = await _aupsert_chunks(rag, doc_id, [by_id[chunk_id] for chunk_id in by_id if chunk_id in new_ids])
+
+    await rag.full_docs.upsert({doc_id: {"content": content.strip()}})
+    await _set_doc_entry(rag, doc_id, by_id, entities, relations)
+    await rag._insert_done()
+    await _doc_index(rag).index_done_callback()
+    return len(records)
+
+
+def insert_document(rag, content, chunks):
+    """Synchronous wrapper for `ainsert_document`."""
+    loop = always_get_an_event_loop()
+    return loop.run_until_complete(ainsert_document(rag, content, chunks))
+
+
+async def areingest_document(rag, old_content, new_content, new_chunks):
+    """
+    Replace a document with its revised version, touching only the chunks that changed.
+
+    `new_chunks` are chunk dicts (tokens, content, chunk_order_index) for `new_content`. Chunks whose text
+    is unchanged keep their vectors and graph links and are re-pointed at the new document; only added
+    chunks are embedded and graph-extracted, and chunks no longer present are retired.
+    Returns counts of what changed.
+    """
+    start = time.perf_counter()
+    old_doc_id, new_doc_id = document_id(old_content), document_id(new_content)
+    new_chunks = [{**chunk, "content": chunk["content"].strip()} for chunk in new_chunks]
+    new_by_id = {compute_mdhash_id(chunk["content"], prefix="chunk-"): chunk for chunk in new_chunks}
+
+    old_chunks, entry = await _doc_chunks(rag, old_doc_id)
+    kept = [chunk_id for chunk_id in new_by_id if chunk_id in old_chunks]
+    added = [chunk for chunk_id, chunk in new_by_id.items() if chunk_id not in old_chunks]
+    retired = [chunk_id for chunk_id in old_chunks if chunk_id not in new_by_id]
+
+    if entry is None:
+        stats = await aretire_chunks(rag, retired)
+    else:
+        stats = await aretire_chunks(rag, retired, entry["entities"], entry["relations"])
+    stats["chunks"] = len(new_by_id)
+    stats.update(kept=len(kept), added=len(added), retired=len(retired))
+
+    if new_doc_id != old_doc_id:
+        # Kept chunks only change owner and position; KV upsert never overwrites, so replace them
+        await rag.text_chunks.delete(kept)
+        await rag.text_chunks.upsert({chunk_id: {**new_by_id[chunk_id], "full_doc_id": new_doc_id} for chunk_id in kept})
+        await rag.full_docs.delete([old_doc_id])
+        if await rag.doc_status.get_by_id(old_doc_id) is not None:
+            await rag.doc_status.delete([old_doc_id])
+        await rag.full_docs.upsert({new_doc_id: {"content": new_content.strip()}})
+
+    _, entities, relations = await _aupsert_chunks(rag, new_doc_id, added)
+
+    # Kept chunks keep their graph elements; those the retired chunks took with them are dropped
+    if entry is not None:
+        graph = rag.chunk_entity_relation_graph._graph
+        entities |= {node for node in entry["entities"] if graph.has_node(node)}
+        relations |= {tuple(edge) for edge in entry["relations"] if graph.has_edge(*edge)}
+        await _doc_index(rag).delete([old_doc_id])
+        await _set_doc_entry(rag, new_doc_id, new_by_id, entities, relations)
+    await rag._insert_done()
+    await _doc_index(rag).index_done_callback()
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logging.info(f"🔁 Re-ingested {old_doc_id} as {new_doc_id}: {stats}")
+    return stats
+
+
+def reingest_document(rag, old_content, new_content, new_chunks):
+    """Synchronous wrapper for `areingest_document`."""
+    loop = always_get_an_event_loop()
+    return loop.run_until_complete(areingest_document(rag, old_content, new_content, new_chunks))
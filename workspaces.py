@@ -0,0 +1,103 @@
+"""
+Workspace layers: one LightRAG workspace per RFQ or project, plus a shared company-knowledge layer.
+
+Company profiles, CVs and project history are indexed once in the shared layer, the original
+./analysis_workspace. Documents uploaded for a project go to that project's own workspace under
+./project_workspaces/<slug>, so its graph and vector indexes only hold that bid's documents.
+Queries read the project layer and the shared layer together, without copying shared data into
+the project. With no project selected every section goes to the shared layer, as before.
+"""
+import asyncio
+import re
+from dataclasses import replace
+from pathlib import Path
+
+SHARED = ""  # Project key of the shared layer
+SHARED_WORKSPACE = Path("./analysis_workspace")
+PROJECTS_ROOT = Path("./project_workspaces")
+# GCS prefixes; the shared layer keeps the one the single global workspace used
+SHARED_PREFIX = "analysis_workspace"
+PROJECTS_PREFIX = "project_workspaces"
+
+# Sections indexed once for every bid
+SHARED_SECTIONS = frozenset({"company_profiles_documents", "project_history_documents"})
+
+_SLUG_NOISE = re.compile(r"[^a-z0-9]+")
+
+
+def project_slug(name):
+    """Directory- and prefix-safe key for a project name, e.g. 'RFQ No. 2024/0108' -> 'rfq-no-2024-0108'."""
+    return _SLUG_NOISE.sub("-", (name or "").lower()).strip("-")
+
+
+def layer_for(table_name, project=SHARED):
+    """Layer a section's documents are stored and indexed in while `project` is selected."""
+    return SHARED if not project or table_name in SHARED_SECTIONS else project
+
+
+def visible_layers(project=SHARED):
+    """Layers a project reads: its own and the shared one."""
+    return (project, SHARED) if project else (SHARED,)
+
+
+def workspace_dir(layer=SHARED):
+    return SHARED_WORKSPACE if layer == SHARED else PROJECTS_ROOT / layer
+
+
+def workspace_prefix(layer=SHARED):
+    return SHARED_PREFIX if layer == SHARED else f"{PROJECTS_PREFIX}/{layer}"
+
+
+def list_local_projects():
+    """Projects with a workspace on this machine."""
+    if not PROJECTS_ROOT.is_dir():
+        return []
+    return sorted(path.name for path in PROJECTS_ROOT.iterdir() if path.is_dir())
+
+
+# --- Layered queries ---
+
+_LAYER_TITLES = {SHARED: "Company knowledge (shared)"}
+
+
+def _has_context(context):
+    from lightrag.prompt import PROMPTS
+
+    return bool(context) and context != PROMPTS["fail_response"]
+
+
+async def aquery_layers(rags, query, param):
+    """
+    Answer `query` from several layers: each {layer: LightRAG} builds its own retrieval context,
+    concurrently, and the contexts go into one prompt for a single generation call on the first
+    layer's model function.
+    """
+    from lightrag.prompt import PROMPTS
+
+    # Each layer gets its own copy; LightRAG may switch a param's mode while building context
+    contexts = await asyncio.gather(
+        *(rag.aquery(query, replace(param, only_need_context=True)) for rag in rags.values())
+    )
+    sections = [
+        f"-----{_LAYER_TITLES.get(layer, f'Project {layer}')}-----\n{context}"
+        for layer, context in zip(rags, contexts)
+        if _has_context(context)
+    ]
+    if not sections:
+        return PROMPTS["fail_response"]
+
+    system_prompt = PROMPTS["rag_response"].format(
+        context_data="\n\n".join(sections), response_type=param.response_type, history=""
+    )
+    if param.only_need_prompt:
+        return system_prompt
+    return await next(iter(rags.values())).llm_model_func(query, system_prompt=system_prompt, stream=param.stream)
+
+
+def query_layers(rags, query, param):
+    """Synchronous `aquery_layers`; a single layer is queried directly, with LightRAG's own query cache."""
+    if len(rags) == 1:
+        return next(iter(rags.values())).query(query, param)
+    from lightrag.lightrag import always_get_an_event_loop
+
+    return always_get_an_event_loop().run_until_complete(aquery_layers(rags, query, param))